@@ -1,6 +1,13 @@
 from block import *
 from blockchain import *
+from cache import *
+from compression import *
 from errors import *
+from metrics import *
 from node import *
+from peers import *
+from streaming import *
+from tracing import *
 from transaction import *
 from wallet import *
+from wire import *
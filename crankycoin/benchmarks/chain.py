@@ -0,0 +1,137 @@
+import datetime
+import pyelliptic
+import random
+
+from crankycoin.block import Block
+from crankycoin.blockchain import Blockchain
+from crankycoin.wallet import Client
+
+SYNTHETIC_EPOCH = datetime.datetime(2017, 1, 1)
+
+
+class SyntheticBlockchain(Blockchain):
+    # one leading zero keeps generating large chains fast while every block still passes the pattern check
+    HASH_PATTERN = "0"
+
+
+def generate_clients(count):
+    """
+    :param count: number of addresses
+    :type count: int
+
+    :return: clients with fresh secp256k1 keys
+    :rtype: list of Client
+    """
+    clients = []
+    for i in range(count):
+        ecc = pyelliptic.ECC(curve='secp256k1')
+        clients.append(Client(ecc.get_privkey().encode('hex'), ecc.get_pubkey().encode('hex')))
+    return clients
+
+
+def mine_synthetic_block(blockchain_class, index, transactions, previous_hash, timestamp):
+    chain = blockchain_class.__new__(blockchain_class)
+    nonce = 0
+    while True:
+        current_hash = chain.calculate_block_hash(index, previous_hash, timestamp, transactions, nonce)
+        if current_hash.startswith(blockchain_class.HASH_PATTERN):
+            return Block(index, transactions, previous_hash, current_hash, timestamp, nonce)
+        nonce += 1
+
+
+class ChainGenerator(object):
+
+    def __init__(self, clients, transactions_per_block, seed=0, blockchain_class=SyntheticBlockchain):
+        """
+        Builds valid chains of signed transfers between a fixed set of addresses.  Generated chains start with one
+        funding block per address, whose reward pays that address, so that every block after them carries exactly
+        transactions_per_block transfers.  Block rewards keep rotating over the addresses.
+
+        :param clients: addresses that mine and transact
+        :type clients: list of Client
+        :param transactions_per_block: transfers per block, excluding the block reward
+        :type transactions_per_block: int
+        :param seed: random seed, so that runs are comparable
+        :type seed: int
+        :param blockchain_class: chain class whose hash pattern blocks are mined to
+        :type blockchain_class: type
+        """
+        self.clients = clients
+        self.transactions_per_block = transactions_per_block
+        self.random = random.Random(seed)
+        self.blockchain_class = blockchain_class
+        self.reward_chain = blockchain_class.__new__(blockchain_class)
+
+    def generate(self, size):
+        """
+        :param size: number of blocks of transfers after the genesis and funding blocks
+        :type size: int
+
+        :return: blocks, starting with the genesis block and one funding block per address
+        :rtype: list of Block
+        """
+        genesis_block = self.blockchain_class.__new__(self.blockchain_class).get_genesis_block()
+        # the miner of block i is clients[i % len(clients)], so blocks 1 to len(clients) pay every address once
+        funded_blocks = self.extend([genesis_block], len(self.clients), transactions_per_block=0)
+        return self.extend(funded_blocks, size)
+
+    def extend(self, blocks, size, salt="", transactions_per_block=None):
+        """
+        :param blocks: chain to build on
+        :type blocks: list of Block
+        :param size: number of blocks to add
+        :type size: int
+        :param salt: makes the new blocks differ from another extension of the same chain, e.g. for a fork
+        :type salt: str
+        :param transactions_per_block: transfers per block, the generator's if not given
+        :type transactions_per_block: int
+
+        :return: a new list with the added blocks
+        :rtype: list of Block
+
+        :raises ValueError: if no address has the funds for a transfer, e.g. on a chain that was not generated
+        """
+        if transactions_per_block is None:
+            transactions_per_block = self.transactions_per_block
+        blocks = list(blocks)
+        balances = self.get_balances(blocks)
+        for i in range(size):
+            index = blocks[-1].index + 1
+            timestamp = (SYNTHETIC_EPOCH + datetime.timedelta(minutes=index)).isoformat() + salt
+            transactions = []
+            # validation checks payers against their balance before the block, so funds received in a block
+            # cannot be spent in the same block
+            spendable = dict(balances)
+            for j in range(transactions_per_block):
+                payers = [client for client in self.clients if spendable.get(client.get_pubkey(), 0) >= 1]
+                if not payers:
+                    raise ValueError("No address can pay for transfer {} of block {}".format(j, index))
+                payer = self.random.choice(payers)
+                address = payer.get_pubkey()
+                payee = self.random.choice(self.clients).get_pubkey()
+                transactions.append(payer.sign_transaction(payee, 1, "{}.{}".format(timestamp, len(transactions))))
+                spendable[address] -= 1
+                balances[address] -= 1
+                balances[payee] = balances.get(payee, 0) + 1
+            miner = self.clients[index % len(self.clients)].get_pubkey()
+            reward_transaction = {
+                "from": "0",
+                "to": miner,
+                "amount": self.reward_chain.get_reward(index),
+                "signature": "0",
+                "timestamp": timestamp
+            }
+            reward_transaction["hash"] = self.reward_chain.calculate_transaction_hash(reward_transaction)
+            transactions.append(reward_transaction)
+            balances[miner] = balances.get(miner, 0) + reward_transaction["amount"]
+            blocks.append(mine_synthetic_block(
+                self.blockchain_class, index, transactions, blocks[-1].current_hash, timestamp))
+        return blocks
+
+    def get_balances(self, blocks):
+        balances = {}
+        for block in blocks:
+            for transaction in block.transactions:
+                balances[transaction["from"]] = balances.get(transaction["from"], 0) - transaction["amount"]
+                balances[transaction["to"]] = balances.get(transaction["to"], 0) + transaction["amount"]
+        return balances
@@ -0,0 +1,347 @@
+import argparse
+import logging
+import random
+import threading
+import time
+import traceback
+import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from twisted.internet import reactor
+from twisted.web.server import Site
+
+from crankycoin.benchmarks.chain import ChainGenerator, SyntheticBlockchain, generate_clients
+from crankycoin.benchmarks.harness import get_environment, write_results
+from crankycoin.benchmarks.load import LoadGenerator
+from crankycoin.node import FullNode, FULL_NODE_PORT
+from crankycoin.peers import PeerConnectionPool
+
+DEFAULT_NODES = 4
+DEFAULT_DIFFICULTY = 3
+DEFAULT_DURATION = 30
+DEFAULT_RATE = 2.0
+DEFAULT_ADDRESSES = 10
+CONVERGENCE_TIMEOUT = 60
+POLL_INTERVAL = 0.005
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class NetworkConditions(object):
+
+    def __init__(self, latency=0.0, jitter=0.0, loss=0.0, seed=0):
+        """
+        Latency, loss and partitions applied to requests between simulated nodes
+
+        :param latency: seconds added to every request
+        :type latency: float
+        :param jitter: up to this many seconds are added on top of latency, uniformly at random
+        :type jitter: float
+        :param loss: probability that a request fails to connect
+        :type loss: float
+        :param seed: random seed, so that runs are comparable
+        :type seed: int
+        """
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        # (source, destination): dict(latency, jitter, loss) overriding the defaults on one direction of a link
+        self.links = {}
+        # host: group.  hosts in different groups cannot reach each other.
+        self.groups = {}
+
+    def set_link(self, source, destination, **conditions):
+        with self.lock:
+            self.links[(source, destination)] = conditions
+
+    def partition(self, *groups):
+        """
+        :param groups: hosts that can only reach hosts in the same group.  hosts not in any group reach everyone.
+        :type groups: list of str
+        """
+        with self.lock:
+            self.groups = dict((host, i) for i, group in enumerate(groups) for host in group)
+
+    def heal(self):
+        with self.lock:
+            self.groups = {}
+
+    def sample(self, source, destination):
+        """
+        :return: seconds the request from source to destination is delayed, None if it is dropped
+        :rtype: float
+        """
+        with self.lock:
+            if self.groups.get(source, -1) != self.groups.get(destination, -1) \
+                    and source in self.groups and destination in self.groups:
+                return None
+            link = self.links.get((source, destination), {})
+            if self.random.random() < link.get("loss", self.loss):
+                return None
+            return link.get("latency", self.latency) + self.random.random() * link.get("jitter", self.jitter)
+
+
+class SimulatedAdapter(HTTPAdapter):
+
+    def __init__(self, source, network, **kwargs):
+        self.source = source
+        self.network = network
+        super(SimulatedAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        destination = urlparse.urlparse(request.url).hostname
+        delay = self.network.sample(self.source, destination)
+        if delay is None:
+            raise requests.exceptions.ConnectionError(
+                "{} unreachable from {}".format(destination, self.source), request=request)
+        if delay > 0:
+            time.sleep(delay)
+        return super(SimulatedAdapter, self).send(request, **kwargs)
+
+
+class SimulatedPeerPool(PeerConnectionPool):
+
+    def __init__(self, source, network, **kwargs):
+        """
+        Peer pool of one simulated node.  Its requests pass through the simulated network, so peer health and
+        latency ranking see the injected conditions.
+
+        :param source: host of the node making the requests
+        :type source: str
+        :param network: conditions applied to the node's requests
+        :type network: NetworkConditions
+        """
+        super(SimulatedPeerPool, self).__init__(**kwargs)
+        self.adapter = SimulatedAdapter(
+            source,
+            network,
+            pool_connections=self.adapter._pool_connections,
+            pool_maxsize=self.adapter._pool_maxsize,
+            pool_block=self.adapter._pool_block
+        )
+        self.session.mount("http://", self.adapter)
+
+
+class ClusterObserver(object):
+
+    def __init__(self, nodes):
+        """
+        Samples every node's chain and records when each block first appeared on each node
+
+        :param nodes: nodes to watch.  their current chains are the baseline and are not reported.
+        :type nodes: list of FullNode
+        """
+        self.nodes = nodes
+        self.chains = dict((node.host, [block.current_hash for block in node.blockchain.get_snapshot()])
+                           for node in nodes)
+        self.baseline = set(block_hash for chain in self.chains.values() for block_hash in chain)
+        # block hash: {host: time the block was first seen on the host}
+        self.first_seen = {}
+        self.reorgs = 0
+        self.max_reorg_depth = 0
+
+    def poll(self, now=None):
+        now = time.time() if now is None else now
+        for node in self.nodes:
+            snapshot = node.blockchain.get_snapshot()
+            chain = self.chains[node.host]
+            # walk back to the last block the node still shares with what it had before
+            common = min(len(chain), len(snapshot)) - 1
+            while common >= 0 and snapshot.get_block_by_index(common).current_hash != chain[common]:
+                common -= 1
+            if common < len(chain) - 1:
+                self.reorgs += 1
+                self.max_reorg_depth = max(self.max_reorg_depth, len(chain) - 1 - common)
+            del chain[common + 1:]
+            for block in snapshot.get_blocks_range(common + 1, len(snapshot) - 1):
+                chain.append(block.current_hash)
+                if block.current_hash not in self.baseline:
+                    self.first_seen.setdefault(block.current_hash, {}).setdefault(node.host, now)
+
+    def get_tips(self):
+        return dict((host, chain[-1]) for host, chain in self.chains.items())
+
+    def is_converged(self):
+        return len(set(self.get_tips().values())) == 1
+
+    def wait_for_convergence(self, timeout, interval=POLL_INTERVAL):
+        """
+        :return: seconds until every node had the same tip, None if they did not agree within timeout
+        :rtype: float
+        """
+        start = time.time()
+        while time.time() - start < timeout:
+            self.poll()
+            if self.is_converged():
+                return time.time() - start
+            time.sleep(interval)
+        return None
+
+    def get_main_chain(self):
+        # the longest chain, the one most nodes hold on a tie
+        tips = self.get_tips().values()
+        host = max(self.chains, key=lambda host: (len(self.chains[host]), tips.count(self.chains[host][-1])))
+        return self.chains[host]
+
+    def get_report(self):
+        """
+        :return: dict(blocks, orphans, orphan_rate, reorgs, max_reorg_depth, propagation)
+        :rtype: dict
+        """
+        main_chain = set(self.get_main_chain())
+        orphans = [block_hash for block_hash in self.first_seen if block_hash not in main_chain]
+        # seconds from the first node having a block to the last node having it
+        spreads = [max(seen.values()) - min(seen.values())
+                   for block_hash, seen in self.first_seen.items()
+                   if block_hash in main_chain and len(seen) == len(self.nodes)]
+        blocks = len(self.first_seen)
+        return {
+            "blocks": blocks,
+            "orphans": len(orphans),
+            "orphan_rate": float(len(orphans)) / blocks if blocks else None,
+            "reorgs": self.reorgs,
+            "max_reorg_depth": self.max_reorg_depth,
+            "propagation": {
+                "blocks": len(spreads),
+                "median": percentile(spreads, 0.5),
+                "p90": percentile(spreads, 0.9),
+                "max": max(spreads) if spreads else None
+            }
+        }
+
+
+class Cluster(object):
+
+    def __init__(self, size, network, blocks, clients, blockchain_class=SyntheticBlockchain):
+        """
+        Full nodes on consecutive loopback addresses from 127.0.0.2, all on FULL_NODE_PORT, served by one reactor.
+        The first node is every other node's seed.
+
+        :param size: number of nodes
+        :type size: int
+        :param network: conditions applied to requests between the nodes
+        :type network: NetworkConditions
+        :param blocks: chain every node starts from
+        :type blocks: list of Block
+        :param clients: addresses the nodes' block rewards are paid to, in turn
+        :type clients: list of Client
+        :param blockchain_class: chain class, whose hash pattern sets the mining difficulty
+        :type blockchain_class: type
+        """
+        self.network = network
+        self.hosts = ["127.0.0.{}".format(i + 2) for i in range(size)]
+        self.nodes = []
+        for i, host in enumerate(self.hosts):
+            node = FullNode(host, clients[i % len(clients)].get_pubkey(), start=False)
+            node.blockchain = blockchain_class(blocks)
+            # join through the first node, and send every request through the simulated network
+            node.full_nodes = {self.hosts[0]}
+            node.peer_pool = SimulatedPeerPool(host, network)
+            self.nodes.append(node)
+
+    def listen(self):
+        for node in self.nodes:
+            reactor.listenTCP(int(FULL_NODE_PORT), Site(node.app.resource()), interface=node.host)
+
+    def start(self):
+        for node in self.nodes:
+            node.start()
+
+
+def simulate(cluster, load, duration, partition=0, convergence_timeout=CONVERGENCE_TIMEOUT):
+    """
+    Runs load against a started cluster while sampling the nodes' chains.  With a partition the nodes are split
+    in two halves for the first partition seconds of the load.
+
+    :return: dict(transactions, failed_transactions, partition_convergence, convergence, blocks, orphans, ...)
+    :rtype: dict
+    """
+    observer = ClusterObserver(cluster.nodes)
+    load_thread = threading.Thread(target=load.run, args=(duration,))
+    load_thread.daemon = True
+    half = len(cluster.hosts) // 2
+    if partition > 0:
+        cluster.network.partition(cluster.hosts[:half], cluster.hosts[half:])
+    start = time.time()
+    load_thread.start()
+    partition_convergence = None
+    while load_thread.is_alive():
+        observer.poll()
+        if partition > 0 and time.time() - start >= partition:
+            cluster.network.heal()
+            partition_convergence = observer.wait_for_convergence(convergence_timeout)
+            partition = 0
+        time.sleep(POLL_INTERVAL)
+    report = {
+        "transactions": load.submitted,
+        "failed_transactions": load.failed,
+        "partition_convergence": partition_convergence,
+        # seconds from the end of the load until every node has the same tip
+        "convergence": observer.wait_for_convergence(convergence_timeout)
+    }
+    report.update(observer.get_report())
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Block propagation, forks and sync convergence of a local cluster")
+    parser.add_argument("--nodes", type=int, default=DEFAULT_NODES, help="number of full nodes")
+    parser.add_argument("--difficulty", type=int, default=DEFAULT_DIFFICULTY, help="leading zeros of a block hash")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds of transaction load")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="transactions per second")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request between nodes")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random seconds added on top of the latency")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability a request between nodes fails")
+    parser.add_argument("--partition", type=float, default=0.0,
+                        help="seconds the nodes are split in two halves at the start of the load")
+    parser.add_argument("--addresses", type=int, default=DEFAULT_ADDRESSES, help="number of funded addresses")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the JSON results to, stdout if not given")
+    args = parser.parse_args(argv)
+
+    blockchain_class = type("SimulatedBlockchain", (SyntheticBlockchain,), {"HASH_PATTERN": "0" * args.difficulty})
+    clients = generate_clients(args.addresses)
+    # the funding blocks and one more reward each pay every address before the load starts
+    blocks = ChainGenerator(clients, 0, args.seed, blockchain_class).generate(args.addresses)
+    network = NetworkConditions(args.latency, args.jitter, args.loss, args.seed)
+    cluster = Cluster(args.nodes, network, blocks, clients, blockchain_class)
+    load = LoadGenerator(cluster.hosts, clients, args.rate)
+    # every node validates blocks and serves syncs on the reactor's thread pool
+    reactor.suggestThreadPoolSize(max(10, args.nodes * 4))
+    cluster.listen()
+    # gevent only runs subprocesses from the main thread
+    environment = get_environment()
+
+    def run():
+        try:
+            cluster.start()
+            report = {
+                "benchmark": "cluster",
+                "environment": environment,
+                "parameters": vars(args),
+                "results": simulate(cluster, load, args.duration, args.partition)
+            }
+            write_results(report, args.output)
+        except Exception:
+            logger.error("Simulation failed: %s", traceback.format_exc())
+        finally:
+            reactor.callFromThread(reactor.stop)
+
+    thread = threading.Thread(target=run, args=())
+    thread.daemon = True
+    thread.start()
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main()
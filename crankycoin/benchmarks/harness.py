@@ -0,0 +1,71 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+
+def measure(name, f, repeat, setup=None):
+    """
+    Runs f repeat times and summarises the wall clock durations
+
+    :param name: operation name
+    :type name: str
+    :param f: operation to time
+    :type f: callable
+    :param repeat: number of timed runs
+    :type repeat: int
+    :param setup: untimed call before every run
+    :type setup: callable
+
+    :return: dict(operation, repeat, min, median, mean, max) in seconds
+    :rtype: dict
+    """
+    durations = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.time()
+        f()
+        durations.append(time.time() - start)
+    durations.sort()
+    return {
+        "operation": name,
+        "repeat": repeat,
+        "min": durations[0],
+        "median": durations[len(durations) // 2],
+        "mean": sum(durations) / len(durations),
+        "max": durations[-1]
+    }
+
+
+def get_revision():
+    try:
+        with open(os.devnull, "w") as devnull:
+            return subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_environment():
+    """
+    :return: what the results were measured on, so that runs can be compared across revisions
+    :rtype: dict(revision, python, platform, timestamp)
+    """
+    return {
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time()
+    }
+
+
+def write_results(report, path=None):
+    data = json.dumps(report, indent=4, sort_keys=True)
+    if path is None:
+        sys.stdout.write(data + "\n")
+        return
+    with open(path, "w") as f:
+        f.write(data + "\n")
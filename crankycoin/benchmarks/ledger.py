@@ -0,0 +1,92 @@
+import argparse
+
+from crankycoin.benchmarks.chain import ChainGenerator, SyntheticBlockchain, generate_clients
+from crankycoin.benchmarks.harness import get_environment, measure, write_results
+
+DEFAULT_SIZES = (10, 50, 100, 200)
+DEFAULT_TRANSACTIONS_PER_BLOCK = 5
+DEFAULT_ADDRESSES = 20
+DEFAULT_REPEAT = 5
+FORK_DEPTH = 5
+
+
+def benchmark_size(generator, size, repeat):
+    """
+    Times the ledger operations on a generated chain of the given size
+
+    :param generator: chain generator
+    :type generator: ChainGenerator
+    :param size: blocks of transfers after the genesis and funding blocks
+    :type size: int
+    :param repeat: timed runs per operation
+    :type repeat: int
+
+    :return: one result per operation
+    :rtype: list of dict
+    """
+    # one block past the measured chain to validate, and a fork that overtakes its last blocks
+    blocks = generator.generate(size + 1)
+    next_block = blocks.pop()
+    fork_index = max(len(blocks) - FORK_DEPTH, 1)
+    fork_blocks = generator.extend(blocks[:fork_index], len(blocks) - fork_index + 1, salt="fork")[fork_index:]
+    address = generator.clients[0].get_pubkey()
+    chain = {}
+
+    def construct():
+        chain["subject"] = SyntheticBlockchain(blocks)
+
+    def alter_chain():
+        chain["subject"].alter_chain(fork_blocks)
+
+    def reset_chain():
+        chain["subject"].blocks = list(blocks)
+
+    results = [measure("construct_chain", construct, repeat)]
+    subject = chain["subject"]
+    results.append(measure("get_balance", lambda: subject.get_balance(address), repeat))
+    results.append(measure("get_transaction_history", lambda: subject.get_transaction_history(address), repeat))
+    # a hash that is not on the chain scans every transaction
+    results.append(measure("find_duplicate_transactions", lambda: subject.find_duplicate_transactions("0" * 64), repeat))
+    results.append(measure("validate_block", lambda: subject.validate_block(next_block), repeat))
+    results.append(measure("alter_chain", alter_chain, repeat, setup=reset_chain))
+    transactions = sum(len(block.transactions) for block in blocks)
+    for result in results:
+        result["blocks"] = len(blocks)
+        result["transactions"] = transactions
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ledger operation benchmarks on synthetic chains")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma separated chain sizes in blocks")
+    parser.add_argument("--transactions", type=int, default=DEFAULT_TRANSACTIONS_PER_BLOCK,
+                        help="transactions per block, excluding the block reward")
+    parser.add_argument("--addresses", type=int, default=DEFAULT_ADDRESSES, help="number of addresses")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the JSON results to, stdout if not given")
+    args = parser.parse_args(argv)
+
+    generator = ChainGenerator(generate_clients(args.addresses), args.transactions, args.seed)
+    results = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        results.extend(benchmark_size(generator, size, args.repeat))
+    report = {
+        "benchmark": "ledger",
+        "environment": get_environment(),
+        "parameters": {
+            "sizes": args.sizes,
+            "transactions_per_block": args.transactions,
+            "addresses": args.addresses,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "hash_pattern": SyntheticBlockchain.HASH_PATTERN
+        },
+        "results": results
+    }
+    write_results(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
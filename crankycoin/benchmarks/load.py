@@ -0,0 +1,257 @@
+import argparse
+import time
+
+import gevent
+import requests
+
+from crankycoin.benchmarks.chain import generate_clients
+from crankycoin.benchmarks.harness import get_environment, write_results
+from crankycoin.node import BALANCE_URL, BLOCK_URL, BLOCKS_RANGE_URL, FULL_NODE_PORT, TRANSACTIONS_URL
+from crankycoin.peers import PeerConnectionPool
+from crankycoin.wallet import Client
+from crankycoin.wire import decode_response
+
+DEFAULT_RATE = 5.0
+DEFAULT_DURATION = 60
+DEFAULT_ADDRESSES = 20
+DEFAULT_CONNECTIONS = 32
+DEFAULT_DRAIN = 120
+DEFAULT_POLL_INTERVAL = 0.5
+AMOUNT = 1
+
+
+def summarize(values):
+    """
+    :return: dict(count, min, median, p90, p99, max) of the values, without the statistics if there are none
+    :rtype: dict
+    """
+    values = sorted(values)
+    summary = {"count": len(values)}
+    if values:
+        summary.update({
+            "min": values[0],
+            "median": values[len(values) // 2],
+            "p90": values[min(int(len(values) * 0.9), len(values) - 1)],
+            "p99": values[min(int(len(values) * 0.99), len(values) - 1)],
+            "max": values[-1]
+        })
+    return summary
+
+
+def sign_transfers(clients, count, amount=AMOUNT):
+    # round robin over the payers so that each one signs count / len(clients) transfers
+    return [clients[i % len(clients)].sign_transaction(clients[(i + 1) % len(clients)].get_pubkey(), amount)
+            for i in range(count)]
+
+
+class LoadGenerator(object):
+
+    def __init__(self, hosts, clients, rate, connections=DEFAULT_CONNECTIONS):
+        """
+        Submits signed transfers to nodes on a fixed schedule.  The schedule is open loop: a slow node does not
+        delay the next submission, and latency is measured from the time a transaction was due so that queueing
+        behind slow requests is counted.
+
+        :param hosts: nodes to submit to, in turn
+        :type hosts: list of str
+        :param clients: funded addresses that sign the transfers
+        :type clients: list of Client
+        :param rate: transactions per second
+        :type rate: float
+        :param connections: connections kept alive per node
+        :type connections: int
+        """
+        self.hosts = hosts
+        self.clients = clients
+        self.rate = float(rate)
+        self.pool = PeerConnectionPool(max_connections_per_peer=connections)
+        # transaction hash: dict(due, latency, accepted)
+        self.submissions = {}
+        self.submitted = 0
+        self.failed = 0
+        self.started_at = None
+
+    def submit(self, transaction, host, due):
+        accepted = False
+        try:
+            response = self.pool.post(TRANSACTIONS_URL.format(host, FULL_NODE_PORT), json={"transaction": transaction})
+            accepted = response.status_code == 200
+        except requests.exceptions.RequestException:
+            pass
+        if not accepted:
+            self.failed += 1
+        self.submissions[transaction["hash"]] = {
+            "due": due,
+            "latency": time.time() - due,
+            "accepted": accepted
+        }
+
+    def run(self, duration):
+        # signing is done up front so that it cannot throttle the offered load
+        transactions = sign_transfers(self.clients, int(duration * self.rate))
+        self.started_at = time.time()
+        greenlets = []
+        for i, transaction in enumerate(transactions):
+            due = self.started_at + i / self.rate
+            gevent.sleep(max(due - time.time(), 0))
+            greenlets.append(gevent.spawn(self.submit, transaction, self.hosts[i % len(self.hosts)], due))
+            self.submitted += 1
+        gevent.joinall(greenlets)
+
+
+class InclusionObserver(object):
+
+    def __init__(self, host, interval=DEFAULT_POLL_INTERVAL):
+        """
+        Polls a node for new blocks and the size of its unconfirmed pool
+
+        :param host: node to watch
+        :type host: str
+        :param interval: seconds between polls
+        :type interval: float
+        """
+        self.host = host
+        self.interval = interval
+        self.pool = PeerConnectionPool()
+        self.latest_index = None
+        # transaction hash: time it was first seen in a block
+        self.included = {}
+        # (time, unconfirmed transactions)
+        self.backlog = []
+
+    def get_latest_index(self):
+        response = self.pool.get(BLOCK_URL.format(self.host, FULL_NODE_PORT, "latest"))
+        return decode_response(response)["index"]
+
+    def poll(self):
+        now = time.time()
+        try:
+            latest_index = self.get_latest_index()
+            if self.latest_index is None:
+                # blocks mined before the run are not of interest
+                self.latest_index = latest_index
+            elif latest_index > self.latest_index:
+                response = self.pool.get(BLOCKS_RANGE_URL.format(
+                    self.host, FULL_NODE_PORT, self.latest_index + 1, latest_index))
+                for block in decode_response(response):
+                    for transaction in block["transactions"]:
+                        self.included.setdefault(transaction["hash"], now)
+                self.latest_index = latest_index
+            response = self.pool.get(TRANSACTIONS_URL.format(self.host, FULL_NODE_PORT))
+            self.backlog.append((now, len(decode_response(response))))
+        except requests.exceptions.RequestException:
+            pass
+
+    def wait_for(self, transaction_hashes, timeout):
+        """
+        :return: True if every transaction was included within timeout
+        :rtype: bool
+        """
+        expires_at = time.time() + timeout
+        while time.time() < expires_at:
+            self.poll()
+            if all(transaction_hash in self.included for transaction_hash in transaction_hashes):
+                return True
+            gevent.sleep(self.interval)
+        return False
+
+    def watch(self):
+        while True:
+            self.poll()
+            gevent.sleep(self.interval)
+
+
+def fund_clients(funder, clients, amount, host, observer, timeout=DEFAULT_DRAIN):
+    """
+    Pays every client from a funded address and waits until the payments are mined, so that they can be spent
+
+    :return: True if every payment was included in a block
+    :rtype: bool
+    """
+    transactions = funder.sign_transactions([(client.get_pubkey(), amount) for client in clients])
+    PeerConnectionPool().post(TRANSACTIONS_URL.format(host, FULL_NODE_PORT), json={"transactions": transactions})
+    return observer.wait_for([transaction["hash"] for transaction in transactions], timeout)
+
+
+def run_load(load, observer, duration, drain=DEFAULT_DRAIN):
+    """
+    Runs the load while watching for inclusion, then waits up to drain seconds for the accepted transactions
+
+    :return: dict(offered_rate, submitted, failed, submission_latency, inclusion_latency, included_rate, backlog)
+    :rtype: dict
+    """
+    observer.backlog = []
+    watcher = gevent.spawn(observer.watch)
+    try:
+        load.run(duration)
+    finally:
+        watcher.kill()
+    start = load.started_at
+    accepted = [transaction_hash for transaction_hash, submission in load.submissions.items() if submission["accepted"]]
+    observer.wait_for(accepted, drain)
+    inclusion_latencies = [observer.included[transaction_hash] - load.submissions[transaction_hash]["due"]
+                           for transaction_hash in accepted if transaction_hash in observer.included]
+    last_included = max([observer.included[transaction_hash] for transaction_hash in accepted
+                         if transaction_hash in observer.included] or [start])
+    backlog = [count for sampled_at, count in observer.backlog]
+    return {
+        "offered_rate": load.rate,
+        "submitted": load.submitted,
+        "failed": load.failed,
+        "submission_latency": summarize([submission["latency"] for submission in load.submissions.values()]),
+        "inclusion_latency": summarize(inclusion_latencies),
+        "not_included": len(accepted) - len(inclusion_latencies),
+        # transactions per second from the first submission until the last one was mined
+        "included_rate": len(inclusion_latencies) / (last_included - start) if last_included > start else None,
+        "backlog": {
+            "max": max(backlog) if backlog else None,
+            "final": backlog[-1] if backlog else None,
+            "samples": [[sampled_at - start, count] for sampled_at, count in observer.backlog]
+        }
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Open loop transaction load against one or more nodes")
+    parser.add_argument("--nodes", default="127.0.0.1", help="comma separated node hosts to submit to")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="transactions per second")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds of load")
+    parser.add_argument("--addresses", type=int, default=DEFAULT_ADDRESSES, help="number of sending addresses")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                        help="connections kept alive per node")
+    parser.add_argument("--drain", type=float, default=DEFAULT_DRAIN,
+                        help="seconds to wait for transactions to be mined after the load")
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="seconds between polls for new blocks")
+    parser.add_argument("--funding-private-key", required=True, help="hex private key of an address with funds")
+    parser.add_argument("--funding-public-key", required=True, help="hex public key of the funding address")
+    parser.add_argument("--output", help="file to write the JSON results to, stdout if not given")
+    args = parser.parse_args(argv)
+
+    hosts = args.nodes.split(",")
+    funder = Client(args.funding_private_key, args.funding_public_key)
+    clients = generate_clients(args.addresses)
+    transactions_per_client = -(-int(args.duration * args.rate) // args.addresses)
+    amount = transactions_per_client * AMOUNT
+    response = PeerConnectionPool().get(BALANCE_URL.format(hosts[0], FULL_NODE_PORT, funder.get_pubkey()))
+    if decode_response(response) < amount * args.addresses:
+        parser.error("the funding address cannot pay {} to each of {} addresses".format(amount, args.addresses))
+
+    observer = InclusionObserver(hosts[0], args.interval)
+    observer.poll()
+    if not fund_clients(funder, clients, amount, hosts[0], observer, args.drain):
+        parser.error("funding transactions were not mined within {} seconds".format(args.drain))
+    load = LoadGenerator(hosts, clients, args.rate, args.connections)
+    parameters = vars(args).copy()
+    del parameters["funding_private_key"]
+    report = {
+        "benchmark": "load",
+        "environment": get_environment(),
+        "parameters": parameters,
+        "results": run_load(load, observer, args.duration, args.drain)
+    }
+    write_results(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
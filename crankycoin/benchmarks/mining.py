@@ -0,0 +1,195 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+
+from crankycoin.benchmarks.chain import ChainGenerator, SyntheticBlockchain, generate_clients
+from crankycoin.benchmarks.harness import get_environment, measure, write_results
+
+DEFAULT_BLOCK_SIZES = (1, 2, 5, SyntheticBlockchain.MAX_TRANSACTIONS_PER_BLOCK)
+DEFAULT_WORKERS = (1, 2, 4)
+DEFAULT_NONCES = 20000
+DEFAULT_CHAIN_SIZE = 20
+DEFAULT_ADDRESSES = 10
+DEFAULT_REPEAT = 3
+
+
+def json_hasher(index, previous_hash, timestamp, transactions):
+    # the hashing path mine_block uses: the whole block is serialized again for every nonce
+    return SyntheticBlockchain.__new__(SyntheticBlockchain).get_block_hasher(
+        index, previous_hash, timestamp, transactions)
+
+
+def template_hasher(index, previous_hash, timestamp, transactions):
+    # serializes the block once.  the sorted keys put the nonce between the index and everything else, so every
+    # nonce only formats an integer into the same JSON document calculate_block_hash would produce.
+    prefix = json.dumps({"index": index}, sort_keys=True)[:-1] + ', "nonce": '
+    suffix = ", " + json.dumps({
+        "previous_hash": previous_hash,
+        "timestamp": timestamp,
+        "transactions": transactions
+    }, sort_keys=True)[1:]
+    prefix_hash = hashlib.sha256(prefix)
+
+    def block_hash(nonce):
+        hash_object = prefix_hash.copy()
+        hash_object.update(str(nonce) + suffix)
+        return hash_object.hexdigest()
+    return block_hash
+
+
+STRATEGIES = {
+    "json": json_hasher,
+    "template": template_hasher
+}
+
+
+def hash_range(args):
+    """
+    Hashes a range of nonces the way the mining loop does.  Module level so that worker processes can run it.
+
+    :param args: strategy, index, previous_hash, timestamp, transactions, first nonce and end nonce
+    :type args: tuple
+
+    :return: number of hashes that matched the hash pattern
+    :rtype: int
+    """
+    strategy, index, previous_hash, timestamp, transactions, start, stop = args
+    new_hash = STRATEGIES[strategy](index, previous_hash, timestamp, transactions)
+    pattern = SyntheticBlockchain.HASH_PATTERN
+    matches = 0
+    for nonce in xrange(start, stop):
+        if new_hash(nonce).startswith(pattern):
+            matches += 1
+    return matches
+
+
+def split_nonces(nonces, workers):
+    """
+    :return: one contiguous (start, stop) range per worker covering nonces 0 to nonces
+    :rtype: list of tuple
+    """
+    step = -(-nonces // workers)
+    return [(start, min(start + step, nonces)) for start in range(0, nonces, step)]
+
+
+def sign_transactions(clients, count, salt):
+    return [clients[i % len(clients)].sign_transaction(
+        clients[(i + 1) % len(clients)].get_pubkey(), 1, "{}.{}".format(salt, i)) for i in range(count)]
+
+
+def benchmark_block_size(blockchain, clients, block_size, nonces, strategies, workers, repeat, pools):
+    """
+    Times building a block template of block_size pooled transactions, then hashing a fixed number of nonces for
+    it with every strategy and worker count
+
+    :param blockchain: chain the templates are built on
+    :type blockchain: SyntheticBlockchain
+    :param clients: addresses that sign the pooled transactions
+    :type clients: list of Client
+    :param block_size: transactions taken from the pool, excluding the block reward
+    :type block_size: int
+    :param nonces: nonces hashed per run
+    :type nonces: int
+    :param strategies: names of the hashing strategies to compare
+    :type strategies: list of str
+    :param workers: worker process counts.  1 hashes in this process.
+    :type workers: list of int
+    :param repeat: timed runs per operation
+    :type repeat: int
+    :param pools: worker count: process pool
+    :type pools: dict
+
+    :return: one result per operation
+    :rtype: list of dict
+    """
+    transactions = sign_transactions(clients, block_size, "block-{}".format(block_size))
+    reward_address = clients[0].get_pubkey()
+    template = {}
+
+    def fill_pool():
+        for transaction in transactions:
+            blockchain.push_unconfirmed_transaction(transaction)
+
+    def create_template():
+        template["block"] = blockchain.create_block_template(reward_address)
+
+    result = measure("create_block_template", create_template, repeat, setup=fill_pool)
+    result["block_size"] = block_size
+    results = [result]
+
+    index, previous_hash, timestamp, block_transactions = template["block"]
+    for strategy in strategies:
+        for worker_count in workers:
+            ranges = [(strategy, index, previous_hash, timestamp, block_transactions, start, stop)
+                      for start, stop in split_nonces(nonces, worker_count)]
+            if worker_count == 1:
+                run = lambda: map(hash_range, ranges)
+            else:
+                run = lambda: pools[worker_count].map(hash_range, ranges)
+            result = measure("hash_nonces", run, repeat)
+            result["block_size"] = block_size
+            result["strategy"] = strategy
+            result["workers"] = worker_count
+            result["nonces"] = nonces
+            result["hashes_per_second"] = nonces / result["median"] if result["median"] else None
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mining benchmarks: block templates and hashrate")
+    parser.add_argument("--block-sizes", default=",".join(str(size) for size in DEFAULT_BLOCK_SIZES),
+                        help="comma separated pooled transactions per block, excluding the block reward")
+    parser.add_argument("--strategies", default=",".join(sorted(STRATEGIES)),
+                        help="comma separated hashing strategies: " + ", ".join(sorted(STRATEGIES)))
+    parser.add_argument("--workers", default=",".join(str(count) for count in DEFAULT_WORKERS),
+                        help="comma separated worker process counts")
+    parser.add_argument("--nonces", type=int, default=DEFAULT_NONCES, help="nonces hashed per run")
+    parser.add_argument("--chain-size", type=int, default=DEFAULT_CHAIN_SIZE,
+                        help="blocks of transfers in the chain templates are built on, after one funding block per address")
+    parser.add_argument("--addresses", type=int, default=DEFAULT_ADDRESSES, help="number of addresses")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the JSON results to, stdout if not given")
+    args = parser.parse_args(argv)
+
+    strategies = args.strategies.split(",")
+    for strategy in strategies:
+        if strategy not in STRATEGIES:
+            parser.error("unknown strategy: {}".format(strategy))
+    workers = [int(count) for count in args.workers.split(",")]
+    clients = generate_clients(args.addresses)
+    blocks = ChainGenerator(clients, 2, args.seed).generate(args.chain_size)
+    blockchain = SyntheticBlockchain(blocks)
+    pools = dict((count, multiprocessing.Pool(count)) for count in workers if count > 1)
+    try:
+        results = []
+        for block_size in [int(size) for size in args.block_sizes.split(",")]:
+            results.extend(benchmark_block_size(
+                blockchain, clients, block_size, args.nonces, strategies, workers, args.repeat, pools))
+    finally:
+        for pool in pools.values():
+            pool.terminate()
+    report = {
+        "benchmark": "mining",
+        "environment": get_environment(),
+        "parameters": {
+            "block_sizes": args.block_sizes,
+            "strategies": args.strategies,
+            "workers": args.workers,
+            "nonces": args.nonces,
+            "chain_size": args.chain_size,
+            "addresses": args.addresses,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "hash_pattern": SyntheticBlockchain.HASH_PATTERN,
+            "cpu_count": multiprocessing.cpu_count()
+        },
+        "results": results
+    }
+    write_results(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
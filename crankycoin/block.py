@@ -37,6 +37,23 @@ class Block(object):
     def to_json(self):
         return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=4)
 
+    def to_compact(self):
+        """
+        Block header with transaction hashes in place of transactions.  The block reward is sent in full.
+
+        :return: dict(index, previous_hash, current_hash, timestamp, nonce, transaction_hashes, coinbase)
+        :rtype: dict
+        """
+        return {
+            "index": self.index,
+            "previous_hash": self.previous_hash,
+            "current_hash": self.current_hash,
+            "timestamp": self.timestamp,
+            "nonce": self.nonce,
+            "transaction_hashes": [transaction["hash"] for transaction in self.transactions[:-1]],
+            "coinbase": self.transactions[-1]
+        }
+
     def __repr__(self):
         return "<Crankycoin Block {}>".format(self.index)
 
@@ -1,28 +1,93 @@
 import datetime
 import hashlib
+import itertools
 import logging
 import pyelliptic
 import threading
+import time
 
 from block import *
 from errors import *
+from metrics import Counter, Gauge, Histogram
+from tracing import traced
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BLOCK_VALIDATION_SECONDS = Histogram(
+    "crankycoin_block_validation_seconds", "Time spent validating blocks, by validation stage", ("stage",))
+MINED_HASHES = Counter("crankycoin_mined_hashes_total", "Block hashes computed while mining")
+MINING_HASHRATE = Gauge("crankycoin_mining_hashrate", "Hashes per second over the latest mining attempt")
+BLOCK_TEMPLATE_TRANSACTIONS = Histogram(
+    "crankycoin_block_template_transactions", "Transactions per block template, including the block reward",
+    buckets=(1, 2, 3, 5, 8, 11, 20, 50))
+
+
+class ChainSnapshot(object):
+
+    def __init__(self, blocks, size):
+        """
+        Read-only view of the chain at one tip.  Writers only append to the blocks list, or replace it on a reorg,
+        so the first size blocks never change under a reader.
+
+        :param blocks: the chain's blocks list
+        :type blocks: list of Block
+        :param size: number of blocks in the view
+        :type size: int
+        """
+        self.blocks = blocks
+        self.size = size
+
+    def get_latest_block(self):
+        if self.size == 0:
+            return None
+        return self.blocks[self.size - 1]
+
+    def get_block_by_index(self, index):
+        if 0 <= index < self.size:
+            return self.blocks[index]
+        return None
+
+    def get_blocks_range(self, start_index, stop_index):
+        return self.blocks[start_index:min(stop_index + 1, self.size)]
+
+    def get_all_blocks(self):
+        return self.blocks[:self.size]
+
+    def __iter__(self):
+        return itertools.islice(self.blocks, self.size)
+
+    def __len__(self):
+        return self.size
+
 
 class Blockchain(object):
 
     INITIAL_COINS_PER_BLOCK = 50
     HALVING_FREQUENCY = 1000
     MAX_TRANSACTIONS_PER_BLOCK = 10
+    # proof of work: required prefix of every block hash
+    HASH_PATTERN = "0000"
+    # a block is mined once this many transactions are pending, or MAX_MINING_WAIT seconds after the miner started waiting
+    MIN_TRANSACTIONS_PER_BLOCK = 1
+    MAX_MINING_WAIT = 30
+    # the latest blocks are listed one by one in a block locator, then exponentially further apart
+    LOCATOR_DENSE_BLOCKS = 10
 
     unconfirmed_transactions = []
+    unconfirmed_transactions_received = {}
     blocks = []
 
     def __init__(self, blocks=None):
+        # per chain lists. alter_chain builds a second chain to validate a fork.
+        self.unconfirmed_transactions = []
+        # transaction hash: arrival time
+        self.unconfirmed_transactions_received = {}
+        self.blocks = []
         self.unconfirmed_transactions_lock = threading.Lock()
         self.blocks_lock = threading.Lock()
+        # notified when a transaction arrives or the latest block changes
+        self.state_changed = threading.Condition()
         if blocks is None:
             genesis_block = self.get_genesis_block()
             self.add_block(genesis_block)
@@ -98,28 +163,32 @@ class Blockchain(object):
         hash_object = hashlib.sha256(data_json)
         return hash_object.hexdigest()
 
+    @traced()
     def _check_genesis_block(self, block):
         if block != self.get_genesis_block():
             raise GenesisBlockMismatch(block.index, "Genesis Block Mismatch: {}".format(block))
         return
 
+    @traced()
     def _check_hash_and_hash_pattern(self, block):
         block_hash = self.calculate_block_hash(block.index, block.previous_hash, block.timestamp, block.transactions, block.nonce)
         if block_hash != block.current_hash:
             raise InvalidHash(block.index, "Block Hash Mismatch: {}".format(block.current_hash))
-        if block_hash[:4] != "0000":
+        if not block_hash.startswith(self.HASH_PATTERN):
             raise InvalidHash(block.index, "Incompatible Block Hash: {}".format(block.current_hash))
         return
 
-    def _check_index_and_previous_hash(self, block):
-        latest_block = self.get_latest_block()
+    @traced()
+    def _check_index_and_previous_hash(self, block, snapshot=None):
+        latest_block = (self if snapshot is None else snapshot).get_latest_block()
         if latest_block.index != block.index - 1:
             raise ChainContinuityError(block.index, "Incompatible block index: {}".format(block.index-1))
         if latest_block.current_hash != block.previous_hash:
             raise ChainContinuityError(block.index, "Incompatible block hash: {} and hash: {}".format(block.index-1, block.previous_hash))
         return
 
-    def _check_transactions_and_block_reward(self, block):
+    @traced()
+    def _check_transactions_and_block_reward(self, block, snapshot=None):
         # transactions : list of transactions
         # transaction : dict(from, to, amount, timestamp, signature, hash)
         payers = dict()
@@ -127,7 +196,7 @@ class Blockchain(object):
             if transaction["hash"] != self.calculate_transaction_hash(transaction):
                 raise InvalidTransactions(block.index, "Transactions not valid.  Incorrect transaction hash")
             else:
-                if self.find_duplicate_transactions(transaction["hash"]):
+                if self.find_duplicate_transactions(transaction["hash"], snapshot):
                     raise InvalidTransactions(block.index, "Transactions not valid.  Duplicate transaction detected")
             if not self.verify_signature(
                     transaction["signature"],
@@ -143,7 +212,7 @@ class Blockchain(object):
             else:
                 payers[transaction["from"]] = transaction["amount"]
         for key in payers:
-            balance = self.get_balance(key)
+            balance = self.get_balance(key, snapshot)
             if payers[key] > balance:
                 raise InvalidTransactions(block.index, "Transactions not valid.  Insufficient funds")
         # last transaction is block reward
@@ -153,46 +222,169 @@ class Blockchain(object):
             raise InvalidTransactions(block.index, "Transactions not valid.  Incorrect block reward")
         return
 
-    def validate_block(self, block):
+    @traced()
+    def validate_block(self, block, snapshot=None):
+        """
+        :param block: block to validate
+        :type block: Block
+        :param snapshot: chain the block must extend, the current chain if not given.  Every check reads the same
+            snapshot, so a tip that moves during validation cannot mix two chains.
+        :type snapshot: ChainSnapshot
+
+        :rtype: bool
+        """
         # verify genesis block integrity
         # TODO implement and use Merkle tree
         try:
             # if genesis block, check if block is correct
             if block.index == 0:
-                self._check_genesis_block(block)
+                with BLOCK_VALIDATION_SECONDS.time(("genesis",)):
+                    self._check_genesis_block(block)
                 return True
             # current hash of data is correct and hash satisfies pattern
-            self._check_hash_and_hash_pattern(block)
+            with BLOCK_VALIDATION_SECONDS.time(("hash",)):
+                self._check_hash_and_hash_pattern(block)
             # block index is correct and previous hash is correct
-            self._check_index_and_previous_hash(block)
+            with BLOCK_VALIDATION_SECONDS.time(("continuity",)):
+                self._check_index_and_previous_hash(block, snapshot)
             # block reward is correct based on block index and halving formula
-            self._check_transactions_and_block_reward(block)
+            with BLOCK_VALIDATION_SECONDS.time(("transactions",)):
+                self._check_transactions_and_block_reward(block, snapshot)
         except BlockchainException as bce:
             logger.warning("Validation Error (block id: %s): %s", bce.index, bce.message)
             return False
         return True
 
     def alter_chain(self, blocks):
+        """
+        Replaces the chain from the index of the first block if the fork is longer.  The fork is validated on a
+        snapshot without holding blocks_lock, and only swapped in if the tip it forked from is still the tip.
+
+        :param blocks: the fork's blocks, in order
+        :type blocks: list of Block
+
+        :return: True if the chain was replaced
+        :rtype: bool
+        """
         #TODO enforce finality through key blocks
+        snapshot = self.get_snapshot()
+        latest_hash = self._get_latest_hash(snapshot)
         fork_start = blocks[0].index
-        alternate_blocks = self.blocks[0:fork_start]
+        alternate_blocks = snapshot.get_blocks_range(0, fork_start - 1)
         alternate_blocks.extend(blocks)
-        alternate_chain = Blockchain(alternate_blocks)
-        if alternate_chain.get_size() > self.get_size():
+        alternate_chain = self.__class__(alternate_blocks)
+        if alternate_chain.get_size() > len(snapshot):
             with self.blocks_lock:
+                if self._get_latest_hash() != latest_hash:
+                    # a block was appended while the fork was validated.  swapping now would drop it.
+                    return False
                 self.blocks = alternate_blocks
-                return True
+            self.notify_state_changed()
+            return True
         return False
 
     def add_block(self, block):
+        """
+        Validates the block against a snapshot of the chain without holding blocks_lock, then appends it only if
+        the tip has not moved in the meantime
+
+        :param block: block to add
+        :type block: Block
+
+        :return: True if the block was added
+        :rtype: bool
+        """
         #TODO change this from memory to persistent
+        snapshot = self.get_snapshot()
+        latest_hash = self._get_latest_hash(snapshot)
+        if not self.validate_block(block, snapshot):
+            return False
+        # blocks are only ever appended, never changed in place. see get_snapshot.
         with self.blocks_lock:
-            if self.validate_block(block):
-                self.blocks.append(block)
-                return True
-        return False
+            if self._get_latest_hash() != latest_hash:
+                # another block or a reorg got in first.  the block was validated against a stale tip.
+                return False
+            self.blocks.append(block)
+        self.notify_state_changed()
+        return True
+
+    def _get_latest_hash(self, snapshot=None):
+        latest_block = (self if snapshot is None else snapshot).get_latest_block()
+        return None if latest_block is None else latest_block.current_hash
+
+    def notify_state_changed(self):
+        with self.state_changed:
+            self.state_changed.notify_all()
 
+    def wait_for_unconfirmed_transactions(self, min_count=None, max_wait=None):
+        """
+        Blocks until min_count transactions are pending, or until at least one is pending and max_wait seconds passed
+
+        :param min_count: pending transactions worth mining a block for
+        :type min_count: int
+        :param max_wait: seconds to wait for min_count transactions
+        :type max_wait: float
+
+        :return: number of pending transactions
+        :rtype: int
+        """
+        if min_count is None:
+            min_count = self.MIN_TRANSACTIONS_PER_BLOCK
+        if max_wait is None:
+            max_wait = self.MAX_MINING_WAIT
+        deadline = time.time() + max_wait
+        with self.state_changed:
+            while True:
+                pending = len(self.unconfirmed_transactions)
+                if pending >= min_count:
+                    return pending
+                if pending == 0:
+                    # nothing to mine. sleep until a transaction arrives.
+                    self.state_changed.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return pending
+                self.state_changed.wait(remaining)
+
+    @traced()
     def mine_block(self, reward_address):
+        template = self.create_block_template(reward_address)
+        if template is None:
+            return None
+        new_block_id, previous_hash, timestamp, transactions = template
+        new_hash = self.get_block_hasher(new_block_id, previous_hash, timestamp, transactions)
+
+        i = 0
+        start = time.time()
+        while not new_hash(i).startswith(self.HASH_PATTERN):
+            latest_block = self.get_latest_block()
+            if latest_block.index >= new_block_id or latest_block.current_hash != previous_hash:
+                # Next block in sequence was mined by another node.  Stop mining current block.
+                # identify in-progress transactions that aren't included in the latest_block and place them back in
+                # the unconfirmed transactions pool
+                for transaction in transactions[:-1]:
+                    if transaction not in latest_block.transactions:
+                        self.push_unconfirmed_transaction(transaction)
+                self._record_hashrate(i + 1, start)
+                return None
+            i += 1
+        self._record_hashrate(i + 1, start)
+
+        block = Block(new_block_id, transactions, previous_hash, new_hash(i), timestamp, i)
+        return block
+
+    @traced()
+    def create_block_template(self, reward_address):
+        """
+        Takes up to MAX_TRANSACTIONS_PER_BLOCK valid transactions from the unconfirmed pool and adds the block reward
+
+        :param reward_address: address the block reward is paid to
+        :type reward_address: str
+
+        :return: index, previous_hash, timestamp and transactions of the next block, None if there is nothing to mine
+        :rtype: tuple(int, str, str, list)
+        """
         #TODO add transaction fees
         transactions = []
         latest_block = self.get_latest_block()
@@ -234,39 +426,37 @@ class Blockchain(object):
 
         reward_transaction["hash"] = self.calculate_transaction_hash(reward_transaction)
         transactions.append(reward_transaction)
+        BLOCK_TEMPLATE_TRANSACTIONS.observe(len(transactions))
 
         timestamp = datetime.datetime.utcnow().isoformat()
+        return new_block_id, previous_hash, timestamp, transactions
 
-        def new_hash(nonce):
-            return self.calculate_block_hash(new_block_id, previous_hash, timestamp, transactions, nonce)
+    def get_block_hasher(self, index, previous_hash, timestamp, transactions):
+        """
+        :return: the mining loop's hash function of the nonce for a block template
+        :rtype: callable
+        """
+        def block_hash(nonce):
+            return self.calculate_block_hash(index, previous_hash, timestamp, transactions, nonce)
+        return block_hash
 
-        i = 0
-        while new_hash(i)[:4] != "0000":
-            latest_block = self.get_latest_block()
-            if latest_block.index >= new_block_id or latest_block.current_hash != previous_hash:
-                # Next block in sequence was mined by another node.  Stop mining current block.
-                # identify in-progress transactions that aren't included in the latest_block and place them back in
-                # the unconfirmed transactions pool
-                for transaction in transactions[:-1]:
-                    if transaction not in latest_block.transactions:
-                        self.push_unconfirmed_transaction(transaction)
-                return None
-            i += 1
-
-        block = Block(new_block_id, transactions, previous_hash, new_hash(i), timestamp, i)
-        return block
+    def _record_hashrate(self, hashes, start):
+        MINED_HASHES.inc(hashes)
+        elapsed = time.time() - start
+        if elapsed > 0:
+            MINING_HASHRATE.set(hashes / elapsed)
 
     def get_transaction_history(self, address):
         transactions = []
-        for block in self.blocks:
+        for block in self.get_snapshot():
             for transaction in block.transactions:
                 if transaction["from"] == address or transaction["to"] == address:
                     transactions.append(transaction)
         return transactions
 
-    def get_balance(self, address):
+    def get_balance(self, address, snapshot=None):
         balance = 0
-        for block in self.blocks:
+        for block in self.get_snapshot() if snapshot is None else snapshot:
             for transaction in block.transactions:
                 if transaction["from"] == address:
                     balance -= transaction["amount"]
@@ -274,13 +464,33 @@ class Blockchain(object):
                     balance += transaction["amount"]
         return balance
 
-    def find_duplicate_transactions(self, transaction_hash):
-        for block in self.blocks:
+    def find_duplicate_transactions(self, transaction_hash, snapshot=None):
+        for block in self.get_snapshot() if snapshot is None else snapshot:
             for transaction in block.transactions:
                 if transaction["hash"] == transaction_hash:
                     return block.index
         return False
 
+    def find_confirmed_transactions(self, transaction_hashes):
+        """
+        Looks up many transactions with a single pass over the chain
+
+        :param transaction_hashes: hashes to look for
+        :type transaction_hashes: iterable of str
+
+        :return: the hashes that are already in a block
+        :rtype: set
+        """
+        wanted = set(transaction_hashes)
+        confirmed = set()
+        if not wanted:
+            return confirmed
+        for block in self.get_snapshot():
+            for transaction in block.transactions:
+                if transaction["hash"] in wanted:
+                    confirmed.add(transaction["hash"])
+        return confirmed
+
     def recycle_transactions(self, block):
         for transaction in block.transactions[:-1]:
             if not self.find_duplicate_transactions(transaction["hash"]):
@@ -302,6 +512,15 @@ class Blockchain(object):
             reward = reward / 2
         return reward
 
+    def get_snapshot(self):
+        """
+        Consistent view of the chain at its current tip, taken without locking
+
+        :rtype: ChainSnapshot
+        """
+        blocks = self.blocks
+        return ChainSnapshot(blocks, len(blocks))
+
     def get_size(self):
         return len(self.blocks)
 
@@ -318,25 +537,74 @@ class Blockchain(object):
             return None
 
     def get_all_blocks(self):
-        return self.blocks
+        return self.get_snapshot().get_all_blocks()
 
     def get_blocks_range(self, start_index, stop_index):
         return self.blocks[start_index:stop_index+1]
 
+    def get_block_locator(self):
+        """
+        Block hashes from the latest block back to genesis, exponentially further apart after the first few
+
+        :return: block hashes, latest first
+        :rtype: list
+        """
+        blocks = self.blocks
+        locator = []
+        step = 1
+        index = len(blocks) - 1
+        while index > 0:
+            locator.append(blocks[index].current_hash)
+            if len(locator) >= self.LOCATOR_DENSE_BLOCKS:
+                step *= 2
+            index -= step
+        if len(blocks) > 0:
+            locator.append(blocks[0].current_hash)
+        return locator
+
+    def find_fork_point(self, locator):
+        """
+        :param locator: block hashes of a remote chain
+        :type locator: list
+
+        :return: index of the latest local block found in the locator, None if the chains share no block
+        :rtype: int
+        """
+        hashes = set(locator)
+        for block in reversed(self.blocks):
+            if block.current_hash in hashes:
+                return block.index
+        return None
+
     def get_all_unconfirmed_transactions(self):
         return self.unconfirmed_transactions
 
     def pop_next_unconfirmed_transaction(self):
         try:
             with self.unconfirmed_transactions_lock:
-                return self.unconfirmed_transactions.pop(0)
+                transaction = self.unconfirmed_transactions.pop(0)
+                self.unconfirmed_transactions_received.pop(transaction.get("hash"), None)
+                return transaction
         except IndexError:
             return None
 
     def push_unconfirmed_transaction(self, transaction):
         with self.unconfirmed_transactions_lock:
             self.unconfirmed_transactions.append(transaction)
-            return True
+            self.unconfirmed_transactions_received.setdefault(transaction.get("hash"), time.time())
+        self.notify_state_changed()
+        return True
+
+    def get_oldest_unconfirmed_transaction_age(self):
+        """
+        :return: seconds since the longest waiting unconfirmed transaction arrived, 0 if there are none
+        :rtype: float
+        """
+        with self.unconfirmed_transactions_lock:
+            received = self.unconfirmed_transactions_received.values()
+        if not received:
+            return 0
+        return time.time() - min(received)
 
     def verify_signature(self, signature, message, public_key):
         return pyelliptic.ECC(curve='secp256k1', pubkey=public_key.decode('hex')).verify(signature.decode('hex'), message)
@@ -0,0 +1,48 @@
+import threading
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+
+    def __init__(self, max_size):
+        """
+        Thread-safe bounded mapping that evicts the least recently used entry
+
+        :param max_size: maximum number of entries
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.items.pop(key)
+            except KeyError:
+                return default
+            self.items[key] = value
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = value
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.items.pop(key, default)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.items
+
+    def __len__(self):
+        return len(self.items)
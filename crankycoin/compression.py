@@ -0,0 +1,82 @@
+import zlib
+
+GZIP = "gzip"
+DEFLATE = "deflate"
+SUPPORTED_ENCODINGS = (GZIP, DEFLATE)
+COMPRESSION_LEVEL = 6
+# smaller bodies are sent as is; the framing overhead outweighs the savings
+MIN_COMPRESSED_SIZE = 512
+
+
+def negotiate_encoding(request):
+    """
+    Picks gzip or deflate from the request's Accept-Encoding header, honouring q=0
+
+    :param request: twisted web request
+    :type request: twisted.web.server.Request
+
+    :return: content coding or None for identity
+    :rtype: str
+    """
+    accepted = set()
+    refused = set()
+    for coding in (request.getHeader("Accept-Encoding") or "").split(","):
+        params = coding.split(";")
+        quality = 1.0
+        for param in params[1:]:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        name = params[0].strip().lower()
+        if quality > 0:
+            accepted.add(name)
+        else:
+            refused.add(name)
+    for encoding in SUPPORTED_ENCODINGS:
+        # an explicit q=0 refusal wins over the wildcard
+        if encoding not in refused and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
+
+def compressor(encoding):
+    if encoding == GZIP:
+        return zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zlib.compressobj(COMPRESSION_LEVEL)
+
+
+def compress(data, encoding):
+    compressobj = compressor(encoding)
+    return compressobj.compress(data) + compressobj.flush()
+
+
+def set_encoding_headers(request, encoding):
+    request.setHeader("Vary", "Accept, Accept-Encoding")
+    if encoding is not None:
+        request.setHeader("Content-Encoding", encoding)
+
+
+def render_compressed(request, data, encoding=None):
+    """
+    Compresses a response body with the negotiated content coding
+
+    :param request: twisted web request
+    :type request: twisted.web.server.Request
+    :param data: response body
+    :type data: str
+    :param encoding: content coding, negotiated from the request if not given
+    :type encoding: str
+
+    :return: response body
+    :rtype: str
+    """
+    if encoding is None:
+        encoding = negotiate_encoding(request)
+    if encoding is None or len(data) < MIN_COMPRESSED_SIZE:
+        set_encoding_headers(request, None)
+        return data
+    set_encoding_headers(request, encoding)
+    return compress(data, encoding)
@@ -0,0 +1,157 @@
+import bisect
+import threading
+import time
+
+from contextlib import contextmanager
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"
+# seconds. from sub-millisecond handlers up to a slow sync.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+
+    def render(self):
+        """
+        :return: every registered metric in the Prometheus text exposition format
+        :rtype: str
+        """
+        with self.lock:
+            metrics = list(self.metrics)
+        return "".join(metric.render() for metric in metrics)
+
+
+REGISTRY = Registry()
+
+
+class Metric(object):
+    TYPE = None
+
+    def __init__(self, name, documentation, labels=(), registry=REGISTRY):
+        """
+        :param name: metric name
+        :type name: str
+        :param documentation: help text
+        :type documentation: str
+        :param labels: label names.  values are passed positionally in the same order.
+        :type labels: tuple of str
+        :param registry: registry the metric is rendered from
+        :type registry: Registry
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+        if registry is not None:
+            registry.register(self)
+
+    def render(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.documentation),
+            "# TYPE {} {}".format(self.name, self.TYPE)
+        ]
+        with self.lock:
+            values = sorted((label_values, self.copy_value(value)) for label_values, value in self.values.items())
+        for label_values, value in values:
+            lines.extend(self.render_value(label_values, value))
+        return "\n".join(lines) + "\n"
+
+    def copy_value(self, value):
+        return value
+
+    def render_value(self, label_values, value):
+        return ["{}{} {}".format(self.name, _format_labels(self.labels, label_values), _format_value(value))]
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def inc(self, amount=1, labels=()):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, labels=()):
+        return self.values.get(labels, 0)
+
+
+class Gauge(Metric):
+    TYPE = "gauge"
+
+    def set(self, value, labels=()):
+        with self.lock:
+            self.values[labels] = value
+
+    def get(self, labels=()):
+        return self.values.get(labels, 0)
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super(Histogram, self).__init__(name, documentation, labels, registry)
+
+    def observe(self, value, labels=()):
+        # bucket counts are kept per bucket and only made cumulative when rendered
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            histogram = self.values.get(labels)
+            if histogram is None:
+                histogram = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def time(self, labels=()):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - start, labels)
+
+    def get_count(self, labels=()):
+        histogram = self.values.get(labels)
+        return 0 if histogram is None else histogram[2]
+
+    def copy_value(self, value):
+        return [value[0][:], value[1], value[2]]
+
+    def render_value(self, label_values, value):
+        counts, total, count = value
+        names = self.labels + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            lines.append("{}_bucket{} {}".format(
+                self.name, _format_labels(names, label_values + (_format_value(bound),)), cumulative))
+        lines.append("{}_sum{} {}".format(self.name, _format_labels(self.labels, label_values), _format_value(total)))
+        lines.append("{}_count{} {}".format(self.name, _format_labels(self.labels, label_values), count))
+        return lines
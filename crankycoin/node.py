@@ -1,29 +1,79 @@
 import grequests
+import itertools
+import logging
 import requests
+import time
 
 from blockchain import *
+from cache import LRUCache
+from compression import *
 from klein import Klein
+from metrics import *
+from peers import *
+from streaming import *
+from tracing import *
+from twisted.internet import defer
+from twisted.internet.threads import deferToThread
+from wire import *
 
 FULL_NODE_PORT = "30013"
 NODES_URL = "http://{}:{}/nodes"
 TRANSACTIONS_URL = "http://{}:{}/transactions"
+TRANSACTIONS_BATCH_URL = "http://{}:{}/transactions/batch"
+INVENTORY_URL = "http://{}:{}/inventory"
 BLOCK_URL = "http://{}:{}/block/{}"
 BLOCKS_RANGE_URL = "http://{}:{}/blocks/{}/{}"
 BLOCKS_URL = "http://{}:{}/blocks"
+BLOCKS_STREAM_URL = "http://{}:{}/blocks/stream"
+BLOCKS_RANGE_STREAM_URL = "http://{}:{}/blocks/stream/{}/{}"
+BLOCKS_LOCATOR_URL = "http://{}:{}/blocks/locator"
+COMPACT_BLOCKS_URL = "http://{}:{}/blocks/compact"
+COMPACT_BLOCK_TRANSACTIONS_URL = "http://{}:{}/blocks/compact/{}/transactions"
 TRANSACTION_HISTORY_URL = "http://{}:{}/address/{}/transactions"
 BALANCE_URL = "http://{}:{}/address/{}/balance"
 
+logger = logging.getLogger(__name__)
+
+HTTP_REQUEST_SECONDS = Histogram("crankycoin_http_request_seconds", "Time spent handling HTTP requests, by route", ("endpoint",))
+BROADCAST_SECONDS = Histogram("crankycoin_broadcast_seconds", "Time spent relaying a mined block, by peer", ("peer",))
+SYNC_LAG_BLOCKS = Gauge("crankycoin_sync_lag_blocks", "Blocks between the local tip and the best tip reported by a peer")
+MEMPOOL_TRANSACTIONS = Gauge("crankycoin_mempool_transactions", "Unconfirmed transactions waiting to be mined")
+MEMPOOL_OLDEST_AGE_SECONDS = Gauge("crankycoin_mempool_oldest_age_seconds", "Seconds the oldest unconfirmed transaction has waited")
+
+
+class InstrumentedKlein(Klein):
+
+    def execute_endpoint(self, endpoint, *args, **kwargs):
+        # handlers may return a deferred, so the timer stops once the response is ready rather than on return
+        start = time.time()
+
+        def observe(result):
+            HTTP_REQUEST_SECONDS.observe(time.time() - start, (endpoint,))
+            return result
+
+        return defer.maybeDeferred(Klein.execute_endpoint, self, endpoint, *args, **kwargs).addBoth(observe)
+
 
 class NodeMixin(object):
+    host = None
     # TODO: store the nodes in an external configuration file
-    full_nodes = {"127.0.0.1"}
+    SEED_NODES = {"127.0.0.1"}
+    # seconds a peer table is served from cache before it is re-requested from all nodes
+    NODES_TTL = 60
+
+    def __init__(self):
+        # every node and client keeps its own peer table and keep-alive connections
+        self.full_nodes = set(self.SEED_NODES)
+        self.full_nodes_last_seen = {}
+        self.full_nodes_refreshed_at = 0
+        self.peer_pool = PeerConnectionPool()
 
     def request_nodes(self, node, port):
         url = NODES_URL.format(node, port)
         try:
-            response = requests.get(url)
+            response = self.peer_pool.get(url)
             if response.status_code == 200:
-                all_nodes = response.json()
+                all_nodes = decode_response(response)
                 return all_nodes
         except requests.exceptions.RequestException as re:
             pass
@@ -32,71 +82,178 @@ class NodeMixin(object):
     def request_nodes_from_all(self):
         full_nodes = self.full_nodes.copy()
         bad_nodes = set()
+        last_seen = self.full_nodes_last_seen.copy()
 
-        for node in full_nodes:
+        for node in self.select_nodes(full_nodes):
             all_nodes = self.request_nodes(node, FULL_NODE_PORT)
             if all_nodes is not None:
                 full_nodes = full_nodes.union(all_nodes["full_nodes"])
+                last_seen[node] = time.time()
             else:
                 bad_nodes.add(node)
         self.full_nodes = full_nodes
+        self.full_nodes_last_seen = last_seen
+        self.full_nodes_refreshed_at = time.time()
 
         for node in bad_nodes:
             self.remove_node(node)
         return
 
+    def refresh_nodes(self):
+        """
+        Re-requests the peer table from all nodes only once the cached table is older than NODES_TTL
+        """
+        if time.time() - self.full_nodes_refreshed_at >= self.NODES_TTL:
+            self.request_nodes_from_all()
+        return
+
+    def select_nodes(self, nodes=None):
+        """
+        Healthy nodes ordered by latency.  Nodes backing off after repeated failures are skipped.
+
+        :param nodes: candidate nodes, defaults to full_nodes
+        :type nodes: set
+
+        :return: nodes to contact, fastest first
+        :rtype: list
+        """
+        if nodes is None:
+            nodes = self.full_nodes.copy()
+        return self.peer_pool.health.rank(nodes)
+
     def remove_node(self, node):
-        # nodeset.discard(node)
-        pass
+        # only evict after sustained failure; transient failures are handled by backoff
+        if self.peer_pool.health.should_evict(node):
+            self.full_nodes.discard(node)
+            self.full_nodes_last_seen.pop(node, None)
+        return
 
     def broadcast_transaction(self, transaction):
-        self.request_nodes_from_all()
+        self.refresh_nodes()
+        return self.announce_transactions([transaction])
+
+    def announce_transactions(self, transactions, exclude=None):
+        """
+        Advertises transaction hashes to all nodes and sends only the bodies each node asks for
+
+        :param transactions: transactions to announce
+        :type transactions: list of transaction dicts
+        :param exclude: node that should not be announced to (e.g. the node the transactions came from)
+        :type exclude: str
+        """
         bad_nodes = set()
+        transactions_by_hash = dict((transaction["hash"], transaction) for transaction in transactions)
         data = {
-            "transaction": transaction
+            "host": self.host,
+            "transactions": transactions_by_hash.keys()
         }
 
-        for node in self.full_nodes:
-            url = TRANSACTIONS_URL.format(node, FULL_NODE_PORT)
+        for node in self.select_nodes():
+            if node == self.host or node == exclude:
+                continue
             try:
-                response = requests.post(url, json=data)
+                response = self.peer_pool.post(INVENTORY_URL.format(node, FULL_NODE_PORT), json=data)
+                if response.status_code == 404:
+                    # node predates inventory gossip. send every body.
+                    wanted = transactions_by_hash.keys()
+                    for transaction_hash in wanted:
+                        self.peer_pool.post(
+                            TRANSACTIONS_URL.format(node, FULL_NODE_PORT),
+                            json={"transaction": transactions_by_hash[transaction_hash]})
+                    continue
+                if response.status_code != 200:
+                    continue
+                wanted = [h for h in decode_response(response)["wanted"] if h in transactions_by_hash]
+                if wanted:
+                    self.peer_pool.post(
+                        TRANSACTIONS_URL.format(node, FULL_NODE_PORT),
+                        json={"host": self.host, "transactions": [transactions_by_hash[h] for h in wanted]})
             except requests.exceptions.RequestException as re:
                 bad_nodes.add(node)
+            except (ValueError, KeyError, TypeError):
+                # the node gets the transactions with the next block instead
+                logger.warning("Malformed inventory response from %s", node)
         for node in bad_nodes:
             self.remove_node(node)
         bad_nodes.clear()
         return
-        # convert to grequests and return list of responses
 
 
 class FullNode(NodeMixin):
     NODE_TYPE = "full"
+    KNOWN_TRANSACTIONS_SIZE = 100000
+    RELAYED_BLOCKS_SIZE = 16
+    COMPRESSED_RANGES_SIZE = 256
+    BLOCK_RESPONSES_SIZE = 1024
+    INVENTORY_RELAY_INTERVAL = 1
+    MAX_LOCATOR_HEADERS = 2000
+    # transactions accepted by one batch request, and how many are checked per worker thread
+    MAX_BATCH_TRANSACTIONS = 10000
+    BATCH_CHECK_CHUNK = 100
+    # seconds to wait for the nodes' latest blocks, and how many nodes must agree on a tip to sync before that
+    TIP_POLL_DEADLINE = 5
+    SYNC_QUORUM = 2
     blockchain = None
-    app = Klein()
+    app = InstrumentedKlein()
 
-    def __init__(self, host, reward_address, block_path=None):
+    def __init__(self, host, reward_address, block_path=None, start=True):
+        """
+        :param host: address the node listens on and announces to its peers
+        :type host: str
+        :param reward_address: address block rewards are paid to
+        :type reward_address: str
+        :param block_path: chain to load instead of starting from the genesis block
+        :type block_path: str
+        :param start: join the network, start mining and serve requests until the reactor stops.  Without it the
+            caller runs start() and listens itself, e.g. to run several nodes in one process.
+        :type start: bool
+        """
+        super(FullNode, self).__init__()
         self.host = host
-        self.request_nodes_from_all()
+        self.known_transactions = LRUCache(self.KNOWN_TRANSACTIONS_SIZE)
+        self.relay_queue = []
+        self.relay_queue_lock = threading.Lock()
+        self.relayed_blocks = LRUCache(self.RELAYED_BLOCKS_SIZE)
+        self.compressed_ranges = LRUCache(self.COMPRESSED_RANGES_SIZE)
+        self.block_responses = LRUCache(self.BLOCK_RESPONSES_SIZE)
+        self.block_processing_lock = threading.Lock()
         self.reward_address = reward_address
-        self.broadcast_node(host)
-        self.full_nodes.add(host)
         if block_path is None:
             self.blockchain = Blockchain()
         else:
             self.load_blockchain(block_path)
+        if start:
+            self.start()
+            self.run()
+
+    def start(self):
+        """
+        Announces the node to the network and starts the mining, peer refresh and relay threads
+        """
+        self.request_nodes_from_all()
+        self.broadcast_node(self.host)
+        self.full_nodes.add(self.host)
 
         thread = threading.Thread(target=self.mine, args=())
         thread.daemon = True
         thread.start()
+        thread = threading.Thread(target=self.refresh_nodes_periodically, args=())
+        thread.daemon = True
+        thread.start()
+        thread = threading.Thread(target=self.relay_transactions, args=())
+        thread.daemon = True
+        thread.start()
+
+    def run(self):
         print "\n\nfull node server started...\n\n"
-        self.app.run(host, FULL_NODE_PORT)
+        self.app.run(self.host, FULL_NODE_PORT)
 
     def request_block(self, node, port, index="latest"):
         url = BLOCK_URL.format(node, port, index)
         try:
-            response = requests.get(url)
+            response = self.peer_pool.get(url)
             if response.status_code == 200:
-                block_dict = json.loads(response.json())
+                block_dict = decode_response(response)
                 block = Block(
                     block_dict['index'],
                     block_dict['transactions'],
@@ -116,7 +273,7 @@ class FullNode(NodeMixin):
         full_nodes = self.full_nodes.copy()
         bad_nodes = set()
 
-        for node in full_nodes:
+        for node in self.select_nodes(full_nodes):
             block = self.request_block(node, FULL_NODE_PORT, index)
             if block is not None:
                 blocks.append(block)
@@ -131,9 +288,9 @@ class FullNode(NodeMixin):
         url = BLOCKS_RANGE_URL.format(node, port, start_index, stop_index)
         blocks = []
         try:
-            response = requests.get(url)
+            response = self.peer_pool.get(url)
             if response.status_code == 200:
-                blocks_dict = json.loads(response.json())
+                blocks_dict = decode_response(response)
                 for block_dict in blocks_dict:
                     block = Block(
                         block_dict['index'],
@@ -153,9 +310,9 @@ class FullNode(NodeMixin):
         url = BLOCKS_URL.format(node, port)
         blocks = []
         try:
-            response = requests.get(url)
+            response = self.peer_pool.get(url)
             if response.status_code == 200:
-                blocks_dict = json.loads(response.json())
+                blocks_dict = decode_response(response)
                 for block_dict in blocks_dict:
                     block = Block(
                         block_dict['index'],
@@ -171,9 +328,248 @@ class FullNode(NodeMixin):
             pass
         return None
 
+    def request_blocks_stream(self, node, port, start_index=None, stop_index=None):
+        """
+        Yields blocks from a node as they arrive without holding the whole response in memory.
+        Falls back to the buffered endpoints for nodes that do not stream.
+
+        :return: generator of blocks
+        :rtype: generator
+        """
+        if start_index is None:
+            url = BLOCKS_STREAM_URL.format(node, port)
+        else:
+            url = BLOCKS_RANGE_STREAM_URL.format(node, port, start_index, stop_index)
+        try:
+            response = self.peer_pool.get(url, stream=True)
+            try:
+                if response.status_code == 404:
+                    if start_index is None:
+                        blocks = self.request_blockchain(node, port)
+                    else:
+                        blocks = self.request_blocks_range(node, port, start_index, stop_index)
+                    for block in blocks or []:
+                        yield block
+                    return
+                if response.status_code != 200:
+                    return
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    block_dict = json.loads(line)
+                    yield Block(
+                        block_dict['index'],
+                        block_dict['transactions'],
+                        block_dict['previous_hash'],
+                        block_dict['current_hash'],
+                        block_dict['timestamp'],
+                        block_dict['nonce']
+                    )
+            finally:
+                response.close()
+        except requests.exceptions.RequestException as re:
+            pass
+        return
+
+    def request_fork_point(self, node, port):
+        """
+        Sends our block locator and lets the node pick the latest block we have in common.
+        Falls back to walking back one block at a time for nodes without the locator endpoint.
+
+        :return: index of the latest common block and the headers of the node's blocks after it
+        :rtype: tuple(int, list) or None
+        """
+        url = BLOCKS_LOCATOR_URL.format(node, port)
+        data = {
+            "locator": self.blockchain.get_block_locator()
+        }
+        try:
+            response = self.peer_pool.post(url, json=data)
+            if response.status_code == 404:
+                return self.request_fork_point_by_walk(node, port)
+            if response.status_code == 200:
+                body = decode_response(response)
+                return body["index"], body["headers"]
+        except requests.exceptions.RequestException as re:
+            pass
+        return None
+
+    def request_fork_point_by_walk(self, node, port):
+        for i in range(self.blockchain.get_latest_block().index, 0, -1):
+            # step backwards and look for the first remote block that fits the local chain
+            block = self.request_block(node, port, str(i))
+            if block is None:
+                return None
+            if block.previous_hash == self.blockchain.get_block_by_index(i-1).current_hash:
+                return i - 1, []
+        return None
+
+    @traced()
+    def sync_fork(self, remote_host, stop_index):
+        """
+        Replaces the local chain from the latest block shared with a node on a longer fork
+
+        :return: True if the local chain was replaced
+        :rtype: bool
+        """
+        fork_point = self.request_fork_point(remote_host, FULL_NODE_PORT)
+        if fork_point is None:
+            logger.warning("No common block found with %s", remote_host)
+            return False
+        fork_index, headers = fork_point
+        fork_block = None
+        if isinstance(fork_index, (int, long)):
+            fork_block = self.blockchain.get_snapshot().get_block_by_index(fork_index)
+        if fork_block is None:
+            logger.warning("Fork point %s from %s is not in the local chain", fork_index, remote_host)
+            return False
+        previous_hash = fork_block.current_hash
+        for header in headers:
+            # cheap continuity check before downloading any block bodies
+            if header["previous_hash"] != previous_hash:
+                logger.warning("Headers from %s do not connect", remote_host)
+                return False
+            previous_hash = header["current_hash"]
+        remote_diff_blocks = list(self.request_blocks_stream(remote_host, FULL_NODE_PORT, fork_index + 1, stop_index))
+        if len(remote_diff_blocks) == 0:
+            return False
+        with self.block_processing_lock:
+            result = self.alter_chain(remote_diff_blocks)
+        if not result:
+            logger.warning("Fork from %s rejected", remote_host)
+        return result
+
+    def refresh_nodes_periodically(self):
+        # refresh ahead of expiry so hot paths always read a cached peer table
+        while True:
+            time.sleep(self.NODES_TTL / 2.0)
+            self.request_nodes_from_all()
+
+    def relay_transactions(self):
+        # announce newly admitted transactions in batches rather than one message per transaction
+        while True:
+            time.sleep(self.INVENTORY_RELAY_INTERVAL)
+            with self.relay_queue_lock:
+                queued, self.relay_queue = self.relay_queue, []
+            sources = {}
+            for transaction, source in queued:
+                sources.setdefault(source, []).append(transaction)
+            for source, transactions in sources.items():
+                try:
+                    self.announce_transactions(transactions, exclude=source)
+                except Exception:
+                    # one failed announcement must not end relaying for the life of the node
+                    logger.exception("Relaying %s transactions failed", len(transactions))
+
+    def admit_transaction(self, transaction, source=None):
+        """
+        Checks the hash and signature of an unseen transaction, then admits it.  Verifying signatures blocks, so
+        call this off the reactor.
+
+        :return: True if the transaction was valid and new
+        :rtype: bool
+        """
+        if not self.is_well_formed_transaction(transaction):
+            return False
+        # skip the signature check for transactions that were already admitted or relayed to us before
+        if transaction["hash"] in self.known_transactions:
+            return False
+        if self.check_transaction(transaction) is not None:
+            return False
+        return self.admit_checked_transaction(transaction, source)
+
+    def admit_checked_transaction(self, transaction, source=None):
+        """
+        Pushes an unseen transaction that passed check_transaction into the unconfirmed pool and queues it for relay
+
+        :return: True if the transaction was new
+        :rtype: bool
+        """
+        transaction_hash = transaction["hash"]
+        if transaction_hash in self.known_transactions:
+            return False
+        self.known_transactions.put(transaction_hash, True)
+        self.blockchain.push_unconfirmed_transaction(transaction)
+        with self.relay_queue_lock:
+            self.relay_queue.append((transaction, source))
+        return True
+
+    def is_well_formed_transaction(self, transaction):
+        """
+        A submitted transaction has exactly the transaction fields, a numeric amount and string keys, signature,
+        timestamp and hash.  Anything else could not be signed consistently or sent in the binary wire format.
+
+        :rtype: bool
+        """
+        if not isinstance(transaction, dict) or set(transaction) != set(TRANSACTION_FIELDS):
+            return False
+        if isinstance(transaction["amount"], bool) or not isinstance(transaction["amount"], (int, long, float)):
+            return False
+        return all(isinstance(transaction[field], basestring) for field in TRANSACTION_FIELDS if field != "amount")
+
+    def check_transaction(self, transaction):
+        """
+        :return: why the transaction is invalid, None if its hash and signature are valid
+        :rtype: str
+        """
+        if not self.is_well_formed_transaction(transaction):
+            return "malformed transaction"
+        try:
+            if transaction["hash"] != self.blockchain.calculate_transaction_hash(transaction):
+                return "invalid hash"
+            if not self.blockchain.verify_signature(
+                    transaction["signature"],
+                    ":".join((
+                        transaction["from"],
+                        transaction["to"],
+                        str(transaction["amount"]),
+                        str(transaction["timestamp"]))),
+                    transaction["from"]):
+                return "invalid signature"
+        except Exception:
+            # pyelliptic raises a bare Exception for keys and signatures it cannot parse
+            return "malformed transaction"
+        return None
+
+    def check_transactions(self, transactions):
+        return [self.check_transaction(transaction) for transaction in transactions]
+
+    def admit_transactions(self, transactions, errors, source=None):
+        """
+        Admits the transactions that passed their checks and are neither known nor in a block
+
+        :param transactions: submitted transactions
+        :type transactions: list of dict
+        :param errors: check_transaction's result for every transaction
+        :type errors: list of str
+        :param source: node the transactions came from
+        :type source: str
+
+        :return: dict(hash, accepted, (message)) for every transaction, in order
+        :rtype: list of dict
+        """
+        confirmed = self.blockchain.find_confirmed_transactions(
+            transaction["hash"] for transaction, error in zip(transactions, errors) if error is None)
+        results = []
+        for transaction, error in zip(transactions, errors):
+            if error is None and transaction["hash"] in confirmed:
+                error = "already in a block"
+            if error is None and not self.admit_checked_transaction(transaction, source):
+                error = "duplicate transaction"
+            result = {
+                "hash": transaction.get("hash") if isinstance(transaction, dict) else None,
+                "accepted": error is None
+            }
+            if error is not None:
+                result["message"] = error
+            results.append(result)
+        return results
+
     def mine(self):
         print "\n\nmining started...\n\n"
         while True:
+            # sleep instead of spinning while there is nothing worth mining
+            self.blockchain.wait_for_unconfirmed_transactions()
             latest_block = self.blockchain.get_latest_block()
             latest_hash = latest_block.current_hash
             latest_index = latest_block.index
@@ -194,28 +590,36 @@ class FullNode(NodeMixin):
             self.blockchain.add_block(block)
 
     def broadcast_block(self, block):
-        #TODO convert to grequests and concurrently gather a list of responses
         statuses = {
             "confirmations": 0,
             "invalidations": 0,
             "expirations": 0
         }
 
-        self.request_nodes_from_all()
+        self.refresh_nodes()
         bad_nodes = set()
-        data = {
-            "block": block.to_json(),
+        # peers rebuild the block from their own unconfirmed pool and fetch missing transactions from here
+        self.relayed_blocks.put(block.current_hash, block)
+        compact_data = {
+            "block": block.to_compact(),
             "host": self.host
         }
 
-        for node in self.full_nodes:
+        for node in self.select_nodes():
             if node == self.host:
                 continue
-            url = BLOCKS_URL.format(node, FULL_NODE_PORT)
+            start = time.time()
             try:
-                response = requests.post(url, json=data)
+                response = self.peer_pool.post(COMPACT_BLOCKS_URL.format(node, FULL_NODE_PORT), json=compact_data)
+                if response.status_code == 404:
+                    # node predates compact blocks. send the full block.
+                    data = {
+                        "block": block.to_json(),
+                        "host": self.host
+                    }
+                    response = self.peer_pool.post(BLOCKS_URL.format(node, FULL_NODE_PORT), json=data)
                 if response.status_code == 202:
-                    # confirmed and accepted by node
+                    # accepted by node, validation continues in the background
                     statuses["confirmations"] += 1
                 elif response.status_code == 406:
                     # invalidated and rejected by node
@@ -225,11 +629,60 @@ class FullNode(NodeMixin):
                     statuses["expirations"] += 1
             except requests.exceptions.RequestException as re:
                 bad_nodes.add(node)
+            BROADCAST_SECONDS.observe(time.time() - start, (node,))
         for node in bad_nodes:
             self.remove_node(node)
         bad_nodes.clear()
         return statuses
 
+    def request_compact_block_transactions(self, node, port, block_hash, transaction_hashes):
+        url = COMPACT_BLOCK_TRANSACTIONS_URL.format(node, port, block_hash)
+        try:
+            response = self.peer_pool.post(url, json={"hashes": transaction_hashes})
+            if response.status_code == 200:
+                return decode_response(response)
+        except requests.exceptions.RequestException as re:
+            pass
+        return None
+
+    def reconstruct_block(self, compact_block, remote_host):
+        """
+        Rebuilds a full block from a compact block using the local unconfirmed pool,
+        fetching only the transactions missing locally from the remote host
+
+        :param compact_block: compact block
+        :type compact_block: dict(index, previous_hash, current_hash, timestamp, nonce, transaction_hashes, coinbase)
+        :param remote_host: host that relayed the compact block
+        :type remote_host: str
+
+        :return: full block or None if missing transactions could not be fetched
+        :rtype: Block
+        """
+        transaction_hashes = compact_block["transaction_hashes"]
+        unconfirmed = dict((transaction["hash"], transaction)
+                           for transaction in list(self.blockchain.get_all_unconfirmed_transactions()))
+        missing = [h for h in transaction_hashes if h not in unconfirmed]
+        if missing:
+            fetched = self.request_compact_block_transactions(
+                remote_host, FULL_NODE_PORT, compact_block["current_hash"], missing)
+            if fetched is None:
+                return None
+            for transaction in fetched:
+                unconfirmed[transaction["hash"]] = transaction
+        try:
+            transactions = [unconfirmed[h] for h in transaction_hashes]
+        except KeyError:
+            return None
+        transactions.append(compact_block["coinbase"])
+        return Block(
+            compact_block["index"],
+            transactions,
+            compact_block["previous_hash"],
+            compact_block["current_hash"],
+            compact_block["timestamp"],
+            compact_block["nonce"]
+        )
+
     def add_node(self, host):
         if host == self.host:
             return
@@ -237,20 +690,21 @@ class FullNode(NodeMixin):
         if host not in self.full_nodes:
             self.broadcast_node(host)
             self.full_nodes.add(host)
+        self.full_nodes_last_seen[host] = time.time()
 
     def broadcast_node(self, host):
-        self.request_nodes_from_all()
+        self.refresh_nodes()
         bad_nodes = set()
         data = {
             "host": host
         }
 
-        for node in self.full_nodes:
+        for node in self.select_nodes():
             if node == self.host:
                 continue
             url = NODES_URL.format(node, FULL_NODE_PORT)
             try:
-                requests.post(url, json=data)
+                self.peer_pool.post(url, json=data)
             except requests.exceptions.RequestException as re:
                 bad_nodes.add(node)
         for node in bad_nodes:
@@ -258,11 +712,28 @@ class FullNode(NodeMixin):
         bad_nodes.clear()
         return
 
+    def alter_chain(self, blocks):
+        """
+        Replaces the local chain from the fork point and drops cached responses for the replaced blocks
+        """
+        replaced_blocks = self.blockchain.get_blocks_range(blocks[0].index, self.blockchain.get_latest_block().index)
+        result = self.blockchain.alter_chain(blocks)
+        if result:
+            for block in replaced_blocks:
+                for content_type in (None, WIRE_JSON_CONTENT_TYPE, WIRE_BINARY_CONTENT_TYPE):
+                    self.block_responses.pop((block.current_hash, content_type))
+        return result
+
     def load_blockchain(self, block_path):
         # TODO load blockchain from path
         pass
 
+    @traced()
     def synchronize(self):
+        """
+        Polls every node's latest block concurrently and syncs towards the longest chain.  Syncing starts as soon
+        as SYNC_QUORUM nodes agree on a tip ahead of ours; otherwise once every node answered or the deadline passed.
+        """
         my_latest_block = self.blockchain.get_latest_block()
         """
         latest_blocks = {
@@ -277,70 +748,87 @@ class FullNode(NodeMixin):
         """
         latest_blocks = {}
 
-        self.request_nodes_from_all()
+        self.refresh_nodes()
         bad_nodes = set()
-        for node in self.full_nodes:
-            url = BLOCK_URL.format(node, FULL_NODE_PORT, "latest")
-            try:
-                response = requests.get(url)
-                if response.status_code == 200:
-                    remote_latest_block = response.json()
-                    if remote_latest_block["index"] <= my_latest_block.index:
-                        continue
-                    if latest_blocks.get(remote_latest_block["index"], None) is None:
-                        latest_blocks[remote_latest_block["index"]] = {
-                            remote_latest_block["current_hash"]: [node]
-                        }
-                        continue
-                    if latest_blocks[remote_latest_block["index"]].get(remote_latest_block["current_hash"], None) is None:
-                        latest_blocks[remote_latest_block["index"]][remote_latest_block["current_hash"]] = [node]
-                        continue
-                    latest_blocks[remote_latest_block["index"]][remote_latest_block["current_hash"]].append(node)
-            except requests.exceptions.RequestException as re:
+        urls = {}
+        for node in self.select_nodes():
+            if node == self.host:
+                continue
+            urls[BLOCK_URL.format(node, FULL_NODE_PORT, "latest")] = node
+        quorum = min(self.SYNC_QUORUM, len(urls))
+        agreed = None
+        for url, response in self.peer_pool.get_all(urls.keys(), self.TIP_POLL_DEADLINE):
+            node = urls[url]
+            if response is None:
                 bad_nodes.add(node)
+                continue
+            if response.status_code != 200:
+                continue
+            remote_latest_block = decode_response(response)
+            if remote_latest_block["index"] <= my_latest_block.index:
+                continue
+            current_hashes = latest_blocks.setdefault(remote_latest_block["index"], {})
+            current_hashes.setdefault(remote_latest_block["current_hash"], []).append(node)
+            if len(current_hashes[remote_latest_block["current_hash"]]) >= quorum:
+                # enough nodes agree. don't wait for the slowest ones.
+                agreed = remote_latest_block["index"], current_hashes[remote_latest_block["current_hash"]]
+                break
+        for node in bad_nodes:
+            self.remove_node(node)
         if len(latest_blocks) > 0:
-            for latest_block in sorted(latest_blocks.items(), reverse=True):
-                index = latest_block[0]
-                current_hashes = latest_block[1]
-                success = True
-                for current_hash in current_hashes:
-                    remote_host = current_hash[1][0]
-
-                    remote_diff_blocks = self.request_blocks_range(
-                        remote_host,
-                        FULL_NODE_PORT,
-                        my_latest_block.index + 1,
-                        index
-                    )
-                    if remote_diff_blocks[0].previous_hash == my_latest_block.current_hash:
-                        # first block in diff blocks fit local chain
-                        for block in remote_diff_blocks:
-                            result = self.blockchain.add_block(block)
-                            if not result:
-                                success = False
-                                break
-                    else:
-                        # first block in diff blocks does not fit local chain
-                        for i in range(my_latest_block.index, 1, -1):
-                            # step backwards and look for the first remote block that fits the local chain
-                            block = self.request_block(remote_host, FULL_NODE_PORT, str(i))
-                            remote_diff_blocks[0:0] = [block]
-                            if block.previous_hash == self.blockchain.get_block_by_index(i-1):
-                                # found the fork
-                                result = self.blockchain.alter_chain(remote_diff_blocks)
-                                success = result
-                                break
-                        success = False
-                    if success:
-                        break
-                if success:
-                    break
+            SYNC_LAG_BLOCKS.set(max(latest_blocks) - my_latest_block.index)
+        else:
+            SYNC_LAG_BLOCKS.set(0)
+
+        # blocks announced while polling may have moved our tip
+        my_latest_block = self.blockchain.get_latest_block()
+        if agreed is not None and agreed[0] > my_latest_block.index:
+            index, nodes = agreed
+            for remote_host in nodes:
+                if self.sync_with_node(remote_host, my_latest_block, index):
+                    return
+        for index, current_hashes in sorted(latest_blocks.items(), reverse=True):
+            if index <= my_latest_block.index:
+                break
+            for nodes in current_hashes.values():
+                if self.sync_with_node(nodes[0], my_latest_block, index):
+                    return
         return
 
+    def sync_with_node(self, remote_host, my_latest_block, index):
+        """
+        Fetches the node's blocks up to index, extending the local chain or switching to the node's fork.
+        block_processing_lock is only held to apply blocks, never while downloading them.
+
+        :return: True if the local chain was extended or replaced
+        :rtype: bool
+        """
+        remote_diff_blocks = self.request_blocks_stream(
+            remote_host,
+            FULL_NODE_PORT,
+            my_latest_block.index + 1,
+            index
+        )
+        first_block = next(remote_diff_blocks, None)
+        if first_block is None:
+            return False
+        if first_block.previous_hash == my_latest_block.current_hash:
+            # first block in diff blocks fit local chain. validate each block as it arrives.
+            for block in itertools.chain([first_block], remote_diff_blocks):
+                with self.block_processing_lock:
+                    result = self.blockchain.add_block(block)
+                if not result:
+                    return False
+            return True
+        # first block in diff blocks does not fit local chain
+        remote_diff_blocks.close()
+        return self.sync_fork(remote_host, index)
+
     @app.route('/nodes', methods=['POST'])
     def post_node(self, request):
-        body = json.loads(request.content.read())
-        self.add_node(body['host'])
+        body = decode_request(request)
+        # adding a new node broadcasts it to every peer. keep that off the reactor.
+        deferToThread(self.add_node, body['host']).addErrback(self.log_background_failure)
         return json.dumps({'success': True})
 
     @app.route('/nodes', methods=['GET'])
@@ -350,14 +838,57 @@ class FullNode(NodeMixin):
         }
         return json.dumps(nodes)
 
+    @app.route('/inventory', methods=['POST'])
+    def post_inventory(self, request):
+        body = decode_request(request)
+        wanted = [h for h in body['transactions'] if h not in self.known_transactions]
+        return json.dumps({'wanted': wanted})
+
     @app.route('/transactions', methods=['POST'])
     def post_transactions(self, request):
-        body = json.loads(request.content.read())
-        return json.dumps({'success': self.blockchain.push_unconfirmed_transaction(body['transaction'])})
+        body = decode_request(request)
+        transactions = body['transactions'] if 'transactions' in body else [body['transaction']]
+
+        def admit():
+            # signatures are verified before anything is pooled or relayed, on a worker thread like batches
+            for transaction in transactions:
+                self.admit_transaction(transaction, body.get('host'))
+            return json.dumps({'success': True})
+
+        return deferToThread(admit)
+
+    @app.route('/transactions/batch', methods=['POST'])
+    def post_transactions_batch(self, request):
+        """
+        Checks and admits many transactions.  Signatures are checked in chunks on worker threads; OpenSSL releases
+        the GIL while it verifies.  body: dict(transactions, (host))
+        """
+        body = decode_request(request)
+        transactions = body.get('transactions')
+        if not isinstance(transactions, list):
+            request.setResponseCode(400)  # bad request
+            return json.dumps({'message': 'transactions must be a list'})
+        if len(transactions) > self.MAX_BATCH_TRANSACTIONS:
+            request.setResponseCode(413)  # request entity too large
+            return json.dumps({'message': 'at most {} transactions per batch'.format(self.MAX_BATCH_TRANSACTIONS)})
+
+        def admit(checked):
+            errors = [error for chunk in checked for error in chunk]
+            return deferToThread(self.admit_transactions, transactions, errors, body.get('host'))
+
+        def respond(results):
+            accepted = sum(1 for result in results if result['accepted'])
+            return json.dumps({'accepted': accepted, 'rejected': len(results) - accepted, 'results': results})
+
+        chunks = [transactions[i:i + self.BATCH_CHECK_CHUNK]
+                  for i in range(0, len(transactions), self.BATCH_CHECK_CHUNK)]
+        d = defer.gatherResults([deferToThread(self.check_transactions, chunk) for chunk in chunks], consumeErrors=True)
+        return d.addCallback(admit).addCallback(respond)
 
     @app.route('/transactions', methods=['GET'])
     def get_transactions(self, request):
-        return json.dumps(self.blockchain.get_all_unconfirmed_transactions())
+        transactions = self.blockchain.get_all_unconfirmed_transactions()
+        return render_compressed(request, render(request, negotiate_content_type(request), TRANSACTIONS, transactions))
 
     @app.route('/address/<address>/balance', methods=['GET'])
     def get_balance(self, request, address):
@@ -365,12 +896,16 @@ class FullNode(NodeMixin):
 
     @app.route('/address/<address>/transactions', methods=['GET'])
     def get_transaction_history(self, request, address):
-        return json.dumps(self.blockchain.get_transaction_history(address))
+        return render_compressed(request, json.dumps(self.blockchain.get_transaction_history(address)))
 
     @app.route('/blocks', methods=['POST'])
+    @traced()
     def post_block(self, request):
-        body = json.loads(request.content.read())
-        remote_block = json.loads(body['block'])
+        body = decode_request(request)
+        remote_block = body['block']
+        if isinstance(remote_block, basestring):
+            # legacy peers send the block as a JSON string inside JSON
+            remote_block = json.loads(remote_block)
         remote_host = body['host']
         block = Block(
             remote_block['index'],
@@ -380,69 +915,224 @@ class FullNode(NodeMixin):
             remote_block['timestamp'],
             remote_block['nonce']
         )
+        return self.receive_block(request, block, remote_host)
+
+    @app.route('/blocks/locator', methods=['POST'])
+    def post_block_locator(self, request):
+        body = decode_request(request)
+        fork_index = self.blockchain.find_fork_point(body['locator'])
+        if fork_index is None:
+            request.setResponseCode(406)  # not acceptable
+            return json.dumps({'message': 'no common block'})
+        blocks = self.blockchain.get_blocks_range(fork_index + 1, fork_index + self.MAX_LOCATOR_HEADERS)
+        headers = [{k: v for k, v in block.__dict__.items() if k != "transactions"} for block in blocks]
+        # only peers that know the locator endpoint ask for it, so the default is the versioned JSON format
+        content_type = negotiate_content_type(request) or WIRE_JSON_CONTENT_TYPE
+        return render(request, content_type, HEADERS, {'index': fork_index, 'headers': headers})
+
+    @app.route('/blocks/compact', methods=['POST'])
+    @traced()
+    def post_compact_block(self, request):
+        body = decode_request(request)
+        compact_block = body['block']
+        remote_host = body['host']
         my_latest_block = self.blockchain.get_latest_block()
 
-        if block.index > my_latest_block.index + 1:
-            # new block index is greater than ours
-            remote_diff_blocks = self.request_blocks_range(
-                remote_host,
-                FULL_NODE_PORT,
-                my_latest_block.index + 1,
-                remote_block['index']
+        if compact_block['index'] != my_latest_block.index + 1:
+            # only the next block in sequence is rebuilt. the header is enough to decide the rest.
+            block = Block(
+                compact_block['index'],
+                [],
+                compact_block['previous_hash'],
+                compact_block['current_hash'],
+                compact_block['timestamp'],
+                compact_block['nonce']
             )
+            return self.receive_block(request, block, remote_host)
 
-            if remote_diff_blocks[0].previous_hash == my_latest_block.current_hash:
-                # first block in diff blocks fit local chain
-                for block in remote_diff_blocks:
-                    result = self.blockchain.add_block(block)
-                    if not result:
-                        request.setResponseCode(406)  # not acceptable
-                        return json.dumps({'message': 'block {} rejected'.format(block.index)})
-                request.setResponseCode(202)  # accepted
-                return json.dumps({'message': 'accepted'})
-            else:
-                # first block in diff blocks does not fit local chain
-                for i in range(my_latest_block.index, 1, -1):
-                    # step backwards and look for the first remote block that fits the local chain
-                    block = self.request_block(remote_host, FULL_NODE_PORT, str(i))
-                    remote_diff_blocks[0:0] = [block]
-                    if block.previous_hash == self.blockchain.get_block_by_index(i-1):
-                        # found the fork
-                        result = self.blockchain.alter_chain(remote_diff_blocks)
-                        if not result:
-                            request.setResponseCode(406)  # not acceptable
-                            return json.dumps({'message': 'blocks rejected'})
-                        request.setResponseCode(202)  # accepted
-                        return json.dumps({'message': 'accepted'})
-                request.setResponseCode(406)  # not acceptable
-                return json.dumps({'message': 'blocks rejected'})
-
-        elif block.index <= my_latest_block.index:
+        # rebuilding may fetch missing transactions from the sender
+        deferToThread(self.process_compact_block, compact_block, remote_host).addErrback(self.log_background_failure)
+        request.setResponseCode(202)  # accepted
+        return json.dumps({'message': 'accepted'})
+
+    @app.route('/blocks/compact/<block_hash>/transactions', methods=['POST'])
+    def post_compact_block_transactions(self, request, block_hash):
+        body = decode_request(request)
+        block = self.relayed_blocks.get(block_hash)
+        if block is None:
+            request.setResponseCode(404)  # not found
+            return json.dumps({'message': 'block {} not found'.format(block_hash)})
+        wanted = set(body['hashes'])
+        return json.dumps([transaction for transaction in block.transactions if transaction['hash'] in wanted])
+
+    def receive_block(self, request, block, remote_host):
+        """
+        Answers the peer straight away.  Fetching missing blocks and validation run on a worker thread
+        so that a slow peer cannot stall the reactor.
+        """
+        my_latest_block = self.blockchain.get_latest_block()
+
+        if block.index <= my_latest_block.index:
             # new block index is less than ours
             request.setResponseCode(409)  # conflict
             return json.dumps({'message': 'Block index too low.  Fetch latest chain.'})
 
-        # correct block index. verify txs, hash
-        result = self.blockchain.add_block(block)
-        if not result:
-            request.setResponseCode(406)  # not acceptable
-            return json.dumps({'message': 'block {} rejected'.format(block.index)})
+        deferToThread(self.process_block, block, remote_host).addErrback(self.log_background_failure)
         request.setResponseCode(202)  # accepted
         return json.dumps({'message': 'accepted'})
 
+    def process_compact_block(self, compact_block, remote_host):
+        block = self.reconstruct_block(compact_block, remote_host)
+        if block is None:
+            logger.warning("Block %s could not be reconstructed", compact_block['index'])
+            return False
+        return self.process_block(block, remote_host)
+
+    @traced()
+    def process_block(self, block, remote_host):
+        """
+        Adds a block received from a peer, fetching the blocks in between if we are behind
+
+        :param block: the announced block
+        :type block: Block
+        :param remote_host: the announcing peer
+        :type remote_host: str
+
+        :return: True if the local chain was extended or replaced
+        :rtype: bool
+        """
+        with self.block_processing_lock:
+            my_latest_block = self.blockchain.get_latest_block()
+
+            if block.index <= my_latest_block.index:
+                # another announcement got there first
+                return False
+
+            # a peer announced a better tip, so the gauge tracks how far behind it we are, not only the last
+            # contested mining round
+            SYNC_LAG_BLOCKS.set(block.index - my_latest_block.index)
+            if block.index == my_latest_block.index + 1:
+                # correct block index. verify txs, hash
+                result = self.blockchain.add_block(block)
+                if result:
+                    SYNC_LAG_BLOCKS.set(0)
+                else:
+                    logger.warning("Block %s from %s rejected", block.index, remote_host)
+                return result
+
+        # new block index is greater than ours. the blocks in between are downloaded without holding the lock.
+        result = self.sync_with_node(remote_host, my_latest_block, block.index)
+        if result:
+            SYNC_LAG_BLOCKS.set(0)
+        else:
+            logger.warning("Blocks %s to %s from %s rejected", my_latest_block.index + 1, block.index, remote_host)
+        return result
+
+    def log_background_failure(self, failure):
+        logger.error("Background task failed: %s", failure.getTraceback())
+
     @app.route('/blocks', methods=['GET'])
     def get_blocks(self, request):
-        return json.dumps([block.__dict__ for block in self.blockchain.get_all_blocks()])
+        blocks = [block.__dict__ for block in self.blockchain.get_all_blocks()]
+        return render_compressed(request, render(request, negotiate_content_type(request), BLOCKS, blocks))
 
     @app.route('/blocks/<start_block_id>/<end_block_id>', methods=['GET'])
     def get_blocks_range(self, request, start_block_id, end_block_id):
-        return json.dumps([block.__dict__ for block in self.blockchain.get_blocks_range(start_block_id, end_block_id)])
+        blocks = self.blockchain.get_blocks_range(int(start_block_id), int(end_block_id))
+        content_type = negotiate_content_type(request)
+        encoding = negotiate_encoding(request)
+        if len(blocks) == 0:
+            return render_compressed(request, render(request, content_type, BLOCKS, []), encoding)
+        # a block hash commits to every block before it, so the end hashes identify the range's content
+        # and a reorg simply produces new keys
+        key = (blocks[0].current_hash, blocks[-1].current_hash, content_type, encoding)
+        cached = self.compressed_ranges.get(key)
+        if cached is None:
+            # the range may fall back to another format than the negotiated one, so that is cached too
+            rendered_type, body = encode_negotiated(content_type, BLOCKS, [block.__dict__ for block in blocks])
+            if encoding is not None and len(body) >= MIN_COMPRESSED_SIZE:
+                cached = (rendered_type, encoding, compress(body, encoding))
+            else:
+                cached = (rendered_type, None, body)
+            self.compressed_ranges.put(key, cached)
+        if cached[0] is not None:
+            request.setHeader("Content-Type", cached[0])
+        set_encoding_headers(request, cached[1])
+        return cached[2]
+
+    @app.route('/blocks/stream', methods=['GET'])
+    def get_blocks_stream(self, request):
+        return BlockStreamProducer(request, self.blockchain.get_all_blocks()[:]).start()
+
+    @app.route('/blocks/stream/<start_block_id>/<end_block_id>', methods=['GET'])
+    def get_blocks_range_stream(self, request, start_block_id, end_block_id):
+        blocks = self.blockchain.get_blocks_range(int(start_block_id), int(end_block_id))
+        return BlockStreamProducer(request, blocks).start()
 
     @app.route('/block/<block_id>', methods=['GET'])
     def get_block(self, request, block_id):
         if block_id == "latest":
-            return json.dumps(self.blockchain.get_latest_block().__dict__)
-        return json.dumps(self.blockchain.get_block_by_index(block_id).__dict__)
+            block = self.blockchain.get_latest_block()
+        else:
+            block = self.blockchain.get_block_by_index(int(block_id))
+        content_type = negotiate_content_type(request)
+        # a block never changes under its hash, only which block an index or "latest" points to
+        etag = '"{}-{}"'.format(block.current_hash, content_type or "legacy")
+        request.setHeader("ETag", etag)
+        request.setHeader("Vary", "Accept")
+        if_none_match = request.getHeader("If-None-Match") or ""
+        if etag in if_none_match or if_none_match.strip() == "*":
+            request.setResponseCode(304)  # not modified
+            return ""
+        key = (block.current_hash, content_type)
+        cached = self.block_responses.get(key)
+        if cached is None:
+            cached = encode_negotiated(content_type, BLOCK, block.__dict__)
+            self.block_responses.put(key, cached)
+        if cached[0] is not None:
+            request.setHeader("Content-Type", cached[0])
+        return cached[1]
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics(self, request):
+        # the mempool is sampled on scrape instead of on every push and pop
+        MEMPOOL_TRANSACTIONS.set(len(self.blockchain.get_all_unconfirmed_transactions()))
+        MEMPOOL_OLDEST_AGE_SECONDS.set(self.blockchain.get_oldest_unconfirmed_transaction_age())
+        request.setHeader("Content-Type", METRICS_CONTENT_TYPE)
+        return REGISTRY.render()
+
+    @app.route('/admin/profiler', methods=['GET'])
+    def get_profiler(self, request):
+        if not self.is_admin_request(request):
+            request.setResponseCode(403)  # forbidden
+            return json.dumps({'message': 'forbidden'})
+        return json.dumps(PROFILER.get_report())
+
+    @app.route('/admin/profiler', methods=['POST'])
+    def post_profiler(self, request):
+        """
+        Starts or stops the sampling profiler on a live node.  body: dict(enabled, (interval), (reset))
+        """
+        if not self.is_admin_request(request):
+            request.setResponseCode(403)  # forbidden
+            return json.dumps({'message': 'forbidden'})
+        body = decode_request(request)
+        interval = body.get('interval')
+        if interval is not None and (isinstance(interval, bool) or not isinstance(interval, (int, long, float))
+                                     or interval <= 0):
+            request.setResponseCode(400)  # bad request
+            return json.dumps({'message': 'interval must be a positive number of seconds'})
+        if body.get('reset'):
+            PROFILER.reset()
+        if body.get('enabled'):
+            PROFILER.start(interval)
+        elif 'enabled' in body:
+            PROFILER.stop()
+        return json.dumps({'running': PROFILER.running, 'interval': PROFILER.interval})
+
+    def is_admin_request(self, request):
+        # admin endpoints are only served to the node's own host
+        return request.getClientIP() in ("127.0.0.1", self.host)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,259 @@
+import gevent
+import gevent.queue
+import requests
+import threading
+import time
+import urlparse
+
+from requests.adapters import HTTPAdapter
+from tracing import span
+from wire import encode, JSON_CONTENT_TYPE, WIRE_BINARY_CONTENT_TYPE, WIRE_JSON_CONTENT_TYPE
+
+
+class PeerHealth(object):
+
+    LATENCY_SMOOTHING = 0.3
+    CIRCUIT_BREAKER_THRESHOLD = 3
+    EVICTION_THRESHOLD = 10
+    BASE_BACKOFF = 1.0
+    MAX_BACKOFF = 300.0
+
+    def __init__(self):
+        """
+        Tracks consecutive failures, latency EWMA and backoff per peer
+
+        peer
+        :type peer: dict(failures, latency, retry_at)
+        :type failures: int
+        :type latency: float
+        :type retry_at: float
+        """
+        self.lock = threading.Lock()
+        self.peers = {}
+
+    def _get_peer(self, host):
+        if host not in self.peers:
+            self.peers[host] = {
+                "failures": 0,
+                "latency": None,
+                "retry_at": 0
+            }
+        return self.peers[host]
+
+    def record_success(self, host, latency):
+        with self.lock:
+            peer = self._get_peer(host)
+            peer["failures"] = 0
+            peer["retry_at"] = 0
+            if peer["latency"] is None:
+                peer["latency"] = latency
+            else:
+                peer["latency"] += self.LATENCY_SMOOTHING * (latency - peer["latency"])
+
+    def record_failure(self, host):
+        with self.lock:
+            peer = self._get_peer(host)
+            peer["failures"] += 1
+            if peer["failures"] >= self.CIRCUIT_BREAKER_THRESHOLD:
+                # open the circuit, doubling the backoff for every further failure
+                backoff = self.BASE_BACKOFF * 2 ** (peer["failures"] - self.CIRCUIT_BREAKER_THRESHOLD)
+                peer["retry_at"] = time.time() + min(backoff, self.MAX_BACKOFF)
+
+    def is_available(self, host):
+        """
+        A peer is available while its circuit is closed, or half-open once its backoff has elapsed
+        """
+        with self.lock:
+            peer = self.peers.get(host)
+            return peer is None or peer["retry_at"] <= time.time()
+
+    def should_evict(self, host):
+        with self.lock:
+            peer = self.peers.get(host)
+            return peer is not None and peer["failures"] >= self.EVICTION_THRESHOLD
+
+    def get_latency(self, host):
+        with self.lock:
+            peer = self.peers.get(host)
+            return None if peer is None else peer["latency"]
+
+    def rank(self, hosts):
+        """
+        Orders available peers by latency EWMA.  Peers without a measurement are tried first.
+
+        :param hosts: candidate peers
+        :type hosts: iterable of str
+
+        :return: available peers, lowest latency first
+        :rtype: list
+        """
+        available = [host for host in hosts if self.is_available(host)]
+        return sorted(available, key=lambda host: self.get_latency(host) or 0)
+
+
+class PeerConnectionPool(object):
+
+    MAX_PEERS = 100
+    # connections kept alive per peer.  requests beyond it open a short lived connection instead of waiting for
+    # one to be returned, so a slow peer fails on the request timeout rather than stalling every caller.
+    MAX_CONNECTIONS_PER_PEER = 4
+    # (connect, read) seconds
+    TIMEOUT = (3.05, 30)
+
+    def __init__(self, max_peers=MAX_PEERS, max_connections_per_peer=MAX_CONNECTIONS_PER_PEER, timeout=TIMEOUT):
+        """
+        Shared keep-alive HTTP session used for all peer requests
+
+        :param max_peers: number of per-peer connection pools kept alive
+        :type max_peers: int
+        :param max_connections_per_peer: connections kept alive to a single peer
+        :type max_connections_per_peer: int
+        :param timeout: default request timeout
+        :type timeout: float or tuple(float, float)
+        """
+        self.adapter = HTTPAdapter(
+            pool_connections=max_peers,
+            pool_maxsize=max_connections_per_peer,
+            pool_block=False
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        # prefer the binary, then the versioned JSON wire format; legacy peers ignore both and answer in the old format
+        self.session.headers["Accept"] = "{}, {}, {}".format(
+            WIRE_BINARY_CONTENT_TYPE, WIRE_JSON_CONTENT_TYPE, JSON_CONTENT_TYPE)
+        # bulk sync responses are large and repetitive. requests decodes them transparently.
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        self.timeout = timeout
+        self.health = PeerHealth()
+
+    def request(self, method, url, **kwargs):
+        host = urlparse.urlparse(url).hostname
+        kwargs.setdefault("timeout", self.timeout)
+        if "json" in kwargs:
+            # compact single pass encoding instead of requests' default separators
+            kwargs["data"] = encode(kwargs.pop("json"))
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"Content-Type": JSON_CONTENT_TYPE})
+        start = time.time()
+        try:
+            with span("peer_request", method=method, host=host):
+                response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.health.record_failure(host)
+            raise
+        self.health.record_success(host, time.time() - start)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get_all(self, urls, deadline=None, **kwargs):
+        """
+        GETs many urls concurrently, yielding responses in the order they complete.
+        Sockets are cooperative once grequests has patched them, so every request is in flight at once.
+
+        :param urls: urls to request
+        :type urls: list of str
+        :param deadline: seconds after which requests still in flight are abandoned
+        :type deadline: float
+
+        :return: generator of tuple(url, response). response is None if the request failed.
+        :rtype: generator
+        """
+        results = gevent.queue.Queue()
+
+        def get(url):
+            try:
+                results.put((url, self.get(url, **kwargs)))
+            except requests.exceptions.RequestException:
+                results.put((url, None))
+
+        greenlets = [gevent.spawn(get, url) for url in urls]
+        expires_at = None if deadline is None else time.time() + deadline
+        try:
+            for i in range(len(greenlets)):
+                timeout = None if expires_at is None else max(expires_at - time.time(), 0)
+                try:
+                    yield results.get(timeout=timeout)
+                except gevent.queue.Empty:
+                    return
+        finally:
+            gevent.killall(greenlets, block=False)
+
+    def get_first(self, urls, hedge_delay=None, **kwargs):
+        """
+        GETs urls in order until one answers with 200.  A failed request or any other status moves on to the next
+        url straight away, and one that has not answered within hedge_delay is raced against the next url.  Requests that lose the race run
+        to completion so that their peer's latency is still recorded.
+
+        :param urls: urls to try, preferred first
+        :type urls: list of str
+        :param hedge_delay: seconds to wait for a request before also requesting the next url, None to never hedge
+        :type hedge_delay: float
+
+        :return: tuple(url, response) of the first 200 answer, (None, None) if every request failed
+        :rtype: tuple
+        """
+        results = gevent.queue.Queue()
+
+        def get(url):
+            try:
+                response = self.get(url, **kwargs)
+            except requests.exceptions.RequestException:
+                response = None
+            if response is not None and response.status_code != 200:
+                # e.g. a 404 from a node that predates the endpoint, or a 429 from an overloaded one
+                response = None
+            results.put((url, response))
+
+        urls = iter(urls)
+        in_flight = 0
+        while True:
+            url = next(urls, None)
+            if url is not None:
+                gevent.spawn(get, url)
+                in_flight += 1
+            if in_flight == 0:
+                return None, None
+            try:
+                # once every url is in flight there is nothing left to hedge to
+                answered_url, response = results.get(timeout=hedge_delay if url is not None else None)
+            except gevent.queue.Empty:
+                continue
+            in_flight -= 1
+            if response is not None:
+                return answered_url, response
+
+    def get_stats(self):
+        """
+        Connection reuse statistics for every peer with a live pool
+
+        :return: dict(peers, requests, connections, reused)
+        :rtype: dict
+        """
+        pools = self.adapter.poolmanager.pools
+        stats = {
+            "peers": {},
+            "requests": 0,
+            "connections": 0,
+            "reused": 0
+        }
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            peer = "{}:{}".format(pool.host, pool.port)
+            stats["peers"][peer] = {
+                "requests": pool.num_requests,
+                "connections": pool.num_connections,
+                "reused": max(pool.num_requests - pool.num_connections, 0)
+            }
+            stats["requests"] += pool.num_requests
+            stats["connections"] += pool.num_connections
+            stats["reused"] += stats["peers"][peer]["reused"]
+        return stats
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,63 @@
+import json
+import zlib
+
+from compression import compressor, negotiate_encoding, set_encoding_headers
+from twisted.internet import defer
+from twisted.internet.interfaces import IPullProducer
+from zope.interface import implementer
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+@implementer(IPullProducer)
+class BlockStreamProducer(object):
+
+    def __init__(self, request, blocks):
+        """
+        Writes blocks to a request as newline delimited JSON, one block each time the transport asks for data
+
+        :param request: twisted web request
+        :type request: twisted.web.server.Request
+        :param blocks: blocks to stream
+        :type blocks: iterable of Block
+        """
+        self.request = request
+        self.blocks = iter(blocks)
+        self.finished = defer.Deferred()
+        self.stopped = False
+        self.compressor = None
+
+    def start(self):
+        """
+        :return: deferred firing once every block has been written
+        :rtype: twisted.internet.defer.Deferred
+        """
+        self.request.setHeader("Content-Type", NDJSON_CONTENT_TYPE)
+        encoding = negotiate_encoding(self.request)
+        set_encoding_headers(self.request, encoding)
+        if encoding is not None:
+            self.compressor = compressor(encoding)
+        self.request.registerProducer(self, False)
+        return self.finished
+
+    def resumeProducing(self):
+        if self.stopped:
+            return
+        try:
+            block = next(self.blocks)
+        except StopIteration:
+            self.stopped = True
+            if self.compressor is not None:
+                self.request.write(self.compressor.flush())
+            self.request.unregisterProducer()
+            self.finished.callback(None)
+            return
+        line = json.dumps(block.__dict__, sort_keys=True) + "\n"
+        if self.compressor is not None:
+            # sync flush so the peer can decode and validate each block as soon as it arrives
+            line = self.compressor.compress(line) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.request.write(line)
+
+    def stopProducing(self):
+        # connection lost.  the request is cancelled by klein.
+        self.stopped = True
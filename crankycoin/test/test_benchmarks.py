@@ -0,0 +1,200 @@
+import gevent
+import time
+import unittest
+from mock import patch, Mock, MagicMock, call
+from crankycoin.benchmarks.chain import *
+from crankycoin.benchmarks.cluster import *
+from crankycoin.benchmarks.harness import *
+from crankycoin.benchmarks.ledger import benchmark_size
+from crankycoin.benchmarks.load import InclusionObserver, LoadGenerator, summarize
+from crankycoin.benchmarks.mining import *
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.clients = generate_clients(3)
+
+    def test_generate_whenCalled_thenBuildsValidChainWithSignedTransactions(self):
+        generator = ChainGenerator(self.clients, 3)
+
+        blocks = generator.generate(6)
+
+        chain = SyntheticBlockchain(blocks)
+        self.assertEqual(chain.get_size(), 1 + len(self.clients) + 6)
+        self.assertTrue(all(len(block.transactions) == 1 for block in blocks[1:1 + len(self.clients)]))
+        self.assertTrue(all(len(block.transactions) == 4 for block in blocks[1 + len(self.clients):]))
+
+    def test_generate_whenMoreAddressesThanTransfersPerBlock_thenEveryBlockCarriesAllTransfers(self):
+        generator = ChainGenerator(generate_clients(6), 2)
+
+        blocks = generator.generate(3)
+
+        self.assertEqual([len(block.transactions) for block in blocks[7:]], [3, 3, 3])
+        self.assertEqual(SyntheticBlockchain(blocks).get_size(), 10)
+
+    def test_extend_whenNoAddressIsFunded_thenRaisesValueError(self):
+        generator = ChainGenerator(self.clients, 1)
+        genesis_block = SyntheticBlockchain.__new__(SyntheticBlockchain).get_genesis_block()
+
+        self.assertRaises(ValueError, generator.extend, [genesis_block], 1)
+
+    def test_extend_whenForkIsLonger_thenChainSwitchesToFork(self):
+        generator = ChainGenerator(self.clients, 2)
+        blocks = generator.generate(5)
+        chain = SyntheticBlockchain(blocks)
+
+        fork_index = len(blocks) - 2
+        fork = generator.extend(blocks[:fork_index], 3, salt="fork")
+
+        self.assertNotEqual(fork[fork_index].current_hash, blocks[fork_index].current_hash)
+        self.assertTrue(chain.alter_chain(fork[fork_index:]))
+        self.assertEqual(chain.get_latest_block(), fork[-1])
+
+    def test_measure_whenCalled_thenRunsSetupBeforeEveryRun(self):
+        calls = []
+
+        result = measure("operation", lambda: calls.append("run"), 3, setup=lambda: calls.append("setup"))
+
+        self.assertEqual(calls, ["setup", "run"] * 3)
+        self.assertEqual(result["operation"], "operation")
+        self.assertEqual(result["repeat"], 3)
+        self.assertLessEqual(result["min"], result["median"])
+        self.assertLessEqual(result["median"], result["max"])
+
+    def test_benchmark_size_whenCalled_thenReportsEveryOperation(self):
+        generator = ChainGenerator(self.clients, 2)
+
+        results = benchmark_size(generator, 3, 1)
+
+        self.assertEqual([result["operation"] for result in results], [
+            "construct_chain",
+            "get_balance",
+            "get_transaction_history",
+            "find_duplicate_transactions",
+            "validate_block",
+            "alter_chain"
+        ])
+        self.assertTrue(all(result["blocks"] == 1 + len(self.clients) + 3 for result in results))
+
+    def test_template_hasher_whenCalled_thenMatchesCalculateBlockHash(self):
+        transactions = sign_transactions(self.clients, 3, "salt")
+        chain = SyntheticBlockchain.__new__(SyntheticBlockchain)
+
+        block_hash = template_hasher(7, "previous", "2017-01-01T00:07:00", transactions)
+
+        for nonce in (0, 9, 12345):
+            self.assertEqual(
+                block_hash(nonce), chain.calculate_block_hash(7, "previous", "2017-01-01T00:07:00", transactions, nonce))
+
+    def test_split_nonces_whenNotDivisible_thenCoversEveryNonceOnce(self):
+        self.assertEqual(split_nonces(10, 3), [(0, 4), (4, 8), (8, 10)])
+        self.assertEqual(split_nonces(10, 1), [(0, 10)])
+
+    def test_benchmark_block_size_whenCalled_thenReportsEveryStrategyAndWorkerCount(self):
+        blockchain = SyntheticBlockchain(ChainGenerator(self.clients, 1).generate(2))
+
+        results = benchmark_block_size(blockchain, self.clients, 2, 20, ["json", "template"], [1], 1, {})
+
+        self.assertEqual(results[0]["operation"], "create_block_template")
+        self.assertEqual([(result["strategy"], result["workers"]) for result in results[1:]], [("json", 1), ("template", 1)])
+        self.assertTrue(all(result["block_size"] == 2 for result in results))
+        self.assertEqual(blockchain.get_all_unconfirmed_transactions(), [])
+
+    def test_sample_whenPartitioned_thenDropsRequestsBetweenGroupsOnly(self):
+        subject = NetworkConditions(latency=0.1)
+
+        subject.partition(["127.0.0.2", "127.0.0.3"], ["127.0.0.4"])
+
+        self.assertIsNone(subject.sample("127.0.0.2", "127.0.0.4"))
+        self.assertEqual(subject.sample("127.0.0.2", "127.0.0.3"), 0.1)
+        self.assertEqual(subject.sample("127.0.0.2", "127.0.0.5"), 0.1)
+        subject.heal()
+        self.assertEqual(subject.sample("127.0.0.2", "127.0.0.4"), 0.1)
+
+    def test_sample_whenLinkOverridden_thenAppliesToThatDirectionOnly(self):
+        subject = NetworkConditions(latency=0.1)
+
+        subject.set_link("127.0.0.2", "127.0.0.3", latency=0.5, loss=1.0)
+
+        self.assertIsNone(subject.sample("127.0.0.2", "127.0.0.3"))
+        self.assertEqual(subject.sample("127.0.0.3", "127.0.0.2"), 0.1)
+
+    def test_SimulatedPeerPool_whenRequestDropped_thenRecordsFailureAndRaises(self):
+        network = NetworkConditions(loss=1.0)
+        subject = SimulatedPeerPool("127.0.0.2", network)
+
+        with patch.object(HTTPAdapter, 'send') as patched_send:
+            self.assertRaises(requests.exceptions.ConnectionError, subject.get, "http://127.0.0.3:30013/nodes")
+
+            patched_send.assert_not_called()
+        self.assertEqual(subject.health.peers["127.0.0.3"]["failures"], 1)
+
+    def test_poll_whenNodeSwitchesFork_thenCountsReorgAndOrphan(self):
+        generator = ChainGenerator(self.clients, 0)
+        blocks = generator.generate(2)
+        fork = generator.extend(blocks[:2], 2, salt="fork")
+        node_one = Mock(host="127.0.0.2", blockchain=SyntheticBlockchain(blocks[:2]))
+        node_two = Mock(host="127.0.0.3", blockchain=SyntheticBlockchain(blocks[:2]))
+        subject = ClusterObserver([node_one, node_two])
+
+        node_one.blockchain.add_block(blocks[2])
+        subject.poll(now=1.0)
+        node_two.blockchain.add_block(blocks[2])
+        subject.poll(now=1.5)
+        node_one.blockchain.alter_chain(fork[2:])
+        node_two.blockchain.alter_chain(fork[2:])
+        subject.poll(now=2.0)
+        report = subject.get_report()
+
+        self.assertTrue(subject.is_converged())
+        self.assertEqual(report["blocks"], 3)
+        self.assertEqual(report["orphans"], 1)
+        self.assertEqual(report["reorgs"], 2)
+        self.assertEqual(report["max_reorg_depth"], 1)
+        self.assertEqual(report["propagation"]["blocks"], 2)
+        self.assertEqual(report["propagation"]["max"], 0)
+
+    def test_summarize_whenNoValues_thenReportsCountOnly(self):
+        self.assertEqual(summarize([]), {"count": 0})
+        self.assertEqual(summarize([3, 1, 2])["median"], 2)
+
+    def test_run_whenNodeIsSlow_thenKeepsScheduleAndMeasuresFromDueTime(self):
+        subject = LoadGenerator(["127.0.0.2", "127.0.0.3"], self.clients, 100)
+        mock_response = Mock(status_code=200)
+        hosts = []
+
+        def post(url, **kwargs):
+            hosts.append(url)
+            gevent.sleep(0.05)
+            return mock_response
+
+        with patch.object(subject.pool, 'post', side_effect=post) as patched_post:
+            start = time.time()
+            subject.run(0.1)
+
+            # ten sequential requests would take 0.5 seconds
+            self.assertLess(time.time() - start, 0.3)
+        self.assertEqual(subject.submitted, 10)
+        self.assertEqual(len(subject.submissions), 10)
+        self.assertEqual(subject.failed, 0)
+        self.assertEqual(hosts[:2], ["http://127.0.0.2:30013/transactions", "http://127.0.0.3:30013/transactions"])
+        self.assertTrue(all(submission["latency"] >= 0.05 for submission in subject.submissions.values()))
+
+    def test_poll_whenNewBlocks_thenRecordsInclusionAndBacklog(self):
+        subject = InclusionObserver("127.0.0.2")
+        subject.latest_index = 4
+        responses = {
+            "http://127.0.0.2:30013/block/latest": {"index": 5},
+            "http://127.0.0.2:30013/blocks/5/5": [{"transactions": [{"hash": "included"}]}],
+            "http://127.0.0.2:30013/transactions": [{"hash": "pending"}]
+        }
+
+        with patch.object(subject.pool, 'get', side_effect=lambda url: url) as patched_get, \
+                patch("crankycoin.benchmarks.load.decode_response", side_effect=lambda url: responses[url]):
+            subject.poll()
+
+        self.assertEqual(subject.latest_index, 5)
+        self.assertEqual(subject.included.keys(), ["included"])
+        self.assertEqual(subject.backlog[0][1], 1)
@@ -54,6 +54,22 @@ class TestBlockchain(unittest.TestCase):
             patched_calculate_block_hash.assert_called_once_with(0, 0, 0, genesis_transactions, 0)
             patched_Block.assert_called_once_with(0, genesis_transactions, 0, 'mock_block_hash', 0, 0)
 
+    def test_Block_to_compact_whenCalled_thenReplacesTransactionsWithHashesAndKeepsCoinbase(self):
+        transactions = [{"hash": "transaction_hash_one"}, {"hash": "transaction_hash_two"}, {"hash": "coinbase_hash", "from": "0"}]
+        block = Block(5, transactions, "previous_hash", "current_hash", 1234567890, 12345)
+
+        compact_block = block.to_compact()
+
+        self.assertEqual(compact_block, {
+            "index": 5,
+            "previous_hash": "previous_hash",
+            "current_hash": "current_hash",
+            "timestamp": 1234567890,
+            "nonce": 12345,
+            "transaction_hashes": ["transaction_hash_one", "transaction_hash_two"],
+            "coinbase": {"hash": "coinbase_hash", "from": "0"}
+        })
+
     def test_calculate_transaction_hash_whenCalledWithSameTransactions_thenReturnsConsistentSha256Hash(self):
         transaction_one = {
             'from': 'from',
@@ -300,6 +316,24 @@ class TestBlockchain(unittest.TestCase):
 
             self.assertIsNone(resp)
 
+    def test_check_index_and_previous_hash_whenSnapshotGiven_thenChecksAgainstSnapshotTip(self):
+        mock_block = Mock(Block)
+        mock_block.index = 35
+        mock_block.previous_hash = "0000_hash_of_block_34"
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 34
+        mock_latest_block.current_hash = "0000_hash_of_block_34"
+        mock_snapshot = Mock(ChainSnapshot)
+        mock_snapshot.get_latest_block.return_value = mock_latest_block
+
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init, \
+                patch.object(Blockchain, 'get_latest_block') as patched_get_latest_block:
+            subject = Blockchain()
+            resp = subject._check_index_and_previous_hash(mock_block, mock_snapshot)
+
+            self.assertIsNone(resp)
+            patched_get_latest_block.assert_not_called()
+
     def test_check_index_and_previous_hash_whenBlockHasInValidIndex_thenReturnsFalse(self):
         mock_block = Mock(Block)
         mock_block.index = 35
@@ -713,16 +747,42 @@ class TestBlockchain(unittest.TestCase):
         ]
 
         with patch.object(Blockchain, '__init__', return_value=None) as patched_init, \
-                patch.object(Blockchain, 'get_size', side_effect=[6, 5]) as patched_get_size:
+                patch.object(Blockchain, '_get_latest_hash', return_value="latest_hash") as patched_get_latest_hash, \
+                patch.object(Blockchain, 'get_size', return_value=6) as patched_get_size:
             subject = Blockchain()
             subject.blocks = mock_blocks
             subject.blocks_lock = threading.Lock()
+            subject.state_changed = threading.Condition()
 
             resp = subject.alter_chain(mock_forked_blocks)
 
             self.assertTrue(resp)
             self.assertEqual(subject.blocks, mock_altered_blocks)
 
+    def test_alter_chain_whenTipChangesDuringValidation_thenDoesNotAlterChainAndReturnsFalse(self):
+        mock_blocks = []
+        for index in range(5):
+            mock_block = Mock(Block, name="mock_block_{}".format(index))
+            mock_block.index = index
+            mock_blocks.append(mock_block)
+        mock_forked_blocks = []
+        for index in range(3, 6):
+            mock_forked_block = Mock(Block, name="mock_forked_block_{}".format(index))
+            mock_forked_block.index = index
+            mock_forked_blocks.append(mock_forked_block)
+
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init, \
+                patch.object(Blockchain, '_get_latest_hash', side_effect=["latest_hash", "new_latest_hash"]) as patched_get_latest_hash, \
+                patch.object(Blockchain, 'get_size', return_value=6) as patched_get_size:
+            subject = Blockchain()
+            subject.blocks = list(mock_blocks)
+            subject.blocks_lock = threading.Lock()
+
+            resp = subject.alter_chain(mock_forked_blocks)
+
+            self.assertFalse(resp)
+            self.assertEqual(subject.blocks, mock_blocks)
+
     def test_alter_chain_whenNewChainIsNotLonger_thenDoesNotAlterChainAndReturnsFalse(self):
         # difficult to unit test; Likely code smell
         mock_block_one = Mock(Block, name="mock_block_one")
@@ -754,6 +814,7 @@ class TestBlockchain(unittest.TestCase):
         ]
 
         with patch.object(Blockchain, '__init__', return_value=None) as patched_init, \
+                patch.object(Blockchain, '_get_latest_hash', return_value="latest_hash") as patched_get_latest_hash, \
                 patch.object(Blockchain, 'get_size', return_value=5) as patched_get_size:
             subject = Blockchain()
             subject.blocks = mock_blocks
@@ -766,20 +827,61 @@ class TestBlockchain(unittest.TestCase):
     def test_add_block_whenValidBlock_thenAddsBlockAndReturnsTrue(self):
         mock_block = Mock(Block)
         with patch.object(Blockchain, '__init__', return_value=None) as patched_init, \
+                patch.object(Blockchain, '_get_latest_hash', return_value="latest_hash") as patched_get_latest_hash, \
+                patch.object(Blockchain, 'get_snapshot') as patched_get_snapshot, \
                 patch.object(Blockchain, 'validate_block', return_value=True) as patched_validate_block:
             subject = Blockchain()
             mock_blocks = Mock()
             subject.blocks = mock_blocks
             subject.blocks_lock = threading.Lock()
+            subject.state_changed = threading.Condition()
 
             resp = subject.add_block(mock_block)
 
             self.assertTrue(resp)
+            patched_get_latest_hash.assert_any_call(patched_get_snapshot.return_value)
+            patched_validate_block.assert_called_once_with(mock_block, patched_get_snapshot.return_value)
             mock_blocks.append.assert_called_once_with(mock_block)
 
+    def test_add_block_whenTipChangesDuringValidation_thenDoesNotAddBlockAndReturnsFalse(self):
+        mock_block = Mock(Block)
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init, \
+                patch.object(Blockchain, '_get_latest_hash', side_effect=["latest_hash", "new_latest_hash"]) as patched_get_latest_hash, \
+                patch.object(Blockchain, 'get_snapshot') as patched_get_snapshot, \
+                patch.object(Blockchain, 'validate_block', return_value=True) as patched_validate_block:
+            subject = Blockchain()
+            mock_blocks = Mock()
+            subject.blocks = mock_blocks
+            subject.blocks_lock = threading.Lock()
+
+            resp = subject.add_block(mock_block)
+
+            self.assertFalse(resp)
+            mock_blocks.append.assert_not_called()
+
+    def test_add_block_whenValidating_thenDoesNotHoldBlocksLock(self):
+        mock_block = Mock(Block)
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.blocks = []
+            subject.blocks_lock = threading.Lock()
+            subject.state_changed = threading.Condition()
+
+            def validate_block(block, snapshot):
+                self.assertFalse(subject.blocks_lock.locked())
+                return True
+
+            with patch.object(Blockchain, 'validate_block', side_effect=validate_block) as patched_validate_block:
+                resp = subject.add_block(mock_block)
+
+            self.assertTrue(resp)
+            self.assertEqual(subject.blocks, [mock_block])
+
     def test_add_block_whenInvalidBlock_thenDoesNotAddBlockAndReturnsFalse(self):
         mock_block = Mock(Block)
         with patch.object(Blockchain, '__init__', return_value=None) as patched_init, \
+                patch.object(Blockchain, '_get_latest_hash', return_value="latest_hash") as patched_get_latest_hash, \
+                patch.object(Blockchain, 'get_snapshot') as patched_get_snapshot, \
                 patch.object(Blockchain, 'validate_block', return_value=False) as patched_validate_block:
             subject = Blockchain()
             mock_blocks = Mock()
@@ -1097,6 +1199,37 @@ class TestBlockchain(unittest.TestCase):
 
             self.assertEqual(balance, 10.76)
 
+    def test_get_balance_whenSnapshotGiven_thenOnlyCountsSnapshotBlocks(self):
+        transaction_one = {
+            'from': 'from',
+            'timestamp': 1498923800,
+            'to': 'address',
+            'amount': 1,
+            'signature': 'signature_one',
+            'hash': "transaction_hash_one"
+        }
+        transaction_two = {
+            'from': 'from',
+            'timestamp': 1498924800,
+            'to': 'address',
+            'amount': 3,
+            'signature': 'signature_two',
+            'hash': "transaction_hash_two"
+        }
+        block_one = Mock(Block)
+        block_one.transactions = [transaction_one]
+        block_two = Mock(Block)
+        block_two.transactions = [transaction_two]
+
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.blocks = [block_one, block_two]
+            snapshot = ChainSnapshot(subject.blocks, 1)
+
+            balance = subject.get_balance('address', snapshot)
+
+            self.assertEqual(balance, 1)
+
     def test_get_balance_whenAddressHasNoTransactions_returnZeroBalance(self):
         transaction_one = {
             'from': 'from',
@@ -1239,6 +1372,20 @@ class TestBlockchain(unittest.TestCase):
 
             self.assertFalse(resp)
 
+    def test_find_confirmed_transactions_whenSomeHashesInBlocks_thenReturnsThoseHashes(self):
+        block_one = Mock(Block)
+        block_one.transactions = [{'hash': "transaction_hash_one"}]
+        block_two = Mock(Block)
+        block_two.transactions = [{'hash': "transaction_hash_two"}, {'hash': "transaction_hash_three"}]
+
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.blocks = [block_one, block_two]
+
+            resp = subject.find_confirmed_transactions(["transaction_hash_three", "transaction_hash_four", "transaction_hash_one"])
+
+            self.assertEqual(resp, {"transaction_hash_one", "transaction_hash_three"})
+
     def test_validate_chain_whenAllBlocksValid_thenReturnTrue(self):
         mock_block = Mock(Block)
         with patch.object(Blockchain, '__init__', return_value=None) as patched_init, \
@@ -1347,6 +1494,99 @@ class TestBlockchain(unittest.TestCase):
 
             self.assertIsNone(block)
 
+    def test_get_block_locator_whenLongChain_thenHashesAreExponentiallySpaced(self):
+        blocks = []
+        for i in range(100):
+            mock_block = Mock(Block)
+            mock_block.index = i
+            mock_block.current_hash = "hash_{}".format(i)
+            blocks.append(mock_block)
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.blocks = blocks
+
+            locator = subject.get_block_locator()
+
+            self.assertEqual(locator, ["hash_{}".format(i) for i in (99, 98, 97, 96, 95, 94, 93, 92, 91, 90, 88, 84, 76, 60, 28, 0)])
+
+    def test_get_block_locator_whenOnlyGenesis_thenReturnsGenesisHash(self):
+        mock_block = Mock(Block)
+        mock_block.current_hash = "genesis_hash"
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.blocks = [mock_block]
+
+            locator = subject.get_block_locator()
+
+            self.assertEqual(locator, ["genesis_hash"])
+
+    def test_find_fork_point_whenLocatorSharesBlocks_thenReturnsLatestCommonIndex(self):
+        blocks = []
+        for i in range(5):
+            mock_block = Mock(Block)
+            mock_block.index = i
+            mock_block.current_hash = "hash_{}".format(i)
+            blocks.append(mock_block)
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.blocks = blocks
+
+            index = subject.find_fork_point(["remote_hash_5", "hash_3", "hash_2", "hash_0"])
+
+            self.assertEqual(index, 3)
+
+    def test_find_fork_point_whenNoCommonBlock_thenReturnsNone(self):
+        mock_block = Mock(Block)
+        mock_block.index = 0
+        mock_block.current_hash = "hash_0"
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.blocks = [mock_block]
+
+            index = subject.find_fork_point(["remote_hash_0"])
+
+            self.assertIsNone(index)
+
+    def test_get_snapshot_whenBlockAddedAfterwards_thenSnapshotKeepsItsTip(self):
+        mock_block_one = Mock(Block)
+        mock_block_two = Mock(Block)
+        mock_block_three = Mock(Block)
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.blocks = [mock_block_one, mock_block_two]
+
+            snapshot = subject.get_snapshot()
+            subject.blocks.append(mock_block_three)
+
+            self.assertEqual(list(snapshot), [mock_block_one, mock_block_two])
+            self.assertEqual(snapshot.get_latest_block(), mock_block_two)
+            self.assertIsNone(snapshot.get_block_by_index(2))
+            self.assertEqual(snapshot.get_blocks_range(1, 5), [mock_block_two])
+            self.assertEqual(len(subject.get_snapshot()), 3)
+
+    def test_get_snapshot_whenChainAltered_thenSnapshotKeepsOldChain(self):
+        mock_block_one = Mock(Block)
+        mock_block_two = Mock(Block)
+        mock_forked_block_two = Mock(Block)
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.blocks = [mock_block_one, mock_block_two]
+
+            snapshot = subject.get_snapshot()
+            subject.blocks = [mock_block_one, mock_forked_block_two, Mock(Block)]
+
+            self.assertEqual(snapshot.get_all_blocks(), [mock_block_one, mock_block_two])
+
+    def test_Blockchain_whenConstructed_thenDoesNotShareBlocksWithOtherChains(self):
+        mock_block = Mock(Block)
+        mock_block.current_hash = "block_hash"
+        with patch.object(Blockchain, 'validate_block', return_value=True) as patched_validate_block:
+            subject = Blockchain([mock_block])
+            other = Blockchain([mock_block, mock_block])
+
+            self.assertEqual(subject.blocks, [mock_block])
+            self.assertEqual(len(other.blocks), 2)
+
     def test_get_blocks_range_whenBlocksExists_thenReturnCorrectBlocks(self):
         mock_block_one = Mock(Block)
         mock_block_two = Mock(Block)
@@ -1436,6 +1676,7 @@ class TestBlockchain(unittest.TestCase):
         with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
             subject = Blockchain()
             subject.unconfirmed_transactions_lock = threading.Lock()
+            subject.state_changed = threading.Condition()
 
             resp = subject.push_unconfirmed_transaction(transaction_one)
 
@@ -1443,6 +1684,68 @@ class TestBlockchain(unittest.TestCase):
             self.assertEqual(len(subject.unconfirmed_transactions), 1)
             self.assertTrue(transaction_one in subject.unconfirmed_transactions)
 
+    def test_wait_for_unconfirmed_transactions_whenEnoughPending_thenReturnsImmediately(self):
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.state_changed = threading.Condition()
+            subject.unconfirmed_transactions = [{"hash": "one"}, {"hash": "two"}]
+
+            resp = subject.wait_for_unconfirmed_transactions(2, 10)
+
+            self.assertEqual(resp, 2)
+
+    def test_wait_for_unconfirmed_transactions_whenTransactionPushed_thenWakesUp(self):
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.state_changed = threading.Condition()
+            subject.unconfirmed_transactions_lock = threading.Lock()
+            subject.unconfirmed_transactions = []
+            timer = threading.Timer(0.05, subject.push_unconfirmed_transaction, args=({"hash": "one"},))
+            timer.start()
+
+            resp = subject.wait_for_unconfirmed_transactions(1, 10)
+
+            timer.join()
+            self.assertEqual(resp, 1)
+
+    def test_wait_for_unconfirmed_transactions_whenBatchIncompleteAtMaxWait_thenReturnsPending(self):
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.state_changed = threading.Condition()
+            subject.unconfirmed_transactions = [{"hash": "one"}]
+            start = time.time()
+
+            resp = subject.wait_for_unconfirmed_transactions(5, 0.05)
+
+            self.assertEqual(resp, 1)
+            self.assertGreaterEqual(time.time() - start, 0.05)
+
+    def test_get_oldest_unconfirmed_transaction_age_whenTransactionsPending_thenMeasuresFromArrival(self):
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init, \
+                patch('crankycoin.blockchain.time.time', side_effect=[100, 105, 110]) as patched_time:
+            subject = Blockchain()
+            subject.state_changed = threading.Condition()
+            subject.unconfirmed_transactions_lock = threading.Lock()
+            subject.unconfirmed_transactions = []
+            subject.unconfirmed_transactions_received = {}
+            subject.push_unconfirmed_transaction({"hash": "one"})
+            subject.push_unconfirmed_transaction({"hash": "two"})
+
+            age = subject.get_oldest_unconfirmed_transaction_age()
+
+            self.assertEqual(age, 10)
+
+    def test_pop_next_unconfirmed_transaction_whenPopped_thenForgetsArrival(self):
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_init:
+            subject = Blockchain()
+            subject.unconfirmed_transactions_lock = threading.Lock()
+            subject.unconfirmed_transactions = [{"hash": "one"}]
+            subject.unconfirmed_transactions_received = {"one": 100}
+
+            subject.pop_next_unconfirmed_transaction()
+
+            self.assertEqual(subject.get_oldest_unconfirmed_transaction_age(), 0)
+
     def test_verify_signature_whenSignatureAndMessageAndPublicKeyMatch_thenReturnsTrue(self):
         signature = '304502202d009c9b97385189d23600ae480435ea5b68786dbdba184c80e0fb6e58d8c5520221009c25f5cdf659f33ce04f683e14f355b3db5524a289feb9efa4c6879342a81648'
         message = 'hello world'
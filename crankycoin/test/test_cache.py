@@ -0,0 +1,32 @@
+import unittest
+from mock import patch, Mock, MagicMock, call
+from crankycoin.cache import *
+
+
+class TestCache(unittest.TestCase):
+
+    def test_put_whenMaxSizeExceeded_thenEvictsLeastRecentlyUsed(self):
+        subject = LRUCache(2)
+        subject.put("one", 1)
+        subject.put("two", 2)
+        subject.get("one")
+
+        subject.put("three", 3)
+
+        self.assertTrue("one" in subject)
+        self.assertFalse("two" in subject)
+        self.assertTrue("three" in subject)
+        self.assertEqual(len(subject), 2)
+
+    def test_get_whenKeyMissing_thenReturnsDefault(self):
+        subject = LRUCache(2)
+
+        self.assertIsNone(subject.get("missing"))
+        self.assertEqual(subject.get("missing", "default"), "default")
+
+    def test_pop_whenKeyExists_thenRemovesAndReturnsValue(self):
+        subject = LRUCache(2)
+        subject.put("one", 1)
+
+        self.assertEqual(subject.pop("one"), 1)
+        self.assertFalse("one" in subject)
@@ -0,0 +1,62 @@
+import unittest
+from mock import patch, Mock, MagicMock, call
+from crankycoin.compression import *
+
+
+class TestCompression(unittest.TestCase):
+
+    def test_negotiate_encoding_whenGzipAndDeflateAccepted_thenPrefersGzip(self):
+        request = Mock()
+        request.getHeader.return_value = "deflate, gzip"
+
+        self.assertEqual(negotiate_encoding(request), GZIP)
+        request.getHeader.assert_called_once_with("Accept-Encoding")
+
+    def test_negotiate_encoding_whenGzipRefused_thenReturnsDeflate(self):
+        request = Mock()
+        request.getHeader.return_value = "gzip;q=0, deflate;q=0.5"
+
+        self.assertEqual(negotiate_encoding(request), DEFLATE)
+
+    def test_negotiate_encoding_whenRefusedCodingAndWildcard_thenNeverReturnsRefusedCoding(self):
+        request = Mock()
+
+        request.getHeader.return_value = "gzip;q=0, *"
+        self.assertEqual(negotiate_encoding(request), DEFLATE)
+        request.getHeader.return_value = "gzip;q=0, deflate;q=0, *"
+        self.assertIsNone(negotiate_encoding(request))
+
+    def test_negotiate_encoding_whenNoAcceptEncoding_thenReturnsNone(self):
+        request = Mock()
+        request.getHeader.return_value = None
+
+        self.assertIsNone(negotiate_encoding(request))
+
+    def test_render_compressed_whenLargeBodyAndGzipAccepted_thenCompresses(self):
+        request = Mock()
+        request.getHeader.return_value = "gzip"
+        data = ('{"to": "04' + "1f" * 64 + '"}') * 100
+
+        resp = render_compressed(request, data)
+
+        self.assertEqual(zlib.decompress(resp, 16 + zlib.MAX_WBITS), data)
+        self.assertLess(len(resp), len(data))
+        request.setHeader.assert_any_call("Content-Encoding", "gzip")
+
+    def test_render_compressed_whenDeflateGiven_thenCompressesWithZlibFormat(self):
+        request = Mock()
+        data = "x" * MIN_COMPRESSED_SIZE
+
+        resp = render_compressed(request, data, DEFLATE)
+
+        self.assertEqual(zlib.decompress(resp), data)
+        request.getHeader.assert_not_called()
+
+    def test_render_compressed_whenSmallBody_thenSendsIdentity(self):
+        request = Mock()
+        request.getHeader.return_value = "gzip"
+
+        resp = render_compressed(request, "[]")
+
+        self.assertEqual(resp, "[]")
+        self.assertNotIn(call("Content-Encoding", "gzip"), request.setHeader.call_args_list)
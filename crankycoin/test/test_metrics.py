@@ -0,0 +1,68 @@
+import unittest
+from mock import patch, Mock, MagicMock, call
+from crankycoin.metrics import *
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_Metric_whenConstructed_thenRegistersWithRegistry(self):
+        registry = Registry()
+
+        counter = Counter("test_total", "test counter", registry=registry)
+
+        self.assertEqual(registry.metrics, [counter])
+
+    def test_render_whenCounterIncremented_thenRendersLabelledTotals(self):
+        counter = Counter("test_total", "test counter", ("stage",), registry=None)
+
+        counter.inc(labels=("hash",))
+        counter.inc(2, ("hash",))
+        counter.inc(labels=("continuity",))
+
+        self.assertEqual(counter.render(), "\n".join([
+            "# HELP test_total test counter",
+            "# TYPE test_total counter",
+            'test_total{stage="continuity"} 1.0',
+            'test_total{stage="hash"} 3.0'
+        ]) + "\n")
+
+    def test_render_whenGaugeSet_thenRendersLatestValue(self):
+        gauge = Gauge("test_gauge", "test gauge", registry=None)
+
+        gauge.set(5)
+        gauge.set(3)
+
+        self.assertEqual(gauge.render(), "# HELP test_gauge test gauge\n# TYPE test_gauge gauge\ntest_gauge 3.0\n")
+
+    def test_render_whenHistogramObserved_thenRendersCumulativeBuckets(self):
+        histogram = Histogram("test_seconds", "test histogram", ("endpoint",), buckets=(0.1, 1), registry=None)
+
+        histogram.observe(0.05, ("get_block",))
+        histogram.observe(0.5, ("get_block",))
+        histogram.observe(5, ("get_block",))
+
+        self.assertEqual(histogram.render(), "\n".join([
+            "# HELP test_seconds test histogram",
+            "# TYPE test_seconds histogram",
+            'test_seconds_bucket{endpoint="get_block",le="0.1"} 1',
+            'test_seconds_bucket{endpoint="get_block",le="1.0"} 2',
+            'test_seconds_bucket{endpoint="get_block",le="+Inf"} 3',
+            'test_seconds_sum{endpoint="get_block"} 5.55',
+            'test_seconds_count{endpoint="get_block"} 3'
+        ]) + "\n")
+
+    def test_time_whenBlockRaises_thenStillObserves(self):
+        histogram = Histogram("test_seconds", "test histogram", registry=None)
+
+        with self.assertRaises(ValueError):
+            with histogram.time():
+                raise ValueError()
+
+        self.assertEqual(histogram.get_count(), 1)
+
+    def test_render_whenLabelValueHasQuotes_thenEscapesLabelValue(self):
+        gauge = Gauge("test_gauge", "test gauge", ("peer",), registry=None)
+
+        gauge.set(1, ('a"b',))
+
+        self.assertIn('test_gauge{peer="a\\"b"} 1.0', gauge.render())
@@ -1,17 +1,51 @@
 import unittest
-from mock import patch, Mock, MagicMock, call
+from mock import patch, Mock, MagicMock, call, ANY
 from crankycoin.node import *
 
 
 class TestNode(unittest.TestCase):
 
+    def test_init_whenStartIsFalse_thenDoesNotJoinNetworkOrListen(self):
+        with patch.object(FullNode, 'start') as patched_start, \
+                patch.object(FullNode, 'run') as patched_run, \
+                patch.object(Blockchain, '__init__', return_value=None) as patched_blockchain_init:
+            node = FullNode("127.0.0.2", "reward_address", start=False)
+
+            self.assertEqual(node.host, "127.0.0.2")
+            self.assertIsInstance(node.blockchain, Blockchain)
+            patched_start.assert_not_called()
+            patched_run.assert_not_called()
+
+    def test_init_whenStartIsTrue_thenStartsAndListens(self):
+        with patch.object(FullNode, 'start') as patched_start, \
+                patch.object(FullNode, 'run') as patched_run, \
+                patch.object(Blockchain, '__init__', return_value=None) as patched_blockchain_init:
+            FullNode("127.0.0.2", "reward_address")
+
+            patched_start.assert_called_once_with()
+            patched_run.assert_called_once_with()
+
+    def test_init_whenSeveralNodes_thenEachHasItsOwnPeerTableAndPool(self):
+        with patch.object(Blockchain, '__init__', return_value=None) as patched_blockchain_init, \
+                patch.object(FullNode, 'broadcast_node') as patched_broadcast_node:
+            node_one = FullNode("127.0.0.2", "reward_address", start=False)
+            node_two = FullNode("127.0.0.3", "reward_address", start=False)
+
+            node_one.add_node("127.0.0.4")
+
+            self.assertEqual(node_two.full_nodes, FullNode.SEED_NODES)
+            self.assertEqual(node_two.full_nodes_last_seen, {})
+            self.assertIsNot(node_one.peer_pool, node_two.peer_pool)
+
     def test_request_nodes_whenValidNode_thenRequestsNodes(self):
         mock_response = Mock()
         mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = {"full_nodes": ["127.0.0.2", "127.0.0.1", "127.0.0.3"]}
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
-                patch("crankycoin.requests.get", return_value=mock_response) as patched_requests:
+                patch.object(PeerConnectionPool, 'get', return_value=mock_response) as patched_requests:
             node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
 
             nodes = node.request_nodes("127.0.0.2", "30013")
 
@@ -23,8 +57,9 @@ class TestNode(unittest.TestCase):
         mock_response = Mock()
         mock_response.status_code = 404
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
-                patch("crankycoin.requests.get", return_value=mock_response) as patched_requests:
+                patch.object(PeerConnectionPool, 'get', return_value=mock_response) as patched_requests:
             node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
 
             nodes = node.request_nodes("127.0.0.2", "30013")
 
@@ -33,8 +68,9 @@ class TestNode(unittest.TestCase):
 
     def test_request_nodes_whenRequestError_thenReturnsNone(self):
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
-                patch("crankycoin.requests.get", side_effect=requests.exceptions.RequestException()) as patched_requests:
+                patch.object(PeerConnectionPool, 'get', side_effect=requests.exceptions.RequestException()) as patched_requests:
             node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
 
             nodes = node.request_nodes("127.0.0.2", "30013")
 
@@ -48,54 +84,444 @@ class TestNode(unittest.TestCase):
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
                 patch.object(FullNode, 'request_nodes', side_effect=[nodes_one, nodes_two, nodes_three]) as patched_request_nodes:
             node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
             node.full_nodes = {"127.0.0.1", "127.0.1.1", "127.0.1.2"}
+            node.full_nodes_last_seen = {}
 
             node.request_nodes_from_all()
 
             self.assertEqual(node.full_nodes, {"127.0.0.2", "127.0.0.1", "127.0.0.3", "127.0.0.4", "127.0.0.5", "127.0.1.1", "127.0.1.2"})
 
-    def test_broadcast_transaction_thenBroadcastsToAllNodes(self):
-        transaction = {}
+    def test_request_nodes_from_all_whenNodesRespond_thenRecordsLastSeenAndRefreshTime(self):
+        nodes_one = {"full_nodes": ["127.0.0.1", "127.0.0.2"]}
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_nodes', side_effect=[nodes_one, None]) as patched_request_nodes, \
+                patch("crankycoin.node.time.time", return_value=1000.0) as patched_time:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.full_nodes = {"127.0.0.1", "127.0.0.3"}
+            node.full_nodes_last_seen = {}
+
+            node.request_nodes_from_all()
+
+            self.assertEqual(len(node.full_nodes_last_seen), 1)
+            self.assertEqual(node.full_nodes_last_seen.values(), [1000.0])
+            self.assertEqual(node.full_nodes_refreshed_at, 1000.0)
+
+    def test_refresh_nodes_whenPeerTableIsFresh_thenDoesNotRequestNodes(self):
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
                 patch.object(FullNode, 'request_nodes_from_all') as patched_request_nodes_from_all, \
-                patch("crankycoin.requests.post") as patched_requests:
+                patch("crankycoin.node.time.time", return_value=1000.0) as patched_time:
             node = FullNode("127.0.0.1", "reward_address")
+            node.full_nodes_refreshed_at = 1000.0 - FullNode.NODES_TTL + 1
+
+            node.refresh_nodes()
+
+            patched_request_nodes_from_all.assert_not_called()
+
+    def test_refresh_nodes_whenPeerTableIsStale_thenRequestsNodesFromAll(self):
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_nodes_from_all') as patched_request_nodes_from_all, \
+                patch("crankycoin.node.time.time", return_value=1000.0) as patched_time:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.full_nodes_refreshed_at = 1000.0 - FullNode.NODES_TTL
+
+            node.refresh_nodes()
+
+            patched_request_nodes_from_all.assert_called_once()
+
+    def test_remove_node_whenFailuresBelowEvictionThreshold_thenKeepsNode(self):
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerHealth, 'should_evict', return_value=False) as patched_should_evict:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.full_nodes = {"127.0.0.1", "127.0.0.2"}
+
+            node.remove_node("127.0.0.2")
+
+            self.assertEqual(node.full_nodes, {"127.0.0.1", "127.0.0.2"})
+
+    def test_remove_node_whenSustainedFailure_thenEvictsNode(self):
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerHealth, 'should_evict', return_value=True) as patched_should_evict:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.full_nodes = {"127.0.0.1", "127.0.0.2"}
+            node.full_nodes_last_seen = {"127.0.0.1": 1000.0, "127.0.0.2": 1000.0}
+
+            node.remove_node("127.0.0.2")
+
+            patched_should_evict.assert_called_once_with("127.0.0.2")
+            self.assertEqual(node.full_nodes, {"127.0.0.1"})
+            self.assertEqual(node.full_nodes_last_seen, {"127.0.0.1": 1000.0})
+
+    def test_select_nodes_whenCalled_thenRanksFullNodesByHealth(self):
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerHealth, 'rank', return_value=["127.0.0.2"]) as patched_rank:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.full_nodes = {"127.0.0.1", "127.0.0.2"}
+
+            nodes = node.select_nodes()
+
+            self.assertEqual(nodes, ["127.0.0.2"])
+            patched_rank.assert_called_once_with({"127.0.0.1", "127.0.0.2"})
+
+    def test_broadcast_transaction_thenAnnouncesToAllNodes(self):
+        transaction = {"hash": "transaction_hash"}
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = {"wanted": []}
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(PeerConnectionPool, 'post', return_value=mock_response) as patched_requests:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
             node.full_nodes = {"127.0.0.1", "127.0.0.2", "127.0.0.3"}
 
             node.broadcast_transaction(transaction)
 
-            patched_request_nodes_from_all.assert_called_once()
+            patched_refresh_nodes.assert_called_once()
             patched_requests.assert_has_calls([
-                call("http://127.0.0.1:30013/transactions", json={'transaction': {}}),
-                call("http://127.0.0.2:30013/transactions", json={'transaction': {}}),
-                call("http://127.0.0.3:30013/transactions", json={'transaction': {}})
+                call("http://127.0.0.1:30013/inventory", json={'host': None, 'transactions': ["transaction_hash"]}),
+                call("http://127.0.0.2:30013/inventory", json={'host': None, 'transactions': ["transaction_hash"]}),
+                call("http://127.0.0.3:30013/inventory", json={'host': None, 'transactions': ["transaction_hash"]})
             ], True)
+            self.assertEqual(patched_requests.call_count, 3)
 
     def test_broadcast_transaction_whenRequestException_thenFailsGracefully(self):
-        transaction = {}
+        transaction = {"hash": "transaction_hash"}
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
-                patch.object(FullNode, 'request_nodes_from_all') as patched_request_nodes_from_all, \
-                patch("crankycoin.requests.post", side_effect=requests.exceptions.RequestException()) as patched_requests:
+                patch.object(FullNode, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(PeerConnectionPool, 'post', side_effect=requests.exceptions.RequestException()) as patched_requests:
             node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
             node.full_nodes = {"127.0.0.1", "127.0.0.2", "127.0.0.3"}
 
             node.broadcast_transaction(transaction)
 
-            patched_request_nodes_from_all.assert_called_once()
+            patched_refresh_nodes.assert_called_once()
             patched_requests.assert_has_calls([
-                call("http://127.0.0.1:30013/transactions", json={'transaction': {}}),
-                call("http://127.0.0.2:30013/transactions", json={'transaction': {}}),
-                call("http://127.0.0.3:30013/transactions", json={'transaction': {}})
+                call("http://127.0.0.1:30013/inventory", json={'host': None, 'transactions': ["transaction_hash"]}),
+                call("http://127.0.0.2:30013/inventory", json={'host': None, 'transactions': ["transaction_hash"]}),
+                call("http://127.0.0.3:30013/inventory", json={'host': None, 'transactions': ["transaction_hash"]})
             ], True)
 
+    def test_announce_transactions_whenNodeWantsSomeTransactions_thenSendsOnlyWantedBodies(self):
+        transaction_one = {"hash": "transaction_hash_one"}
+        transaction_two = {"hash": "transaction_hash_two"}
+        inventory_response = Mock()
+        inventory_response.status_code = 200
+        inventory_response.headers = {}
+        inventory_response.json.return_value = {"wanted": ["transaction_hash_two"]}
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerConnectionPool, 'post', return_value=inventory_response) as patched_requests:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.host = "127.0.0.1"
+            node.full_nodes = {"127.0.0.1", "127.0.0.2"}
+
+            node.announce_transactions([transaction_one, transaction_two])
+
+            self.assertEqual(patched_requests.call_count, 2)
+            self.assertEqual(patched_requests.call_args_list[0][0][0], "http://127.0.0.2:30013/inventory")
+            patched_requests.assert_called_with(
+                "http://127.0.0.2:30013/transactions",
+                json={'host': "127.0.0.1", 'transactions': [transaction_two]})
+
+    def test_announce_transactions_whenNodeHasNoInventoryEndpoint_thenSendsEveryBody(self):
+        transaction = {"hash": "transaction_hash"}
+        inventory_response = Mock()
+        inventory_response.status_code = 404
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerConnectionPool, 'post', return_value=inventory_response) as patched_requests:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.host = "127.0.0.1"
+            node.full_nodes = {"127.0.0.1", "127.0.0.2"}
+
+            node.announce_transactions([transaction])
+
+            patched_requests.assert_called_with("http://127.0.0.2:30013/transactions", json={'transaction': transaction})
+
+    def test_announce_transactions_whenNodeExcluded_thenSkipsNode(self):
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerConnectionPool, 'post') as patched_requests:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.host = "127.0.0.1"
+            node.full_nodes = {"127.0.0.1", "127.0.0.2"}
+
+            node.announce_transactions([{"hash": "transaction_hash"}], exclude="127.0.0.2")
+
+            patched_requests.assert_not_called()
+
+    def test_announce_transactions_whenNodeAnswersErrorOrMalformedBody_thenSkipsItAndAnnouncesToOthers(self):
+        transaction = {"hash": "transaction_hash"}
+        error_response = Mock(status_code=500, headers={})
+        malformed_response = Mock(status_code=200, headers={})
+        malformed_response.json.side_effect = ValueError("No JSON object could be decoded")
+        inventory_response = Mock(status_code=200, headers={})
+        inventory_response.json.return_value = {"wanted": ["transaction_hash"]}
+        responses = {
+            "http://127.0.0.2:30013/inventory": error_response,
+            "http://127.0.0.3:30013/inventory": malformed_response,
+            "http://127.0.0.4:30013/inventory": inventory_response,
+            "http://127.0.0.4:30013/transactions": Mock(status_code=200)
+        }
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerConnectionPool, 'post', side_effect=lambda url, json: responses[url]) as patched_requests:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.host = "127.0.0.1"
+            node.full_nodes = {"127.0.0.1", "127.0.0.2", "127.0.0.3", "127.0.0.4"}
+
+            node.announce_transactions([transaction])
+
+            self.assertEqual(patched_requests.call_count, 4)
+            patched_requests.assert_any_call(
+                "http://127.0.0.4:30013/transactions",
+                json={'host': "127.0.0.1", 'transactions': [transaction]})
+
+    def test_relay_transactions_whenAnnouncementFails_thenKeepsRelaying(self):
+        transaction = {"hash": "transaction_hash"}
+
+        def sleep(seconds):
+            if patched_sleep.call_count > 2:
+                raise SystemExit()
+            node.relay_queue.append((transaction, "127.0.0.2"))
+
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'announce_transactions', side_effect=[KeyError("wanted"), None]) as patched_announce_transactions, \
+                patch("crankycoin.node.time.sleep", side_effect=sleep) as patched_sleep:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.relay_queue_lock = threading.Lock()
+            node.relay_queue = []
+
+            with self.assertRaises(SystemExit):
+                node.relay_transactions()
+
+            self.assertEqual(patched_announce_transactions.call_args_list, [
+                call([transaction], exclude="127.0.0.2"),
+                call([transaction], exclude="127.0.0.2")
+            ])
+
+    def test_post_inventory_whenSomeTransactionsKnown_thenReturnsUnknownHashes(self):
+        request = Mock()
+        request.content.read.return_value = json.dumps({"host": "127.0.0.2", "transactions": ["known_hash", "new_hash"]})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.known_transactions = LRUCache(10)
+            node.known_transactions.put("known_hash", True)
+
+            resp = node.post_inventory(request)
+
+            self.assertEqual(json.loads(resp), {"wanted": ["new_hash"]})
+
+    def test_admit_transaction_whenNewTransaction_thenPushesAndQueuesForRelay(self):
+        transaction = {"from": "from", "to": "to", "amount": 1, "timestamp": "2017", "signature": "signature", "hash": "transaction_hash"}
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.calculate_transaction_hash.return_value = "transaction_hash"
+        mock_blockchain.verify_signature.return_value = True
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.known_transactions = LRUCache(10)
+            node.relay_queue = []
+            node.relay_queue_lock = threading.Lock()
+
+            resp = node.admit_transaction(transaction, "127.0.0.2")
+
+            self.assertTrue(resp)
+            self.assertTrue("transaction_hash" in node.known_transactions)
+            mock_blockchain.push_unconfirmed_transaction.assert_called_once_with(transaction)
+            self.assertEqual(node.relay_queue, [(transaction, "127.0.0.2")])
+
+    def test_admit_transaction_whenKnownTransaction_thenDoesNotPush(self):
+        transaction = {"from": "from", "to": "to", "amount": 1, "timestamp": "2017", "signature": "signature", "hash": "transaction_hash"}
+        mock_blockchain = Mock(Blockchain)
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.known_transactions = LRUCache(10)
+            node.known_transactions.put("transaction_hash", True)
+            node.relay_queue = []
+            node.relay_queue_lock = threading.Lock()
+
+            resp = node.admit_transaction(transaction, "127.0.0.2")
+
+            self.assertFalse(resp)
+            mock_blockchain.push_unconfirmed_transaction.assert_not_called()
+            self.assertEqual(node.relay_queue, [])
+
+    def test_admit_transaction_whenIncorrectHash_thenDoesNotPush(self):
+        transaction = {"from": "from", "to": "to", "amount": 1, "timestamp": "2017", "signature": "signature", "hash": "transaction_hash"}
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.calculate_transaction_hash.return_value = "other_hash"
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.known_transactions = LRUCache(10)
+            node.relay_queue = []
+            node.relay_queue_lock = threading.Lock()
+
+            resp = node.admit_transaction(transaction)
+
+            self.assertFalse(resp)
+            self.assertFalse("transaction_hash" in node.known_transactions)
+            mock_blockchain.push_unconfirmed_transaction.assert_not_called()
+
+    def test_admit_transaction_whenSignatureForged_thenNeitherPoolsNorQueuesForRelay(self):
+        transaction = {"from": "from", "to": "to", "amount": 1, "timestamp": "2017", "signature": "forged", "hash": "transaction_hash"}
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.calculate_transaction_hash.return_value = "transaction_hash"
+        mock_blockchain.verify_signature.return_value = False
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.known_transactions = LRUCache(10)
+            node.relay_queue = []
+            node.relay_queue_lock = threading.Lock()
+
+            resp = node.admit_transaction(transaction, "127.0.0.2")
+
+            self.assertFalse(resp)
+            self.assertFalse("transaction_hash" in node.known_transactions)
+            mock_blockchain.push_unconfirmed_transaction.assert_not_called()
+            self.assertEqual(node.relay_queue, [])
+
+    def test_post_transactions_whenCalled_thenAdmitsEveryTransactionOnWorkerThread(self):
+        transactions = [{"hash": "one"}, {"hash": "two"}]
+        request = Mock()
+        request.content.read.return_value = json.dumps({"host": "127.0.0.2", "transactions": transactions})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'admit_transaction') as patched_admit_transaction, \
+                patch('crankycoin.node.deferToThread', side_effect=lambda f, *args: defer.succeed(f(*args))) as patched_defer_to_thread:
+            node = FullNode("127.0.0.1", "reward_address")
+            responses = []
+
+            node.post_transactions(request).addCallback(responses.append)
+
+            self.assertEqual(patched_defer_to_thread.call_count, 1)
+            self.assertEqual(patched_admit_transaction.call_args_list, [
+                call({"hash": "one"}, "127.0.0.2"),
+                call({"hash": "two"}, "127.0.0.2")
+            ])
+            self.assertEqual(json.loads(responses[0]), {"success": True})
+
+    def test_admit_transaction_whenFieldsMissingOrMistyped_thenDoesNotPush(self):
+        transaction = {"from": "from", "to": "to", "amount": 1, "timestamp": "2017", "signature": "signature", "hash": "transaction_hash"}
+        malformed = [
+            {"hash": "transaction_hash"},
+            dict(transaction, amount=True),
+            dict(transaction, amount="1"),
+            dict(transaction, timestamp=0),
+            dict(transaction, extra="field"),
+            "transaction_hash"
+        ]
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.calculate_transaction_hash.return_value = "transaction_hash"
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.known_transactions = LRUCache(10)
+            node.relay_queue = []
+            node.relay_queue_lock = threading.Lock()
+
+            for transaction in malformed:
+                self.assertFalse(node.admit_transaction(transaction))
+            mock_blockchain.push_unconfirmed_transaction.assert_not_called()
+            self.assertEqual(node.relay_queue, [])
+
+    def test_check_transaction_whenHashOrSignatureInvalid_thenReturnsReason(self):
+        transaction = {"from": "from", "to": "to", "amount": 1, "timestamp": "2017", "signature": "signature", "hash": "transaction_hash"}
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.calculate_transaction_hash.return_value = "transaction_hash"
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            mock_blockchain.verify_signature.return_value = True
+            self.assertIsNone(node.check_transaction(transaction))
+            mock_blockchain.verify_signature.assert_called_once_with("signature", "from:to:1:2017", "from")
+            mock_blockchain.verify_signature.return_value = False
+            self.assertEqual(node.check_transaction(transaction), "invalid signature")
+            mock_blockchain.verify_signature.side_effect = Exception("[OpenSSL] EC_KEY_set_public_key FAIL")
+            self.assertEqual(node.check_transaction(transaction), "malformed transaction")
+            self.assertEqual(node.check_transaction({"hash": "transaction_hash"}), "malformed transaction")
+            mock_blockchain.calculate_transaction_hash.return_value = "other_hash"
+            self.assertEqual(node.check_transaction(transaction), "invalid hash")
+
+    def test_admit_transactions_whenMixedBatch_thenReturnsResultPerTransaction(self):
+        transactions = [{"hash": "new_hash"}, {"hash": "bad_hash"}, {"hash": "confirmed_hash"}, {"hash": "new_hash"}, "malformed"]
+        errors = [None, "invalid signature", None, None, "malformed transaction"]
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.find_confirmed_transactions.return_value = {"confirmed_hash"}
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'admit_checked_transaction', side_effect=[True, False]) as patched_admit_checked_transaction:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            results = node.admit_transactions(transactions, errors, "127.0.0.2")
+
+            self.assertEqual(list(mock_blockchain.find_confirmed_transactions.call_args[0][0]), ["new_hash", "confirmed_hash", "new_hash"])
+            self.assertEqual(patched_admit_checked_transaction.call_args_list, [
+                call({"hash": "new_hash"}, "127.0.0.2"),
+                call({"hash": "new_hash"}, "127.0.0.2")
+            ])
+            self.assertEqual(results, [
+                {"hash": "new_hash", "accepted": True},
+                {"hash": "bad_hash", "accepted": False, "message": "invalid signature"},
+                {"hash": "confirmed_hash", "accepted": False, "message": "already in a block"},
+                {"hash": "new_hash", "accepted": False, "message": "duplicate transaction"},
+                {"hash": None, "accepted": False, "message": "malformed transaction"}
+            ])
+
+    def test_post_transactions_batch_whenCalled_thenChecksInChunksAndReturnsResults(self):
+        transactions = [{"hash": "hash_{}".format(i)} for i in range(5)]
+        request = Mock()
+        request.content.read.return_value = json.dumps({"host": "127.0.0.2", "transactions": transactions})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'check_transactions', side_effect=lambda chunk: [None] * len(chunk)) as patched_check_transactions, \
+                patch.object(FullNode, 'admit_transactions', return_value=[{"hash": "hash_0", "accepted": True}, {"hash": "hash_1", "accepted": False}]) as patched_admit_transactions, \
+                patch('crankycoin.node.deferToThread', side_effect=lambda f, *args: defer.succeed(f(*args))) as patched_defer_to_thread:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.BATCH_CHECK_CHUNK = 2
+            responses = []
+
+            node.post_transactions_batch(request).addCallback(responses.append)
+
+            self.assertEqual(patched_check_transactions.call_args_list, [
+                call(transactions[0:2]), call(transactions[2:4]), call(transactions[4:5])
+            ])
+            patched_admit_transactions.assert_called_once_with(transactions, [None] * 5, "127.0.0.2")
+            self.assertEqual(json.loads(responses[0])["accepted"], 1)
+            self.assertEqual(json.loads(responses[0])["rejected"], 1)
+
+    def test_post_transactions_batch_whenTooManyTransactions_thenReturns413(self):
+        request = Mock()
+        request.content.read.return_value = json.dumps({"transactions": [{}, {}, {}]})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch('crankycoin.node.deferToThread') as patched_defer_to_thread:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.MAX_BATCH_TRANSACTIONS = 2
+
+            node.post_transactions_batch(request)
+
+            request.setResponseCode.assert_called_once_with(413)
+            patched_defer_to_thread.assert_not_called()
+
     def test_request_block_whenIndexIsLatest_thenRequestsLatestBlockFromNode(self):
         mock_response = Mock()
         mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = '{"nonce": 12345, "index": 35, "transactions": [], "timestamp": 1234567890, "current_hash": "current_hash", "previous_hash": "previous_hash"}'
 
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
-                patch("crankycoin.requests.get", return_value=mock_response) as patched_requests:
+                patch.object(PeerConnectionPool, 'get', return_value=mock_response) as patched_requests:
             node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
 
             block = node.request_block("127.0.0.2", "30013", "latest")
 
@@ -111,11 +537,13 @@ class TestNode(unittest.TestCase):
     def test_request_block_whenIndexIsNumeric_thenRequestsCorrectBlockFromNode(self):
         mock_response = Mock()
         mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = '{"nonce": 12345, "index": 29, "transactions": [], "timestamp": 1234567890, "current_hash": "current_hash", "previous_hash": "previous_hash"}'
 
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
-                patch("crankycoin.requests.get", return_value=mock_response) as patched_requests:
+                patch.object(PeerConnectionPool, 'get', return_value=mock_response) as patched_requests:
             node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
 
             block = node.request_block("127.0.0.2", "30013", 29)
 
@@ -130,8 +558,9 @@ class TestNode(unittest.TestCase):
 
     def test_request_block_whenRequestException_thenReturnsNone(self):
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
-                patch("crankycoin.requests.get", side_effect=requests.exceptions.RequestException()) as patched_requests:
+                patch.object(PeerConnectionPool, 'get', side_effect=requests.exceptions.RequestException()) as patched_requests:
             node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
 
             block = node.request_block("127.0.0.2", "30013", "latest")
 
@@ -143,6 +572,7 @@ class TestNode(unittest.TestCase):
         with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
                 patch.object(FullNode, 'request_block', side_effect=[block, block, block]) as patched_request_block:
             node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
             node.full_nodes = {"127.0.0.1", "127.0.0.2", "127.0.0.3"}
 
             blocks = node.request_block_from_all("latest")
@@ -154,6 +584,752 @@ class TestNode(unittest.TestCase):
                 call("127.0.0.3", "30013", "latest")
             ], True)
 
+    def test_broadcast_block_whenNodesAcceptCompactBlock_thenCountsConfirmations(self):
+        block = Mock(Block)
+        block.current_hash = "current_hash"
+        block.to_compact.return_value = {"index": 1}
+        mock_response = Mock()
+        mock_response.status_code = 202
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(PeerConnectionPool, 'post', return_value=mock_response) as patched_requests:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.host = "127.0.0.1"
+            node.full_nodes = {"127.0.0.1", "127.0.0.2", "127.0.0.3"}
+            node.relayed_blocks = LRUCache(2)
+
+            statuses = node.broadcast_block(block)
+
+            self.assertEqual(statuses, {"confirmations": 2, "invalidations": 0, "expirations": 0})
+            self.assertIs(node.relayed_blocks.get("current_hash"), block)
+            patched_requests.assert_has_calls([
+                call("http://127.0.0.2:30013/blocks/compact", json={'block': {"index": 1}, 'host': "127.0.0.1"}),
+                call("http://127.0.0.3:30013/blocks/compact", json={'block': {"index": 1}, 'host': "127.0.0.1"})
+            ], True)
+            block.to_json.assert_not_called()
+
+    def test_broadcast_block_whenNodeHasNoCompactEndpoint_thenSendsFullBlock(self):
+        block = Mock(Block)
+        block.current_hash = "current_hash"
+        block.to_compact.return_value = {"index": 1}
+        block.to_json.return_value = '{"index": 1}'
+        not_found_response = Mock()
+        not_found_response.status_code = 404
+        accepted_response = Mock()
+        accepted_response.status_code = 202
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(PeerConnectionPool, 'post', side_effect=[not_found_response, accepted_response]) as patched_requests:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.host = "127.0.0.1"
+            node.full_nodes = {"127.0.0.1", "127.0.0.2"}
+            node.relayed_blocks = LRUCache(2)
+
+            statuses = node.broadcast_block(block)
+
+            self.assertEqual(statuses["confirmations"], 1)
+            patched_requests.assert_called_with("http://127.0.0.2:30013/blocks", json={'block': '{"index": 1}', 'host': "127.0.0.1"})
+
+    def test_reconstruct_block_whenAllTransactionsUnconfirmedLocally_thenRebuildsWithoutFetching(self):
+        transaction_one = {"hash": "transaction_hash_one"}
+        transaction_two = {"hash": "transaction_hash_two"}
+        coinbase = {"hash": "coinbase_hash", "from": "0"}
+        compact_block = {
+            "index": 5,
+            "previous_hash": "previous_hash",
+            "current_hash": "current_hash",
+            "timestamp": 1234567890,
+            "nonce": 12345,
+            "transaction_hashes": ["transaction_hash_two", "transaction_hash_one"],
+            "coinbase": coinbase
+        }
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_all_unconfirmed_transactions.return_value = [transaction_one, transaction_two]
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_compact_block_transactions') as patched_request_transactions:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            block = node.reconstruct_block(compact_block, "127.0.0.2")
+
+            patched_request_transactions.assert_not_called()
+            self.assertEqual(block.index, 5)
+            self.assertEqual(block.transactions, [transaction_two, transaction_one, coinbase])
+            self.assertEqual(block.current_hash, "current_hash")
+            self.assertEqual(block.nonce, 12345)
+
+    def test_reconstruct_block_whenTransactionsMissingLocally_thenFetchesOnlyMissing(self):
+        transaction_one = {"hash": "transaction_hash_one"}
+        transaction_two = {"hash": "transaction_hash_two"}
+        coinbase = {"hash": "coinbase_hash", "from": "0"}
+        compact_block = {
+            "index": 5,
+            "previous_hash": "previous_hash",
+            "current_hash": "current_hash",
+            "timestamp": 1234567890,
+            "nonce": 12345,
+            "transaction_hashes": ["transaction_hash_one", "transaction_hash_two"],
+            "coinbase": coinbase
+        }
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_all_unconfirmed_transactions.return_value = [transaction_one]
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_compact_block_transactions', return_value=[transaction_two]) as patched_request_transactions:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            block = node.reconstruct_block(compact_block, "127.0.0.2")
+
+            patched_request_transactions.assert_called_once_with("127.0.0.2", "30013", "current_hash", ["transaction_hash_two"])
+            self.assertEqual(block.transactions, [transaction_one, transaction_two, coinbase])
+
+    def test_reconstruct_block_whenMissingTransactionsCannotBeFetched_thenReturnsNone(self):
+        compact_block = {
+            "index": 5,
+            "previous_hash": "previous_hash",
+            "current_hash": "current_hash",
+            "timestamp": 1234567890,
+            "nonce": 12345,
+            "transaction_hashes": ["transaction_hash_one"],
+            "coinbase": {"hash": "coinbase_hash"}
+        }
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_all_unconfirmed_transactions.return_value = []
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_compact_block_transactions', return_value=None) as patched_request_transactions:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            block = node.reconstruct_block(compact_block, "127.0.0.2")
+
+            self.assertIsNone(block)
+
+    def test_receive_block_whenIndexTooLow_thenReturns409WithoutProcessing(self):
+        block = Block(5, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 5
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = mock_latest_block
+        request = Mock()
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch('crankycoin.node.deferToThread') as patched_defer_to_thread:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            node.receive_block(request, block, "127.0.0.2")
+
+            request.setResponseCode.assert_called_once_with(409)
+            patched_defer_to_thread.assert_not_called()
+
+    def test_receive_block_whenIndexAhead_thenReturns202AndProcessesInBackground(self):
+        block = Block(9, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 5
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = mock_latest_block
+        request = Mock()
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_blocks_stream') as patched_request_blocks_stream, \
+                patch('crankycoin.node.deferToThread') as patched_defer_to_thread:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            node.receive_block(request, block, "127.0.0.2")
+
+            request.setResponseCode.assert_called_once_with(202)
+            patched_defer_to_thread.assert_called_once_with(node.process_block, block, "127.0.0.2")
+            patched_request_blocks_stream.assert_not_called()
+            mock_blockchain.add_block.assert_not_called()
+
+    def test_process_block_whenNextBlock_thenAddsBlock(self):
+        block = Block(6, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 5
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = mock_latest_block
+        mock_blockchain.add_block.return_value = True
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_processing_lock = threading.Lock()
+
+            result = node.process_block(block, "127.0.0.2")
+
+            self.assertTrue(result)
+            mock_blockchain.add_block.assert_called_once_with(block)
+
+    def test_process_block_whenAnnouncedTipCannotBeSynced_thenReportsLagBehindIt(self):
+        block = Block(8, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 5
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = mock_latest_block
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'sync_with_node', return_value=False) as patched_sync_with_node:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_processing_lock = threading.Lock()
+
+            result = node.process_block(block, "127.0.0.2")
+
+            self.assertFalse(result)
+            self.assertEqual(SYNC_LAG_BLOCKS.get(), 3)
+
+            patched_sync_with_node.return_value = True
+            node.process_block(block, "127.0.0.2")
+
+            self.assertEqual(SYNC_LAG_BLOCKS.get(), 0)
+
+    def test_process_block_whenChainAdvancedMeanwhile_thenSkipsBlock(self):
+        block = Block(6, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 6
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = mock_latest_block
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_processing_lock = threading.Lock()
+
+            result = node.process_block(block, "127.0.0.2")
+
+            self.assertFalse(result)
+            mock_blockchain.add_block.assert_not_called()
+
+    def test_process_block_whenBehind_thenAddsStreamedBlocks(self):
+        block = Block(7, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 5
+        mock_latest_block.current_hash = "hash_5"
+        block_6 = Mock(Block)
+        block_6.previous_hash = "hash_5"
+        block_7 = Mock(Block)
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = mock_latest_block
+        mock_blockchain.add_block.return_value = True
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_blocks_stream', return_value=iter([block_6, block_7])) as patched_request_blocks_stream:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_processing_lock = threading.Lock()
+
+            result = node.process_block(block, "127.0.0.2")
+
+            self.assertTrue(result)
+            patched_request_blocks_stream.assert_called_once_with("127.0.0.2", FULL_NODE_PORT, 6, 7)
+            mock_blockchain.add_block.assert_has_calls([call(block_6), call(block_7)])
+
+    def test_sync_with_node_whenDownloading_thenOnlyHoldsLockToApplyBlocks(self):
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 5
+        mock_latest_block.current_hash = "hash_5"
+        block_6 = Mock(Block)
+        block_6.previous_hash = "hash_5"
+        block_7 = Mock(Block)
+        locked_while_downloading = []
+        locked_while_applying = []
+
+        def request_blocks_stream(node, port, start_index, stop_index):
+            for block in (block_6, block_7):
+                locked_while_downloading.append(node_under_test.block_processing_lock.locked())
+                yield block
+
+        def add_block(block):
+            locked_while_applying.append(node_under_test.block_processing_lock.locked())
+            return True
+
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.add_block.side_effect = add_block
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_blocks_stream', side_effect=request_blocks_stream) as patched_request_blocks_stream:
+            node_under_test = FullNode("127.0.0.1", "reward_address")
+            node_under_test.blockchain = mock_blockchain
+            node_under_test.block_processing_lock = threading.Lock()
+
+            result = node_under_test.sync_with_node("127.0.0.2", mock_latest_block, 7)
+
+            self.assertTrue(result)
+            self.assertEqual(locked_while_downloading, [False, False])
+            self.assertEqual(locked_while_applying, [True, True])
+
+    def test_post_node_whenCalled_thenAddsNodeInBackground(self):
+        request = Mock()
+        request.content.read.return_value = json.dumps({"host": "127.0.0.2"})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch('crankycoin.node.deferToThread') as patched_defer_to_thread:
+            node = FullNode("127.0.0.1", "reward_address")
+
+            resp = node.post_node(request)
+
+            patched_defer_to_thread.assert_called_once_with(node.add_node, "127.0.0.2")
+            self.assertEqual(json.loads(resp), {"success": True})
+
+    def test_post_block_locator_whenCommonBlockFound_thenReturnsIndexAndHeaders(self):
+        block = Block(4, [{"hash": "tx_hash"}], "hash_3", "hash_4", 1234567890, 12345)
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.find_fork_point.return_value = 3
+        mock_blockchain.get_blocks_range.return_value = [block]
+        request = Mock()
+        request.getHeader.return_value = None
+        request.content.read.return_value = json.dumps({"locator": ["hash_3", "hash_0"]})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            resp = node.post_block_locator(request)
+
+            mock_blockchain.find_fork_point.assert_called_once_with(["hash_3", "hash_0"])
+            mock_blockchain.get_blocks_range.assert_called_once_with(4, 3 + FullNode.MAX_LOCATOR_HEADERS)
+            request.setHeader.assert_called_once_with("Content-Type", WIRE_JSON_CONTENT_TYPE)
+            self.assertEqual(json.loads(resp), {
+                "index": 3,
+                "headers": [{"index": 4, "previous_hash": "hash_3", "current_hash": "hash_4", "timestamp": 1234567890, "nonce": 12345}]
+            })
+
+    def test_post_block_locator_whenPeerAcceptsBinary_thenRendersHeadersFrame(self):
+        block = Block(4, [{"hash": "tx_hash"}], "ab" * 32, "cd" * 32, "2017-01-01T00:00:00", 12345)
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.find_fork_point.return_value = 3
+        mock_blockchain.get_blocks_range.return_value = [block]
+        request = Mock()
+        request.getHeader.return_value = WIRE_BINARY_CONTENT_TYPE
+        request.content.read.return_value = json.dumps({"locator": ["ab" * 32]})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            resp = node.post_block_locator(request)
+
+            request.setHeader.assert_called_once_with("Content-Type", WIRE_BINARY_CONTENT_TYPE)
+            self.assertEqual(decode_binary(resp), {
+                "index": 3,
+                "headers": [{"index": 4, "previous_hash": "ab" * 32, "current_hash": "cd" * 32, "timestamp": "2017-01-01T00:00:00", "nonce": 12345}]
+            })
+
+    def test_post_block_locator_whenNoCommonBlock_thenReturns406(self):
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.find_fork_point.return_value = None
+        request = Mock()
+        request.content.read.return_value = json.dumps({"locator": ["remote_hash"]})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            node.post_block_locator(request)
+
+            request.setResponseCode.assert_called_once_with(406)
+
+    def test_request_fork_point_whenNodeSupportsLocator_thenReturnsForkIndexAndHeaders(self):
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_block_locator.return_value = ["hash_3", "hash_0"]
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = {"index": 3, "headers": [{"current_hash": "remote_hash_4"}]}
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerConnectionPool, 'post', return_value=mock_response) as patched_post:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.blockchain = mock_blockchain
+
+            fork_point = node.request_fork_point("127.0.0.2", FULL_NODE_PORT)
+
+            self.assertEqual(fork_point, (3, [{"current_hash": "remote_hash_4"}]))
+            patched_post.assert_called_once_with(BLOCKS_LOCATOR_URL.format("127.0.0.2", FULL_NODE_PORT), json={"locator": ["hash_3", "hash_0"]})
+
+    def test_request_fork_point_whenLegacyNode_thenWalksBack(self):
+        mock_response = Mock()
+        mock_response.status_code = 404
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerConnectionPool, 'post', return_value=mock_response) as patched_post, \
+                patch.object(FullNode, 'request_fork_point_by_walk', return_value=(2, [])) as patched_walk:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.blockchain = Mock(Blockchain)
+
+            fork_point = node.request_fork_point("127.0.0.2", FULL_NODE_PORT)
+
+            self.assertEqual(fork_point, (2, []))
+            patched_walk.assert_called_once_with("127.0.0.2", FULL_NODE_PORT)
+
+    def test_sync_fork_whenHeadersConnect_thenAltersChainFromForkPoint(self):
+        fork_block = Mock(Block)
+        fork_block.current_hash = "hash_3"
+        remote_blocks = [Mock(Block), Mock(Block)]
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_snapshot.return_value.get_block_by_index.return_value = fork_block
+        headers = [{"previous_hash": "hash_3", "current_hash": "remote_hash_4"}, {"previous_hash": "remote_hash_4", "current_hash": "remote_hash_5"}]
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_fork_point', return_value=(3, headers)) as patched_request_fork_point, \
+                patch.object(FullNode, 'request_blocks_stream', return_value=iter(remote_blocks)) as patched_request_blocks_stream, \
+                patch.object(FullNode, 'alter_chain', return_value=True) as patched_alter_chain:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_processing_lock = threading.Lock()
+
+            result = node.sync_fork("127.0.0.2", 5)
+
+            self.assertTrue(result)
+            mock_blockchain.get_snapshot.return_value.get_block_by_index.assert_called_once_with(3)
+            patched_request_blocks_stream.assert_called_once_with("127.0.0.2", FULL_NODE_PORT, 4, 5)
+            patched_alter_chain.assert_called_once_with(remote_blocks)
+
+    def test_sync_fork_whenHeadersDoNotConnect_thenSkipsBlockDownload(self):
+        fork_block = Mock(Block)
+        fork_block.current_hash = "hash_3"
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_snapshot.return_value.get_block_by_index.return_value = fork_block
+        headers = [{"previous_hash": "other_hash", "current_hash": "remote_hash_4"}]
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_fork_point', return_value=(3, headers)) as patched_request_fork_point, \
+                patch.object(FullNode, 'request_blocks_stream') as patched_request_blocks_stream, \
+                patch.object(FullNode, 'alter_chain') as patched_alter_chain:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            result = node.sync_fork("127.0.0.2", 5)
+
+            self.assertFalse(result)
+            patched_request_blocks_stream.assert_not_called()
+            patched_alter_chain.assert_not_called()
+
+    def test_sync_fork_whenForkIndexOutOfRange_thenSkipsBlockDownload(self):
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_snapshot.return_value = ChainSnapshot([Mock(Block), Mock(Block)], 2)
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'request_fork_point', side_effect=[(2, []), (-1, []), ("1", [])]) as patched_request_fork_point, \
+                patch.object(FullNode, 'request_blocks_stream') as patched_request_blocks_stream, \
+                patch.object(FullNode, 'alter_chain') as patched_alter_chain:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            for i in range(3):
+                self.assertFalse(node.sync_fork("127.0.0.2", 5))
+            patched_request_blocks_stream.assert_not_called()
+            patched_alter_chain.assert_not_called()
+
+    def test_get_metrics_whenScraped_thenSamplesMempoolAndRendersRegistry(self):
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_all_unconfirmed_transactions.return_value = [{"hash": "one"}, {"hash": "two"}]
+        mock_blockchain.get_oldest_unconfirmed_transaction_age.return_value = 12.5
+        request = Mock()
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+
+            resp = node.get_metrics(request)
+
+            request.setHeader.assert_called_once_with("Content-Type", METRICS_CONTENT_TYPE)
+            self.assertIn("crankycoin_mempool_transactions 2.0", resp)
+            self.assertIn("crankycoin_mempool_oldest_age_seconds 12.5", resp)
+            self.assertIn("# TYPE crankycoin_block_validation_seconds histogram", resp)
+
+    def test_InstrumentedKlein_whenEndpointExecuted_thenObservesLatencyByEndpoint(self):
+        app = InstrumentedKlein()
+
+        @app.route('/test')
+        def instrumented_endpoint(request):
+            return "response"
+
+        before = HTTP_REQUEST_SECONDS.get_count(("instrumented_endpoint",))
+        results = []
+
+        app.execute_endpoint("instrumented_endpoint", Mock()).addCallback(results.append)
+
+        self.assertEqual(results, ["response"])
+        self.assertEqual(HTTP_REQUEST_SECONDS.get_count(("instrumented_endpoint",)), before + 1)
+
+    def test_post_profiler_whenEnabledFromLocalhost_thenStartsProfiler(self):
+        request = Mock()
+        request.getClientIP.return_value = "127.0.0.1"
+        request.content.read.return_value = json.dumps({"enabled": True, "interval": 0.01})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(SamplingProfiler, 'start') as patched_start:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.host = "127.0.0.1"
+
+            node.post_profiler(request)
+
+            patched_start.assert_called_once_with(0.01)
+
+    def test_post_profiler_whenDisabled_thenStopsProfiler(self):
+        request = Mock()
+        request.getClientIP.return_value = "127.0.0.1"
+        request.content.read.return_value = json.dumps({"enabled": False})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(SamplingProfiler, 'stop') as patched_stop:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.host = "127.0.0.1"
+
+            node.post_profiler(request)
+
+            patched_stop.assert_called_once_with()
+
+    def test_post_profiler_whenIntervalNotPositiveNumber_thenReturns400(self):
+        for interval in (0, -1, "fast", True):
+            request = Mock()
+            request.getClientIP.return_value = "127.0.0.1"
+            request.content.read.return_value = json.dumps({"enabled": True, "interval": interval})
+            with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                    patch.object(SamplingProfiler, 'start') as patched_start:
+                node = FullNode("127.0.0.1", "reward_address")
+                node.host = "127.0.0.1"
+
+                node.post_profiler(request)
+
+                request.setResponseCode.assert_called_once_with(400)
+                patched_start.assert_not_called()
+
+    def test_post_profiler_whenRemoteClient_thenReturns403(self):
+        request = Mock()
+        request.getClientIP.return_value = "10.0.0.9"
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(SamplingProfiler, 'start') as patched_start:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.host = "127.0.0.1"
+
+            node.post_profiler(request)
+
+            request.setResponseCode.assert_called_once_with(403)
+            patched_start.assert_not_called()
+
+    def test_post_compact_block_transactions_whenBlockRelayed_thenReturnsRequestedTransactions(self):
+        transaction_one = {"hash": "transaction_hash_one"}
+        transaction_two = {"hash": "transaction_hash_two"}
+        block = Block(5, [transaction_one, transaction_two, {"hash": "coinbase_hash"}], "previous_hash", "current_hash", 1234567890, 12345)
+        request = Mock()
+        request.content.read.return_value = json.dumps({"hashes": ["transaction_hash_two"]})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.relayed_blocks = LRUCache(2)
+            node.relayed_blocks.put("current_hash", block)
+
+            resp = node.post_compact_block_transactions(request, "current_hash")
+
+            self.assertEqual(json.loads(resp), [transaction_two])
+
+    def test_post_compact_block_transactions_whenBlockUnknown_thenReturns404(self):
+        request = Mock()
+        request.content.read.return_value = json.dumps({"hashes": ["transaction_hash_two"]})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.relayed_blocks = LRUCache(2)
+
+            node.post_compact_block_transactions(request, "current_hash")
+
+            request.setResponseCode.assert_called_once_with(404)
+
+    def test_request_blocks_stream_whenNodeStreams_thenYieldsBlocksPerLine(self):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_lines.return_value = [
+            '{"nonce": 1, "index": 5, "transactions": [], "timestamp": 1234567890, "current_hash": "current_hash_one", "previous_hash": "previous_hash"}',
+            '',
+            '{"nonce": 2, "index": 6, "transactions": [], "timestamp": 1234567891, "current_hash": "current_hash_two", "previous_hash": "current_hash_one"}'
+        ]
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerConnectionPool, 'get', return_value=mock_response) as patched_requests:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+
+            blocks = list(node.request_blocks_stream("127.0.0.2", "30013", 5, 6))
+
+            self.assertEqual([block.index for block in blocks], [5, 6])
+            self.assertEqual(blocks[1].previous_hash, "current_hash_one")
+            patched_requests.assert_called_once_with('http://127.0.0.2:30013/blocks/stream/5/6', stream=True)
+            mock_response.close.assert_called_once()
+
+    def test_request_blocks_stream_whenNodeDoesNotStream_thenFallsBackToBlocksRange(self):
+        mock_response = Mock()
+        mock_response.status_code = 404
+        block = Mock(Block)
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerConnectionPool, 'get', return_value=mock_response) as patched_requests, \
+                patch.object(FullNode, 'request_blocks_range', return_value=[block]) as patched_request_blocks_range:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+
+            blocks = list(node.request_blocks_stream("127.0.0.2", "30013", 5, 6))
+
+            self.assertEqual(blocks, [block])
+            patched_request_blocks_range.assert_called_once_with("127.0.0.2", "30013", 5, 6)
+
+    def test_request_blocks_stream_whenRequestException_thenYieldsNothing(self):
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(PeerConnectionPool, 'get', side_effect=requests.exceptions.RequestException()) as patched_requests:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+
+            blocks = list(node.request_blocks_stream("127.0.0.2", "30013"))
+
+            self.assertEqual(blocks, [])
+            patched_requests.assert_called_once_with('http://127.0.0.2:30013/blocks/stream', stream=True)
+
+    def test_get_block_whenPeerAcceptsWireFormat_thenRendersVersionedJson(self):
+        block = Block(5, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_block_by_index.return_value = block
+        request = Mock()
+        request.getHeader.return_value = WIRE_JSON_CONTENT_TYPE
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_responses = LRUCache(10)
+
+            resp = node.get_block(request, "5")
+
+            mock_blockchain.get_block_by_index.assert_called_once_with(5)
+            request.setHeader.assert_any_call("Content-Type", WIRE_JSON_CONTENT_TYPE)
+            self.assertNotIn(" ", resp)
+            self.assertEqual(json.loads(resp), block.__dict__)
+
+    def test_get_block_whenLegacyPeer_thenRendersLegacyJson(self):
+        block = Block(5, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = block
+        request = Mock()
+        request.getHeader.return_value = None
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_responses = LRUCache(10)
+
+            resp = node.get_block(request, "latest")
+
+            self.assertNotIn(call("Content-Type", ANY), request.setHeader.call_args_list)
+            self.assertEqual(resp, json.dumps(block.__dict__))
+
+    def test_get_block_whenIfNoneMatchesETag_thenReturnsNotModified(self):
+        block = Block(5, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_block_by_index.return_value = block
+        request = Mock()
+        request.getHeader.side_effect = lambda name: '"current_hash-legacy"' if name == "If-None-Match" else None
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_responses = LRUCache(10)
+
+            resp = node.get_block(request, "5")
+
+            request.setResponseCode.assert_called_once_with(304)
+            request.setHeader.assert_any_call("ETag", '"current_hash-legacy"')
+            self.assertEqual(resp, "")
+            self.assertEqual(len(node.block_responses), 0)
+
+    def test_get_block_whenResponseCached_thenServesCachedBody(self):
+        block = Block(5, [], "previous_hash", "current_hash", 1234567890, 12345)
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_block_by_index.return_value = block
+        request = Mock()
+        request.getHeader.return_value = None
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_responses = LRUCache(10)
+            node.block_responses.put(("current_hash", None), (None, "cached_body"))
+
+            resp = node.get_block(request, "5")
+
+            self.assertEqual(resp, "cached_body")
+
+    def test_get_block_whenBinaryCodecCannotEncodeBlock_thenServesAndCachesVersionedJson(self):
+        transactions = [{"from": "from", "to": "to", "amount": True, "signature": "0", "timestamp": "t", "hash": "ab" * 32}]
+        block = Block(5, transactions, "previous_hash", "current_hash", 1234567890, 12345)
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_block_by_index.return_value = block
+        request = Mock()
+        request.getHeader.side_effect = lambda name: WIRE_BINARY_CONTENT_TYPE if name == "Accept" else None
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_responses = LRUCache(10)
+
+            first = node.get_block(request, "5")
+            second = node.get_block(request, "5")
+
+            self.assertEqual(first, second)
+            self.assertEqual(json.loads(second), block.__dict__)
+            self.assertEqual(request.setHeader.call_args_list.count(call("Content-Type", WIRE_JSON_CONTENT_TYPE)), 2)
+            self.assertNotIn(call("Content-Type", WIRE_BINARY_CONTENT_TYPE), request.setHeader.call_args_list)
+
+    def test_alter_chain_whenChainReplaced_thenEvictsReplacedBlockResponses(self):
+        old_block = Mock(Block)
+        old_block.current_hash = "old_hash"
+        old_block.index = 6
+        new_block = Mock(Block)
+        new_block.index = 5
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = old_block
+        mock_blockchain.get_blocks_range.return_value = [old_block]
+        mock_blockchain.alter_chain.return_value = True
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.block_responses = LRUCache(10)
+            node.block_responses.put(("old_hash", None), "old_body")
+            node.block_responses.put(("old_hash", WIRE_BINARY_CONTENT_TYPE), "old_body")
+            node.block_responses.put(("kept_hash", None), "kept_body")
+
+            resp = node.alter_chain([new_block])
+
+            self.assertTrue(resp)
+            mock_blockchain.alter_chain.assert_called_once_with([new_block])
+            self.assertNotIn(("old_hash", None), node.block_responses)
+            self.assertNotIn(("old_hash", WIRE_BINARY_CONTENT_TYPE), node.block_responses)
+            self.assertIn(("kept_hash", None), node.block_responses)
+
+    def test_post_block_whenBlockIsLegacyJsonString_thenDecodesBlock(self):
+        block_dict = {"nonce": 12345, "index": 5, "transactions": [], "timestamp": 1234567890, "current_hash": "current_hash", "previous_hash": "previous_hash"}
+        request = Mock()
+        request.content.read.return_value = json.dumps({"block": json.dumps(block_dict, indent=4), "host": "127.0.0.2"})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'receive_block', return_value="accepted") as patched_receive_block:
+            node = FullNode("127.0.0.1", "reward_address")
+
+            resp = node.post_block(request)
+
+            self.assertEqual(resp, "accepted")
+            self.assertEqual(patched_receive_block.call_args[0][1].__dict__, block_dict)
+            self.assertEqual(patched_receive_block.call_args[0][2], "127.0.0.2")
+
+    def test_post_block_whenBlockIsSingleEncoded_thenUsesBlockDirectly(self):
+        block_dict = {"nonce": 12345, "index": 5, "transactions": [], "timestamp": 1234567890, "current_hash": "current_hash", "previous_hash": "previous_hash"}
+        request = Mock()
+        request.content.read.return_value = encode({"block": block_dict, "host": "127.0.0.2"})
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'receive_block', return_value="accepted") as patched_receive_block:
+            node = FullNode("127.0.0.1", "reward_address")
+
+            node.post_block(request)
+
+            self.assertEqual(patched_receive_block.call_args[0][1].__dict__, block_dict)
+
+    def test_get_blocks_range_whenRangeServedTwice_thenSecondResponseComesFromCompressedCache(self):
+        transactions = [{"from": "0", "to": "04" + "1f" * 64, "amount": 50, "signature": "0", "timestamp": 0, "hash": "ab" * 32}]
+        blocks = [Block(i, transactions, "previous_hash", "current_hash_{}".format(i), 1234567890, i) for i in range(5)]
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_blocks_range.return_value = blocks
+        request = Mock()
+        request.getHeader.side_effect = lambda header: {"Accept": WIRE_JSON_CONTENT_TYPE, "Accept-Encoding": "gzip"}.get(header)
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch('crankycoin.node.encode_negotiated', wraps=encode_negotiated) as patched_encode_negotiated:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.blockchain = mock_blockchain
+            node.compressed_ranges = LRUCache(2)
+
+            first = node.get_blocks_range(request, "0", "4")
+            second = node.get_blocks_range(request, "0", "4")
+
+            self.assertEqual(first, second)
+            self.assertEqual(patched_encode_negotiated.call_count, 1)
+            mock_blockchain.get_blocks_range.assert_called_with(0, 4)
+            self.assertEqual(json.loads(zlib.decompress(second, 16 + zlib.MAX_WBITS)), [block.__dict__ for block in blocks])
+            self.assertEqual(request.setHeader.call_args_list.count(call("Content-Encoding", "gzip")), 2)
+            request.setHeader.assert_any_call("Content-Type", WIRE_JSON_CONTENT_TYPE)
+
     def test_request_blocks_range(self):
         pass
 
@@ -175,8 +1351,103 @@ class TestNode(unittest.TestCase):
     def test_load_blockchain(self):
         pass
 
-    def test_synchronize(self):
-        pass
+    def test_synchronize_whenQuorumAgreesOnTip_thenSyncsWithoutWaitingForOtherNodes(self):
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 5
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = mock_latest_block
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = {"index": 7, "current_hash": "hash_7"}
+        polled = []
+
+        def get_all(urls, deadline=None):
+            for url in urls:
+                polled.append(url)
+                yield url, mock_response
+
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(FullNode, 'select_nodes', return_value=["127.0.0.2", "127.0.0.3", "127.0.0.4"]) as patched_select_nodes, \
+                patch.object(PeerConnectionPool, 'get_all', side_effect=get_all) as patched_get_all, \
+                patch.object(FullNode, 'sync_with_node', return_value=True) as patched_sync_with_node:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.blockchain = mock_blockchain
+            node.block_processing_lock = threading.Lock()
+
+            node.synchronize()
+
+            self.assertEqual(len(polled), FullNode.SYNC_QUORUM)
+            self.assertEqual(patched_get_all.call_args[0][1], FullNode.TIP_POLL_DEADLINE)
+            patched_sync_with_node.assert_called_once_with(ANY, mock_latest_block, 7)
+
+    def test_synchronize_whenNodeIsInPeerTable_thenDoesNotCountItselfTowardsQuorum(self):
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 5
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = mock_latest_block
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = {"index": 7, "current_hash": "hash_7"}
+
+        def get_all(urls, deadline=None):
+            for url in urls:
+                yield url, mock_response
+
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(FullNode, 'select_nodes', return_value=["127.0.0.1", "127.0.0.2"]) as patched_select_nodes, \
+                patch.object(PeerConnectionPool, 'get_all', side_effect=get_all) as patched_get_all, \
+                patch.object(FullNode, 'sync_with_node', return_value=True) as patched_sync_with_node:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.host = "127.0.0.1"
+            node.peer_pool = PeerConnectionPool()
+            node.blockchain = mock_blockchain
+            node.block_processing_lock = threading.Lock()
+
+            node.synchronize()
+
+            self.assertEqual(list(patched_get_all.call_args[0][0]), [BLOCK_URL.format("127.0.0.2", FULL_NODE_PORT, "latest")])
+            patched_sync_with_node.assert_called_once_with("127.0.0.2", mock_latest_block, 7)
+
+    def test_synchronize_whenNoQuorum_thenTriesHighestTipFirst(self):
+        mock_latest_block = Mock(Block)
+        mock_latest_block.index = 5
+        mock_blockchain = Mock(Blockchain)
+        mock_blockchain.get_latest_block.return_value = mock_latest_block
+        responses = {}
+        for node, index in (("127.0.0.2", 7), ("127.0.0.3", 9), ("127.0.0.4", 4)):
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.headers = {}
+            mock_response.json.return_value = {"index": index, "current_hash": "hash_{}".format(index)}
+            responses[BLOCK_URL.format(node, FULL_NODE_PORT, "latest")] = mock_response
+
+        def get_all(urls, deadline=None):
+            for url in urls:
+                yield url, responses.get(url)
+
+        with patch.object(FullNode, '__init__', return_value=None) as patched_init, \
+                patch.object(FullNode, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(FullNode, 'select_nodes', return_value=["127.0.0.2", "127.0.0.3", "127.0.0.4", "127.0.0.5"]) as patched_select_nodes, \
+                patch.object(PeerConnectionPool, 'get_all', side_effect=get_all) as patched_get_all, \
+                patch.object(FullNode, 'remove_node') as patched_remove_node, \
+                patch.object(FullNode, 'sync_with_node', side_effect=[False, True]) as patched_sync_with_node:
+            node = FullNode("127.0.0.1", "reward_address")
+            node.peer_pool = PeerConnectionPool()
+            node.blockchain = mock_blockchain
+            node.block_processing_lock = threading.Lock()
+
+            node.synchronize()
+
+            patched_remove_node.assert_called_once_with("127.0.0.5")
+            self.assertEqual(patched_sync_with_node.call_args_list, [
+                call("127.0.0.3", mock_latest_block, 9),
+                call("127.0.0.2", mock_latest_block, 7)
+            ])
 
     def test_generate_ecc_instance(self):
         pass
@@ -0,0 +1,226 @@
+import unittest
+from mock import patch, Mock, MagicMock, call
+from crankycoin.peers import *
+
+
+class TestPeers(unittest.TestCase):
+
+    def test_PeerConnectionPool_whenConstructed_thenMountsNonBlockingAdapterWithPerPeerLimit(self):
+        subject = PeerConnectionPool(max_peers=10, max_connections_per_peer=2)
+
+        self.assertIs(subject.session.get_adapter("http://127.0.0.2:30013/nodes"), subject.adapter)
+        self.assertEqual(subject.adapter._pool_connections, 10)
+        self.assertEqual(subject.adapter._pool_maxsize, 2)
+        self.assertFalse(subject.adapter._pool_block)
+
+    def test_PeerConnectionPool_whenConstructed_thenAcceptsVersionedWireFormats(self):
+        subject = PeerConnectionPool()
+
+        self.assertEqual(
+            subject.session.headers["Accept"],
+            "application/vnd.crankycoin.v2+octet-stream, application/vnd.crankycoin.v2+json, application/json")
+        self.assertEqual(subject.session.headers["Accept-Encoding"], "gzip, deflate")
+
+    def test_get_whenCalled_thenUsesSharedSessionWithDefaultTimeout(self):
+        subject = PeerConnectionPool()
+
+        with patch.object(subject.session, 'request', return_value="response") as patched_request:
+            resp = subject.get("http://127.0.0.2:30013/nodes")
+
+            self.assertEqual(resp, "response")
+            patched_request.assert_called_once_with("GET", "http://127.0.0.2:30013/nodes", timeout=PeerConnectionPool.TIMEOUT)
+
+    def test_post_whenCalled_thenUsesSharedSessionWithDefaultTimeout(self):
+        subject = PeerConnectionPool()
+
+        with patch.object(subject.session, 'request', return_value="response") as patched_request:
+            resp = subject.post("http://127.0.0.2:30013/transactions", json={"transaction": {}})
+
+            self.assertEqual(resp, "response")
+            patched_request.assert_called_once_with(
+                "POST",
+                "http://127.0.0.2:30013/transactions",
+                data='{"transaction":{}}',
+                headers={"Content-Type": "application/json"},
+                timeout=PeerConnectionPool.TIMEOUT)
+
+    def test_request_whenResponseReceived_thenRecordsSuccessForHost(self):
+        subject = PeerConnectionPool()
+
+        with patch.object(subject.session, 'request', return_value="response") as patched_request, \
+                patch.object(PeerHealth, 'record_success') as patched_record_success:
+            subject.get("http://127.0.0.2:30013/nodes")
+
+            self.assertEqual(patched_record_success.call_args[0][0], "127.0.0.2")
+
+    def test_request_whenRequestException_thenRecordsFailureAndRaises(self):
+        subject = PeerConnectionPool()
+
+        with patch.object(subject.session, 'request', side_effect=requests.exceptions.RequestException()) as patched_request, \
+                patch.object(PeerHealth, 'record_failure') as patched_record_failure:
+            self.assertRaises(requests.exceptions.RequestException, subject.get, "http://127.0.0.2:30013/nodes")
+
+            patched_record_failure.assert_called_once_with("127.0.0.2")
+
+    def test_get_stats_whenPoolsHaveServedRequests_thenReportsReusedConnections(self):
+        subject = PeerConnectionPool()
+        pool_one = subject.adapter.poolmanager.connection_from_host("127.0.0.2", 30013, "http")
+        pool_one.num_requests = 10
+        pool_one.num_connections = 1
+        pool_two = subject.adapter.poolmanager.connection_from_host("127.0.0.3", 30013, "http")
+        pool_two.num_requests = 4
+        pool_two.num_connections = 2
+
+        stats = subject.get_stats()
+
+        self.assertEqual(stats["peers"]["127.0.0.2:30013"], {"requests": 10, "connections": 1, "reused": 9})
+        self.assertEqual(stats["peers"]["127.0.0.3:30013"], {"requests": 4, "connections": 2, "reused": 2})
+        self.assertEqual(stats["requests"], 14)
+        self.assertEqual(stats["connections"], 3)
+        self.assertEqual(stats["reused"], 11)
+
+    def test_get_all_whenRequestsComplete_thenYieldsInCompletionOrder(self):
+        subject = PeerConnectionPool()
+
+        def get(url, **kwargs):
+            if url == "http://slow":
+                gevent.sleep(0.05)
+            elif url == "http://down":
+                raise requests.exceptions.ConnectionError()
+            return url + "_response"
+
+        with patch.object(PeerConnectionPool, 'get', side_effect=get) as patched_get:
+            results = list(subject.get_all(["http://slow", "http://fast", "http://down"]))
+
+            self.assertEqual(results, [("http://fast", "http://fast_response"), ("http://down", None), ("http://slow", "http://slow_response")])
+
+    def test_get_all_whenDeadlinePasses_thenAbandonsPendingRequests(self):
+        subject = PeerConnectionPool()
+
+        def get(url, **kwargs):
+            if url == "http://hung":
+                gevent.sleep(10)
+            return url + "_response"
+
+        with patch.object(PeerConnectionPool, 'get', side_effect=get) as patched_get:
+            start = time.time()
+            results = list(subject.get_all(["http://hung", "http://fast"], deadline=0.05))
+
+            self.assertEqual(results, [("http://fast", "http://fast_response")])
+            self.assertLess(time.time() - start, 1)
+
+    def test_get_first_whenPreferredPeerIsSlow_thenHedgesToNextPeer(self):
+        subject = PeerConnectionPool()
+
+        def get(url, **kwargs):
+            if url == "http://slow":
+                gevent.sleep(1)
+            return Mock(status_code=200, url=url)
+
+        with patch.object(PeerConnectionPool, 'get', side_effect=get) as patched_get:
+            start = time.time()
+            url, response = subject.get_first(["http://slow", "http://fast", "http://unused"], hedge_delay=0.05)
+
+            self.assertEqual(url, "http://fast")
+            self.assertLess(time.time() - start, 0.5)
+            self.assertEqual(patched_get.call_count, 2)
+
+    def test_get_first_whenPeerFails_thenFailsOverWithoutWaitingForHedgeDelay(self):
+        subject = PeerConnectionPool()
+
+        def get(url, **kwargs):
+            if url == "http://down":
+                raise requests.exceptions.ConnectionError()
+            if url == "http://erroring":
+                return Mock(status_code=500)
+            return Mock(status_code=200)
+
+        with patch.object(PeerConnectionPool, 'get', side_effect=get) as patched_get:
+            start = time.time()
+            url, response = subject.get_first(["http://down", "http://erroring", "http://up"], hedge_delay=10)
+
+            self.assertEqual(url, "http://up")
+            self.assertLess(time.time() - start, 1)
+
+    def test_get_first_whenPeerAnswersWithNon200_thenFailsOver(self):
+        subject = PeerConnectionPool()
+
+        def get(url, **kwargs):
+            if url == "http://missing":
+                return Mock(status_code=404)
+            if url == "http://overloaded":
+                return Mock(status_code=429)
+            return Mock(status_code=200)
+
+        with patch.object(PeerConnectionPool, 'get', side_effect=get) as patched_get:
+            url, response = subject.get_first(["http://missing", "http://overloaded", "http://up"], hedge_delay=10)
+
+            self.assertEqual(url, "http://up")
+            self.assertEqual(patched_get.call_count, 3)
+
+    def test_get_first_whenEveryPeerFails_thenReturnsNone(self):
+        subject = PeerConnectionPool()
+
+        with patch.object(PeerConnectionPool, 'get', side_effect=requests.exceptions.ConnectionError()) as patched_get:
+            self.assertEqual(subject.get_first(["http://one", "http://two"], hedge_delay=0.01), (None, None))
+            self.assertEqual(subject.get_first([]), (None, None))
+
+    def test_record_success_whenCalledRepeatedly_thenSmoothsLatency(self):
+        subject = PeerHealth()
+
+        subject.record_success("127.0.0.2", 1.0)
+        subject.record_success("127.0.0.2", 2.0)
+
+        self.assertAlmostEqual(subject.get_latency("127.0.0.2"), 1.0 + PeerHealth.LATENCY_SMOOTHING)
+
+    def test_record_failure_whenBelowCircuitBreakerThreshold_thenPeerStaysAvailable(self):
+        subject = PeerHealth()
+
+        for i in range(PeerHealth.CIRCUIT_BREAKER_THRESHOLD - 1):
+            subject.record_failure("127.0.0.2")
+
+        self.assertTrue(subject.is_available("127.0.0.2"))
+
+    def test_record_failure_whenCircuitBreakerThresholdReached_thenBacksOffExponentially(self):
+        subject = PeerHealth()
+
+        with patch("crankycoin.peers.time.time", return_value=1000.0) as patched_time:
+            for i in range(PeerHealth.CIRCUIT_BREAKER_THRESHOLD):
+                subject.record_failure("127.0.0.2")
+            first_retry_at = subject.peers["127.0.0.2"]["retry_at"]
+            subject.record_failure("127.0.0.2")
+            second_retry_at = subject.peers["127.0.0.2"]["retry_at"]
+
+            self.assertFalse(subject.is_available("127.0.0.2"))
+
+        self.assertEqual(first_retry_at, 1000.0 + PeerHealth.BASE_BACKOFF)
+        self.assertEqual(second_retry_at, 1000.0 + PeerHealth.BASE_BACKOFF * 2)
+
+    def test_record_success_whenCircuitOpen_thenClosesCircuit(self):
+        subject = PeerHealth()
+        for i in range(PeerHealth.CIRCUIT_BREAKER_THRESHOLD):
+            subject.record_failure("127.0.0.2")
+
+        subject.record_success("127.0.0.2", 0.1)
+
+        self.assertTrue(subject.is_available("127.0.0.2"))
+        self.assertFalse(subject.should_evict("127.0.0.2"))
+
+    def test_should_evict_whenEvictionThresholdReached_thenReturnsTrue(self):
+        subject = PeerHealth()
+
+        for i in range(PeerHealth.EVICTION_THRESHOLD):
+            subject.record_failure("127.0.0.2")
+
+        self.assertTrue(subject.should_evict("127.0.0.2"))
+
+    def test_rank_whenCalled_thenSkipsUnavailablePeersAndOrdersByLatency(self):
+        subject = PeerHealth()
+        subject.record_success("127.0.0.2", 0.5)
+        subject.record_success("127.0.0.3", 0.1)
+        for i in range(PeerHealth.CIRCUIT_BREAKER_THRESHOLD):
+            subject.record_failure("127.0.0.4")
+
+        ranked = subject.rank(["127.0.0.2", "127.0.0.3", "127.0.0.4", "127.0.0.5"])
+
+        self.assertEqual(ranked, ["127.0.0.5", "127.0.0.3", "127.0.0.2"])
@@ -0,0 +1,74 @@
+import unittest
+from mock import patch, Mock, MagicMock, call
+from crankycoin.streaming import *
+from crankycoin.block import Block
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_BlockStreamProducer_whenStarted_thenRegistersPullProducerWithNdjsonContentType(self):
+        request = Mock()
+        request.getHeader.return_value = None
+        subject = BlockStreamProducer(request, [])
+
+        subject.start()
+
+        request.setHeader.assert_any_call("Content-Type", NDJSON_CONTENT_TYPE)
+        request.registerProducer.assert_called_once_with(subject, False)
+        self.assertIsNone(subject.compressor)
+
+    def test_resumeProducing_whenGzipNegotiated_thenEachBlockIsDecodableAsItArrives(self):
+        block_one = Block(1, [], "previous_hash_one", "current_hash_one", 1234567890, 1)
+        block_two = Block(2, [], "current_hash_one", "current_hash_two", 1234567891, 2)
+        request = Mock()
+        request.getHeader.return_value = "gzip, deflate"
+        subject = BlockStreamProducer(request, [block_one, block_two])
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        subject.start()
+        subject.resumeProducing()
+        first_line = decompressor.decompress(request.write.call_args[0][0])
+        subject.resumeProducing()
+        second_line = decompressor.decompress(request.write.call_args[0][0])
+        subject.resumeProducing()
+        decompressor.decompress(request.write.call_args_list[-1][0][0])
+
+        request.setHeader.assert_any_call("Content-Encoding", "gzip")
+        self.assertEqual(json.loads(first_line), block_one.__dict__)
+        self.assertEqual(json.loads(second_line), block_two.__dict__)
+        self.assertTrue(subject.finished.called)
+
+    def test_resumeProducing_whenBlocksRemain_thenWritesOneBlockPerLine(self):
+        block_one = Block(1, [], "previous_hash_one", "current_hash_one", 1234567890, 1)
+        block_two = Block(2, [], "current_hash_one", "current_hash_two", 1234567891, 2)
+        request = Mock()
+        subject = BlockStreamProducer(request, [block_one, block_two])
+
+        subject.resumeProducing()
+        subject.resumeProducing()
+
+        self.assertEqual(request.write.call_count, 2)
+        self.assertEqual(json.loads(request.write.call_args_list[0][0][0]), block_one.__dict__)
+        self.assertEqual(json.loads(request.write.call_args_list[1][0][0]), block_two.__dict__)
+        self.assertTrue(request.write.call_args_list[1][0][0].endswith("\n"))
+        self.assertFalse(subject.finished.called)
+
+    def test_resumeProducing_whenBlocksExhausted_thenUnregistersAndFinishes(self):
+        request = Mock()
+        subject = BlockStreamProducer(request, [])
+
+        subject.resumeProducing()
+
+        request.unregisterProducer.assert_called_once()
+        self.assertTrue(subject.finished.called)
+        request.write.assert_not_called()
+
+    def test_stopProducing_whenConnectionLost_thenWritesNothingFurther(self):
+        request = Mock()
+        subject = BlockStreamProducer(request, [Block(1, [], "previous_hash", "current_hash", 1234567890, 1)])
+
+        subject.stopProducing()
+        subject.resumeProducing()
+
+        request.write.assert_not_called()
+        self.assertFalse(subject.finished.called)
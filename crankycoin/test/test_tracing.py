@@ -0,0 +1,81 @@
+import unittest
+from mock import patch, Mock, MagicMock, call
+import crankycoin.tracing
+from crankycoin.tracing import *
+
+
+class TestTracing(unittest.TestCase):
+
+    def tearDown(self):
+        for sink in list(crankycoin.tracing._sinks):
+            remove_sink(sink)
+
+    def test_span_whenNoSinks_thenReturnsNoopSpan(self):
+        self.assertIs(span("peer_request"), NOOP_SPAN)
+
+    def test_span_whenSinkRegistered_thenDeliversFinishedSpan(self):
+        sink = Mock()
+        add_sink(sink)
+
+        with span("peer_request", host="127.0.0.2"):
+            pass
+
+        finished = sink.on_span.call_args[0][0]
+        self.assertEqual(finished.name, "peer_request")
+        self.assertEqual(finished.attributes, {"host": "127.0.0.2"})
+        self.assertIsNotNone(finished.duration)
+        self.assertIsNone(finished.error)
+
+    def test_traced_whenSinkRegistered_thenRecordsErrorAndReraises(self):
+        sink = Mock()
+        add_sink(sink)
+
+        @traced()
+        def validate_block():
+            raise ValueError()
+
+        self.assertRaises(ValueError, validate_block)
+        self.assertEqual(sink.on_span.call_args[0][0].name, "validate_block")
+        self.assertEqual(sink.on_span.call_args[0][0].error, ValueError)
+
+    def test_traced_whenNoSinks_thenCallsThrough(self):
+        @traced("mining")
+        def mine_block(reward_address):
+            return reward_address
+
+        self.assertEqual(mine_block("reward_address"), "reward_address")
+        self.assertEqual(mine_block.__name__, "mine_block")
+
+    def test_sample_whenSpanOpen_thenPrefixesStackWithSpanNames(self):
+        profiler = SamplingProfiler()
+        add_sink(profiler)
+
+        with span("synchronize"):
+            with span("peer_request"):
+                profiler.sample()
+
+        report = profiler.get_report()
+        self.assertEqual(report["samples"], 1)
+        self.assertTrue(any(s["stack"].startswith("synchronize;peer_request;") for s in report["stacks"]))
+        self.assertEqual(report["spans"]["synchronize"]["count"], 1)
+        self.assertEqual(report["spans"]["peer_request"]["count"], 1)
+
+    def test_start_whenStopped_thenRemovesSink(self):
+        profiler = SamplingProfiler()
+
+        profiler.start(0.001)
+        self.assertIn(profiler, crankycoin.tracing._sinks)
+        profiler.stop()
+
+        self.assertNotIn(profiler, crankycoin.tracing._sinks)
+        self.assertFalse(profiler.get_report()["running"])
+
+    def test_sample_periodically_whenSampleRaises_thenStopsRunning(self):
+        profiler = SamplingProfiler()
+
+        with patch.object(SamplingProfiler, 'sample', side_effect=RuntimeError("frames")) as patched_sample:
+            profiler.start(0.001)
+            profiler.thread.join(1)
+
+        self.assertFalse(profiler.running)
+        self.assertNotIn(profiler, crankycoin.tracing._sinks)
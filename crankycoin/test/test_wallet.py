@@ -0,0 +1,187 @@
+import pyelliptic
+import unittest
+from mock import patch, Mock, MagicMock, call
+from crankycoin.peers import PeerConnectionPool, PeerHealth
+from crankycoin.wallet import *
+
+
+class TestWallet(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        ecc = pyelliptic.ECC(curve='secp256k1')
+        cls.private_key = ecc.get_privkey().encode('hex')
+        cls.public_key = ecc.get_pubkey().encode('hex')
+
+    def assertSigned(self, subject, transaction):
+        message = subject.generate_signable_transaction(
+            transaction["from"], transaction["to"], transaction["amount"], transaction["timestamp"])
+        self.assertTrue(subject.verify(transaction["signature"], message, transaction["from"]))
+        self.assertEqual(transaction["hash"], subject.calculate_transaction_hash(transaction))
+
+    def test_sign_transactions_whenIdenticalPayments_thenSignsWithDistinctHashes(self):
+        subject = Client(self.private_key, self.public_key)
+
+        transactions = subject.sign_transactions([("recipient", 1), ("recipient", 1), ("other", 2.5)])
+
+        self.assertEqual([(t["to"], t["amount"]) for t in transactions], [("recipient", 1), ("recipient", 1), ("other", 2.5)])
+        self.assertEqual(len(set(t["hash"] for t in transactions)), 3)
+        for transaction in transactions:
+            self.assertSigned(subject, transaction)
+
+    def test_sign_transactions_whenProcessesGiven_thenSignsInWorkersAndKeepsOrder(self):
+        subject = Client(self.private_key, self.public_key)
+        payments = [("recipient{}".format(i), i) for i in range(5)]
+
+        transactions = subject.sign_transactions(payments, processes=2)
+
+        self.assertEqual([(t["to"], t["amount"]) for t in transactions], payments)
+        for transaction in transactions:
+            self.assertEqual(transaction["from"], self.public_key)
+            self.assertSigned(subject, transaction)
+
+    def test_broadcast_transactions_whenCalled_thenPostsOneBatchRequestPerNode(self):
+        subject = Client(self.private_key, self.public_key)
+        transactions = [{"hash": "one"}, {"hash": "two"}]
+        batch_results = [{"hash": "one", "accepted": True}, {"hash": "two", "accepted": False, "message": "invalid signature"}]
+        mock_response = Mock(status_code=200, headers={})
+        mock_response.json.return_value = {"accepted": 1, "rejected": 1, "results": batch_results}
+
+        with patch.object(Client, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(Client, 'select_nodes', return_value=["127.0.0.2", "127.0.0.3"]) as patched_select_nodes, \
+                patch.object(Client, 'remove_node') as patched_remove_node, \
+                patch.object(PeerConnectionPool, 'post', side_effect=[mock_response, requests.exceptions.ConnectionError()]) as patched_post:
+            results = subject.broadcast_transactions(transactions)
+
+            self.assertEqual(patched_post.call_args_list, [
+                call("http://127.0.0.2:30013/transactions/batch", json={"transactions": transactions}),
+                call("http://127.0.0.3:30013/transactions/batch", json={"transactions": transactions})
+            ])
+            patched_remove_node.assert_called_once_with("127.0.0.3")
+        self.assertEqual(results, {"127.0.0.2": batch_results, "127.0.0.3": None})
+
+    def test_broadcast_transactions_whenMoreThanBatchLimit_thenPostsOneRequestPerBatch(self):
+        subject = Client(self.private_key, self.public_key)
+        transactions = [{"hash": "one"}, {"hash": "two"}, {"hash": "three"}]
+        responses = []
+        for batch in (transactions[:2], transactions[2:]):
+            mock_response = Mock(status_code=200, headers={})
+            mock_response.json.return_value = {"results": [{"hash": t["hash"], "accepted": True} for t in batch]}
+            responses.append(mock_response)
+
+        with patch.object(FullNode, 'MAX_BATCH_TRANSACTIONS', 2), \
+                patch.object(Client, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(Client, 'select_nodes', return_value=["127.0.0.2"]) as patched_select_nodes, \
+                patch.object(PeerConnectionPool, 'post', side_effect=responses) as patched_post:
+            results = subject.broadcast_transactions(transactions)
+
+            self.assertEqual(patched_post.call_args_list, [
+                call("http://127.0.0.2:30013/transactions/batch", json={"transactions": transactions[:2]}),
+                call("http://127.0.0.2:30013/transactions/batch", json={"transactions": transactions[2:]})
+            ])
+        self.assertEqual([result["hash"] for result in results["127.0.0.2"]], ["one", "two", "three"])
+
+    def test_broadcast_transactions_whenBatchRejected_thenReportsEveryTransactionAsRejected(self):
+        subject = Client(self.private_key, self.public_key)
+        transactions = [{"hash": "one"}, {"hash": "two"}]
+        mock_response = Mock(status_code=413, headers={})
+        mock_response.json.return_value = {"message": "at most 1 transactions per batch"}
+
+        with patch.object(Client, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(Client, 'select_nodes', return_value=["127.0.0.2"]) as patched_select_nodes, \
+                patch.object(PeerConnectionPool, 'post', return_value=mock_response) as patched_post:
+            results = subject.broadcast_transactions(transactions)
+
+        self.assertEqual(results, {"127.0.0.2": [
+            {"hash": "one", "accepted": False, "message": "at most 1 transactions per batch"},
+            {"hash": "two", "accepted": False, "message": "at most 1 transactions per batch"}
+        ]})
+
+    def test_broadcast_transactions_whenNodePredatesBatchEndpoint_thenPostsEachTransaction(self):
+        subject = Client(self.private_key, self.public_key)
+        transactions = [{"hash": "one"}, {"hash": "two"}]
+        responses = [Mock(status_code=404), Mock(status_code=200), Mock(status_code=500, content="", headers={})]
+        responses[2].json.side_effect = ValueError()
+
+        with patch.object(Client, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(Client, 'select_nodes', return_value=["127.0.0.2"]) as patched_select_nodes, \
+                patch.object(PeerConnectionPool, 'post', side_effect=responses) as patched_post:
+            results = subject.broadcast_transactions(transactions)
+
+            self.assertEqual(patched_post.call_args_list[1:], [
+                call("http://127.0.0.2:30013/transactions", json={"transaction": transactions[0]}),
+                call("http://127.0.0.2:30013/transactions", json={"transaction": transactions[1]})
+            ])
+        self.assertEqual(results, {"127.0.0.2": [
+            {"hash": "one", "accepted": True},
+            {"hash": "two", "accepted": False, "message": "HTTP 500"}
+        ]})
+
+    def test_create_transactions_whenCalled_thenBroadcastsSignedTransactions(self):
+        subject = Client(self.private_key, self.public_key)
+
+        with patch.object(Client, 'broadcast_transactions') as patched_broadcast_transactions:
+            transactions = subject.create_transactions([("recipient", 1)])
+
+            patched_broadcast_transactions.assert_called_once_with(transactions)
+        self.assertEqual(transactions[0]["to"], "recipient")
+
+    def test_get_balance_whenNoNodeGiven_thenQueriesFastestNodesWithHedging(self):
+        subject = Client(self.private_key, self.public_key)
+        mock_response = Mock(status_code=200, headers={})
+        mock_response.json.return_value = 25
+        ranked = ["127.0.0.2", "127.0.0.3", "127.0.0.4", "127.0.0.5"]
+
+        with patch.object(Client, 'refresh_nodes') as patched_refresh_nodes, \
+                patch.object(Client, 'select_nodes', return_value=ranked) as patched_select_nodes, \
+                patch.object(Client, 'get_hedge_delay', return_value=0.2) as patched_get_hedge_delay, \
+                patch.object(PeerConnectionPool, 'get_first', return_value=("url", mock_response)) as patched_get_first:
+            balance = subject.get_balance("address")
+
+            self.assertEqual(balance, 25)
+            patched_get_hedge_delay.assert_called_once_with("127.0.0.2")
+            patched_get_first.assert_called_once_with([
+                "http://127.0.0.2:30013/address/address/balance",
+                "http://127.0.0.3:30013/address/address/balance",
+                "http://127.0.0.4:30013/address/address/balance"
+            ], 0.2)
+
+    def test_get_balance_whenNewClient_thenDiscoversNodesAndFailsOverToThem(self):
+        subject = Client(self.private_key, self.public_key)
+        nodes_response = Mock(status_code=200, headers={})
+        nodes_response.json.return_value = {"full_nodes": ["127.0.0.1", "127.0.0.2"]}
+        balance_response = Mock(status_code=200, headers={})
+        balance_response.json.return_value = 25
+
+        def get(url, **kwargs):
+            if url.endswith("/nodes"):
+                return nodes_response
+            if url.startswith("http://127.0.0.1:"):
+                raise requests.exceptions.ConnectionError()
+            return balance_response
+
+        with patch.object(PeerConnectionPool, 'get', side_effect=get) as patched_get:
+            balance = subject.get_balance("address")
+
+        self.assertEqual(balance, 25)
+        self.assertEqual(subject.full_nodes, {"127.0.0.1", "127.0.0.2"})
+        self.assertTrue(call("http://127.0.0.2:30013/address/address/balance") in patched_get.call_args_list)
+
+    def test_get_transaction_history_whenNodeGivenAndItFails_thenReturnsNone(self):
+        subject = Client(self.private_key, self.public_key)
+
+        with patch.object(Client, 'select_nodes') as patched_select_nodes, \
+                patch.object(PeerConnectionPool, 'get_first', return_value=(None, None)) as patched_get_first:
+            history = subject.get_transaction_history("address", node="127.0.0.9")
+
+            self.assertIsNone(history)
+            patched_select_nodes.assert_not_called()
+            self.assertEqual(patched_get_first.call_args[0][0], ["http://127.0.0.9:30013/address/address/transactions"])
+
+    def test_get_hedge_delay_whenLatencyKnown_thenScalesLatencyWithFloor(self):
+        subject = Client(self.private_key, self.public_key)
+
+        with patch.object(PeerHealth, 'get_latency', side_effect=[None, 0.1, 0.001]) as patched_get_latency:
+            self.assertEqual(subject.get_hedge_delay("127.0.0.2"), Client.DEFAULT_HEDGE_DELAY)
+            self.assertAlmostEqual(subject.get_hedge_delay("127.0.0.2"), 0.1 * Client.HEDGE_LATENCY_FACTOR)
+            self.assertEqual(subject.get_hedge_delay("127.0.0.2"), Client.MIN_HEDGE_DELAY)
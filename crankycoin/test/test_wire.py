@@ -0,0 +1,123 @@
+import unittest
+from mock import patch, Mock, MagicMock, call
+from crankycoin.wire import *
+
+
+class TestWire(unittest.TestCase):
+
+    def test_encode_whenCalled_thenUsesCompactSeparators(self):
+        encoded = encode({"index": 1, "transactions": [{"amount": 1.5}]})
+
+        self.assertNotIn(" ", encoded)
+        self.assertEqual(json.loads(encoded), {"index": 1, "transactions": [{"amount": 1.5}]})
+
+    def test_accepts_wire_json_whenAcceptHeaderListsVersionedFormat_thenReturnsTrue(self):
+        request = Mock()
+        request.getHeader.return_value = "application/vnd.crankycoin.v2+json, application/json"
+
+        self.assertTrue(accepts_wire_json(request))
+        request.getHeader.assert_called_once_with("Accept")
+
+    def test_accepts_wire_json_whenNoAcceptHeader_thenReturnsFalse(self):
+        request = Mock()
+        request.getHeader.return_value = None
+
+        self.assertFalse(accepts_wire_json(request))
+
+    def test_decode_response_whenVersionedFormat_thenDecodesContentOnce(self):
+        response = Mock()
+        response.headers = {"Content-Type": WIRE_JSON_CONTENT_TYPE}
+        response.content = '{"index":1}'
+
+        self.assertEqual(decode_response(response), {"index": 1})
+        response.json.assert_not_called()
+
+    def test_decode_response_whenLegacyDoubleEncoded_thenDecodesInnerDocument(self):
+        response = Mock()
+        response.headers = {"Content-Type": "text/html"}
+        response.json.return_value = '{"index": 1}'
+
+        self.assertEqual(decode_response(response), {"index": 1})
+
+    def test_decode_response_whenLegacySingleEncoded_thenReturnsDocument(self):
+        response = Mock()
+        response.headers = {}
+        response.json.return_value = {"index": 1}
+
+        self.assertEqual(decode_response(response), {"index": 1})
+
+    def test_encode_binary_whenBlock_thenRoundTripsExactlyAndIsSmallerThanJson(self):
+        block = {
+            "index": 7,
+            "nonce": 123456,
+            "previous_hash": "00004f3c" + "ab" * 28,
+            "current_hash": "0000a1b2" + "cd" * 28,
+            "timestamp": "2017-07-01T12:00:00.123456",
+            "transactions": [{
+                "from": "04" + "1f" * 64,
+                "to": "04" + "2e" * 64,
+                "amount": 1.5,
+                "signature": "3045" + "0a" * 69,
+                "timestamp": "2017-07-01T11:59:00.000001",
+                "hash": "9f" * 32
+            }, {
+                "from": "0",
+                "to": "04" + "2e" * 64,
+                "amount": 50,
+                "signature": "0",
+                "timestamp": "2017-07-01T12:00:00.000002",
+                "hash": "8e" * 32
+            }]
+        }
+
+        encoded = encode_binary(BLOCK, block)
+
+        self.assertEqual(decode_binary(encoded), block)
+        self.assertLess(len(encoded), len(encode(block)) / 2 + 100)
+        self.assertIsInstance(decode_binary(encoded)["transactions"][1]["amount"], int)
+        self.assertIsInstance(decode_binary(encoded)["transactions"][0]["amount"], float)
+
+    def test_encode_binary_whenGenesisStyleValues_thenPreservesTypes(self):
+        block = {
+            "index": 0,
+            "nonce": 0,
+            "previous_hash": 0,
+            "current_hash": "ab" * 32,
+            "timestamp": 0,
+            "transactions": [{"from": "0", "to": "04" + "1f" * 64, "amount": 1000, "signature": "0", "timestamp": 0, "hash": 0}]
+        }
+
+        self.assertEqual(decode_binary(encode_binary(BLOCK, block)), block)
+
+    def test_encode_binary_whenListKinds_thenRoundTrips(self):
+        headers = [{"index": 1, "nonce": 2, "previous_hash": "ab" * 32, "current_hash": "cd" * 32, "timestamp": "t"}]
+        transactions = [{"from": "0", "to": "to", "amount": 1, "signature": "0", "timestamp": 0, "hash": "ef" * 32}]
+
+        self.assertEqual(decode_binary(encode_binary(HEADERS, {"index": 0, "headers": headers})), {"index": 0, "headers": headers})
+        self.assertEqual(decode_binary(encode_binary(TRANSACTIONS, transactions)), transactions)
+        self.assertEqual(decode_binary(encode_binary(BLOCKS, [])), [])
+
+    def test_render_whenBinaryCodecCannotEncode_thenFallsBackToVersionedJson(self):
+        transactions = [
+            {"from": "0", "to": "to", "amount": True, "signature": "0", "timestamp": 0, "hash": "ef" * 32},
+            {"from": "0", "to": "to", "amount": 1, "signature": "0", "timestamp": {"nested": 0}, "hash": "ef" * 32},
+            {"hash": "ef" * 32}
+        ]
+        for transaction in transactions:
+            request = Mock()
+
+            resp = render(request, WIRE_BINARY_CONTENT_TYPE, TRANSACTIONS, [transaction])
+
+            request.setHeader.assert_called_once_with("Content-Type", WIRE_JSON_CONTENT_TYPE)
+            self.assertEqual(decode(resp), [transaction])
+
+    def test_decode_binary_whenUnsupportedVersion_thenRaisesValueError(self):
+        self.assertRaises(ValueError, decode_binary, struct.pack(">BB", WIRE_VERSION + 1, BLOCK))
+
+    def test_decode_response_whenBinaryFormat_thenDecodesFrame(self):
+        transactions = [{"from": "0", "to": "to", "amount": 1, "signature": "0", "timestamp": 0, "hash": "ef" * 32}]
+        response = Mock()
+        response.headers = {"Content-Type": WIRE_BINARY_CONTENT_TYPE}
+        response.content = encode_binary(TRANSACTIONS, transactions)
+
+        self.assertEqual(decode_response(response), transactions)
@@ -0,0 +1,223 @@
+import functools
+import sys
+import thread
+import threading
+import time
+
+from collections import defaultdict
+
+# sinks receive every finished span.  with no sinks registered no span is created at all.
+_sinks = []
+_sinks_lock = threading.Lock()
+# thread id: names of the spans open on that thread, outermost first
+_active_spans = {}
+
+
+class Span(object):
+    __slots__ = ("name", "attributes", "start", "duration", "error", "stack")
+
+    def __init__(self, name, attributes):
+        """
+        :param name: span name
+        :type name: str
+        :param attributes: extra context passed on to sinks
+        :type attributes: dict
+        """
+        self.name = name
+        self.attributes = attributes
+        self.start = None
+        self.duration = None
+        self.error = None
+        self.stack = None
+
+    def __enter__(self):
+        self.stack = _active_spans.setdefault(thread.get_ident(), [])
+        self.stack.append(self.name)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.time() - self.start
+        self.error = exc_type
+        self.stack.pop()
+        for sink in _sinks:
+            sink.on_span(self)
+        return False
+
+
+class _NoopSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def add_sink(sink):
+    """
+    :param sink: receives finished spans through on_span(span)
+    :type sink: object
+    """
+    global _sinks
+    with _sinks_lock:
+        if sink not in _sinks:
+            # copy on write so that spans finishing on other threads iterate a stable list
+            _sinks = _sinks + [sink]
+
+
+def remove_sink(sink):
+    global _sinks
+    with _sinks_lock:
+        _sinks = [s for s in _sinks if s is not sink]
+
+
+def span(name, **attributes):
+    """
+    Times a block of code for the registered sinks
+
+        with span("peer_request", host=host):
+            ...
+
+    :return: context manager
+    :rtype: Span
+    """
+    if not _sinks:
+        return NOOP_SPAN
+    return Span(name, attributes)
+
+
+def traced(name=None):
+    """
+    Decorator that runs the function inside a span named after it.  Costs one list check while tracing is off.
+
+    :param name: span name, defaults to the function name
+    :type name: str
+    """
+    def decorator(f):
+        span_name = name or f.__name__
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return f(*args, **kwargs)
+            with Span(span_name, {}):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler(object):
+
+    DEFAULT_INTERVAL = 0.005
+    MAX_STACK_DEPTH = 64
+
+    def __init__(self):
+        """
+        Samples every thread's stack at a fixed interval while running.  Samples are keyed by the spans open on the
+        thread followed by its call stack, in the collapsed format flame graph tools read.  Finished spans are
+        aggregated per name.
+        """
+        self.lock = threading.Lock()
+        self.running = False
+        self.interval = self.DEFAULT_INTERVAL
+        self.thread = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.samples = 0
+            self.stacks = defaultdict(int)
+            # span name: [count, total seconds, max seconds, errors]
+            self.spans = {}
+
+    def start(self, interval=None):
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.interval = interval or self.DEFAULT_INTERVAL
+            self.thread = threading.Thread(target=self.sample_periodically, args=())
+            self.thread.daemon = True
+            self.thread.start()
+        add_sink(self)
+
+    def stop(self):
+        remove_sink(self)
+        with self.lock:
+            self.running = False
+
+    def on_span(self, span):
+        with self.lock:
+            stats = self.spans.get(span.name)
+            if stats is None:
+                stats = self.spans[span.name] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += span.duration
+            stats[2] = max(stats[2], span.duration)
+            if span.error is not None:
+                stats[3] += 1
+
+    def sample_periodically(self):
+        own_thread_id = thread.get_ident()
+        try:
+            # a restart replaces self.thread, which retires this sampler
+            while self.running and self.thread is threading.current_thread():
+                self.sample(own_thread_id)
+                time.sleep(self.interval)
+        finally:
+            # a sampler that dies must not leave the profiler reporting that it runs, or block a restart
+            with self.lock:
+                current = self.thread is threading.current_thread()
+                if current:
+                    self.running = False
+            if current:
+                remove_sink(self)
+
+    def sample(self, own_thread_id=None):
+        frames = sys._current_frames()
+        collapsed = []
+        for thread_id, frame in frames.items():
+            if thread_id == own_thread_id:
+                continue
+            calls = []
+            while frame is not None and len(calls) < self.MAX_STACK_DEPTH:
+                code = frame.f_code
+                calls.append("{}:{}".format(code.co_filename.rsplit("/", 1)[-1], code.co_name))
+                frame = frame.f_back
+            calls.reverse()
+            collapsed.append(";".join(list(_active_spans.get(thread_id) or []) + calls))
+        with self.lock:
+            self.samples += 1
+            for stack in collapsed:
+                self.stacks[stack] += 1
+
+    def get_report(self, limit=50):
+        """
+        :param limit: number of most sampled stacks to include
+        :type limit: int
+
+        :return: dict(running, interval, samples, spans, stacks)
+        :rtype: dict
+        """
+        with self.lock:
+            stacks = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)[:limit]
+            spans = dict((name, {
+                "count": stats[0],
+                "total": stats[1],
+                "max": stats[2],
+                "errors": stats[3]
+            }) for name, stats in self.spans.items())
+            return {
+                "running": self.running,
+                "interval": self.interval,
+                "samples": self.samples,
+                "spans": spans,
+                "stacks": [{"stack": stack, "count": count} for stack, count in stacks]
+            }
+
+
+PROFILER = SamplingProfiler()
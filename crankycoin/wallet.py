@@ -1,19 +1,35 @@
 import datetime
 import hashlib
 import json
+import multiprocessing
 import pyelliptic
-import random
 import requests
 
-from node import NodeMixin, BALANCE_URL, FULL_NODE_PORT, TRANSACTION_HISTORY_URL
+from node import FullNode, NodeMixin, BALANCE_URL, FULL_NODE_PORT, TRANSACTION_HISTORY_URL, TRANSACTIONS_BATCH_URL, TRANSACTIONS_URL
+from wire import decode_response
+
+
+def _sign_payments(args):
+    # module level so that worker processes can run it.  each worker builds one ECC context for its whole chunk.
+    private_key, public_key, payments = args
+    client = Client(private_key, public_key)
+    return [client.sign_transaction(to, amount, timestamp) for to, amount, timestamp in payments]
 
 
 class Client(NodeMixin):
 
     __private_key__ = None
     __public_key__ = None
+    # nodes tried per query, fastest first
+    MAX_QUERY_NODES = 3
+    # a node gets this many times its usual latency to answer before the next node is asked as well
+    HEDGE_LATENCY_FACTOR = 3
+    MIN_HEDGE_DELAY = 0.05
+    # hedge delay for a node without a latency measurement
+    DEFAULT_HEDGE_DELAY = 0.5
 
     def __init__(self, private_key=None, public_key=None):
+        super(Client, self).__init__()
         if private_key is not None and public_key is not None:
             self.__private_key__ = private_key.decode('hex')
             self.__public_key__ = public_key.decode('hex')
@@ -44,48 +60,209 @@ class Client(NodeMixin):
         return self.ecc.verify(signature, message)
 
     def get_balance(self, address=None, node=None):
+        """
+        :param address: public key, this client's if not given
+        :type address: str
+        :param node: only ask this node
+        :type node: str
+
+        :return: balance of the address, None if no node answered with 200
+        """
         if address is None:
             address = self.get_pubkey()
-        if node is None:
-            node = random.sample(self.full_nodes, 1)[0]
-        url = BALANCE_URL.format(node, FULL_NODE_PORT, address)
-        try:
-            response = requests.get(url)
-            return response.json()
-        except requests.exceptions.RequestException as re:
-            pass
-        return None
+        return self.query_nodes(BALANCE_URL, address, node)
 
     def get_transaction_history(self, address=None, node=None):
+        """
+        :param address: public key, this client's if not given
+        :type address: str
+        :param node: only ask this node
+        :type node: str
+
+        :return: transactions from or to the address, None if no node answered with 200
+        """
         if address is None:
             address = self.get_pubkey()
+        return self.query_nodes(TRANSACTION_HISTORY_URL, address, node)
+
+    def query_nodes(self, url_format, argument, node=None):
+        """
+        Asks the fastest healthy nodes, hedging a slow answer with the next node and failing over on errors
+
+        :param url_format: url with placeholders for the node, port and argument
+        :type url_format: str
+        :param argument: last url placeholder, e.g. an address
+        :type argument: str
+        :param node: only ask this node
+        :type node: str
+
+        :return: decoded response of the first node to answer with 200, None if no node did
+        """
         if node is None:
-            node = random.sample(self.full_nodes, 1)[0]
-        url = TRANSACTION_HISTORY_URL.format(node, FULL_NODE_PORT, address)
-        try:
-            response = requests.get(url)
-            return response.json()
-        except requests.exceptions.RequestException as re:
-            pass
-        return None
+            # a new client only knows the seed nodes, which leaves nothing to hedge or fail over to
+            self.refresh_nodes()
+            nodes = self.select_nodes()[:self.MAX_QUERY_NODES]
+        else:
+            nodes = [node]
+        if not nodes:
+            return None
+        urls = [url_format.format(n, FULL_NODE_PORT, argument) for n in nodes]
+        url, response = self.peer_pool.get_first(urls, self.get_hedge_delay(nodes[0]))
+        if response is None:
+            return None
+        return decode_response(response)
+
+    def get_hedge_delay(self, node):
+        latency = self.peer_pool.health.get_latency(node)
+        if latency is None:
+            return self.DEFAULT_HEDGE_DELAY
+        return max(self.HEDGE_LATENCY_FACTOR * latency, self.MIN_HEDGE_DELAY)
 
     def create_transaction(self, to, amount):
-        timestamp = datetime.datetime.utcnow().isoformat()
+        transaction = self.sign_transaction(to, amount)
+        return self.broadcast_transaction(transaction)
+
+    def create_transactions(self, payments, processes=None):
+        """
+        Signs many payments and submits them with one bulk request per node
+
+        :param payments: recipient public key and amount of every payment
+        :type payments: list of tuple(str, float)
+        :param processes: worker processes to sign in, this process if not given
+        :type processes: int
+
+        :return: the signed transactions, in the order of the payments
+        :rtype: list of dict
+        """
+        transactions = self.sign_transactions(payments, processes)
+        self.broadcast_transactions(transactions)
+        return transactions
+
+    def sign_transactions(self, payments, processes=None):
+        """
+        Builds and signs many transactions without broadcasting them
+
+        :param payments: recipient public key and amount of every payment
+        :type payments: list of tuple(str, float)
+        :param processes: worker processes to sign in, this process if not given
+        :type processes: int
+
+        :return: signed transactions, in the order of the payments
+        :rtype: list of dict
+        """
+        # a microsecond apart, so that identical payments still get distinct hashes
+        now = datetime.datetime.utcnow()
+        payments = [(to, amount, (now + datetime.timedelta(microseconds=i)).isoformat())
+                    for i, (to, amount) in enumerate(payments)]
+        if not processes or processes < 2 or len(payments) < 2:
+            return [self.sign_transaction(to, amount, timestamp) for to, amount, timestamp in payments]
+        step = -(-len(payments) // processes)
+        chunks = [(self.get_privkey(), self.get_pubkey(), payments[i:i + step]) for i in range(0, len(payments), step)]
+        pool = multiprocessing.Pool(min(processes, len(chunks)))
+        try:
+            signed_chunks = pool.map(_sign_payments, chunks)
+        finally:
+            pool.close()
+            pool.join()
+        return [transaction for chunk in signed_chunks for transaction in chunk]
+
+    def broadcast_transactions(self, transactions):
+        """
+        Posts the transactions to every node in batches of at most FullNode.MAX_BATCH_TRANSACTIONS.  Nodes that
+        predate the batch endpoint get one request per transaction.
+
+        :param transactions: signed transactions
+        :type transactions: list of dict
+
+        :return: node: dict(hash, accepted, (message)) for every transaction.  None for nodes that could not be
+            reached.
+        :rtype: dict
+        """
+        self.refresh_nodes()
+        bad_nodes = set()
+        results = {}
+        batch_size = FullNode.MAX_BATCH_TRANSACTIONS
+        batches = [transactions[i:i + batch_size] for i in range(0, len(transactions), batch_size)]
+
+        for node in self.select_nodes():
+            results[node] = []
+            supports_batches = True
+            try:
+                for batch in batches:
+                    if supports_batches:
+                        response = self.peer_pool.post(
+                            TRANSACTIONS_BATCH_URL.format(node, FULL_NODE_PORT), json={"transactions": batch})
+                        if response.status_code == 200:
+                            results[node].extend(decode_response(response)["results"])
+                            continue
+                        if response.status_code != 404:
+                            results[node].extend(self.reject_transactions(batch, response))
+                            continue
+                        # node predates the batch endpoint. it only reads one transaction per request.
+                        supports_batches = False
+                    for transaction in batch:
+                        response = self.peer_pool.post(
+                            TRANSACTIONS_URL.format(node, FULL_NODE_PORT), json={"transaction": transaction})
+                        if response.status_code == 200:
+                            results[node].append({"hash": transaction["hash"], "accepted": True})
+                        else:
+                            results[node].extend(self.reject_transactions([transaction], response))
+            except requests.exceptions.RequestException as re:
+                results[node] = None
+                bad_nodes.add(node)
+        for node in bad_nodes:
+            self.remove_node(node)
+        bad_nodes.clear()
+        return results
+
+    def reject_transactions(self, transactions, response):
+        """
+        :param transactions: transactions a node did not accept
+        :type transactions: list of dict
+        :param response: the node's non-200 response
+        :type response: requests.Response
+
+        :return: dict(hash, accepted, message) for every transaction, with the node's message or the HTTP status
+        :rtype: list of dict
+        """
+        try:
+            message = decode_response(response)["message"]
+        except (ValueError, KeyError, TypeError):
+            message = "HTTP {}".format(response.status_code)
+        return [{"hash": transaction["hash"], "accepted": False, "message": message} for transaction in transactions]
+
+    def sign_transaction(self, to, amount, timestamp=None):
+        """
+        Builds and signs a transaction without broadcasting it
+
+        :param to: recipient's public key
+        :type to: str
+        :param amount: amount to send
+        :type amount: float
+        :param timestamp: transaction timestamp, now if not given
+        :type timestamp: str
+
+        :return: signed transaction
+        :rtype: dict(from, to, amount, signature, timestamp, hash)
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.utcnow().isoformat()
+        from_address = self.get_pubkey()
         signature = self.sign(
             self.generate_signable_transaction(
-                self.get_pubkey(),
+                from_address,
                 to,
                 amount,
                 timestamp))
         transaction = {
-            "from": self.get_pubkey(),
+            "from": from_address,
             "to": to,
             "amount": amount,
             "signature": signature,
             "timestamp": timestamp,
         }
         transaction["hash"] = self.calculate_transaction_hash(transaction)
-        return self.broadcast_transaction(transaction)
+        return transaction
 
     def calculate_transaction_hash(self, transaction):
         """
@@ -0,0 +1,299 @@
+import json
+import re
+import struct
+
+try:
+    # C accelerated and round-trips floats exactly, so transaction hashes survive the trip
+    import simplejson as fastjson
+except ImportError:
+    fastjson = json
+
+WIRE_VERSION = 2
+WIRE_JSON_CONTENT_TYPE = "application/vnd.crankycoin.v{}+json".format(WIRE_VERSION)
+WIRE_BINARY_CONTENT_TYPE = "application/vnd.crankycoin.v{}+octet-stream".format(WIRE_VERSION)
+JSON_CONTENT_TYPE = "application/json"
+SEPARATORS = (",", ":")
+
+# binary frame kinds
+BLOCK = 1
+BLOCKS = 2
+HEADERS = 3
+TRANSACTIONS = 4
+
+# binary value tags.  every value carries its type so that decoded blocks hash exactly like the originals.
+NONE_TAG = 0
+INT_TAG = 1
+FLOAT_TAG = 2
+STRING_TAG = 3
+HASH_TAG = 4
+KEY_TAG = 5
+HEX_TAG = 6
+
+HASH_SIZE = 32
+KEY_SIZE = 65
+HEX_PATTERN = re.compile("^(?:[0-9a-f]{2})+$")
+TRANSACTION_FIELDS = ("from", "to", "amount", "signature", "timestamp", "hash")
+
+
+def encode(obj):
+    """
+    Single pass, whitespace free JSON encoding used on the wire
+
+    :param obj: JSON serializable object
+    :type obj: dict or list
+
+    :return: encoded payload
+    :rtype: str
+    """
+    return fastjson.dumps(obj, separators=SEPARATORS)
+
+
+def decode(data):
+    return fastjson.loads(data)
+
+
+def _pack_value(value):
+    if value is None:
+        return struct.pack(">B", NONE_TAG)
+    if isinstance(value, bool):
+        raise ValueError("Unsupported wire value: {}".format(value))
+    if isinstance(value, (int, long)):
+        return struct.pack(">Bq", INT_TAG, value)
+    if isinstance(value, float):
+        return struct.pack(">Bd", FLOAT_TAG, value)
+    if isinstance(value, basestring):
+        if HEX_PATTERN.match(value):
+            raw = value.decode("hex")
+            if len(raw) == HASH_SIZE:
+                return struct.pack(">B", HASH_TAG) + raw
+            if len(raw) == KEY_SIZE:
+                return struct.pack(">B", KEY_TAG) + raw
+            return struct.pack(">BH", HEX_TAG, len(raw)) + raw
+        data = value.encode("utf-8")
+        return struct.pack(">BI", STRING_TAG, len(data)) + data
+    raise ValueError("Unsupported wire value: {}".format(value))
+
+
+def _unpack_value(data, offset):
+    tag, = struct.unpack_from(">B", data, offset)
+    offset += 1
+    if tag == NONE_TAG:
+        return None, offset
+    if tag == INT_TAG:
+        return struct.unpack_from(">q", data, offset)[0], offset + 8
+    if tag == FLOAT_TAG:
+        return struct.unpack_from(">d", data, offset)[0], offset + 8
+    if tag == STRING_TAG:
+        length, = struct.unpack_from(">I", data, offset)
+        offset += 4
+        return data[offset:offset + length].decode("utf-8"), offset + length
+    if tag == HASH_TAG:
+        return data[offset:offset + HASH_SIZE].encode("hex"), offset + HASH_SIZE
+    if tag == KEY_TAG:
+        return data[offset:offset + KEY_SIZE].encode("hex"), offset + KEY_SIZE
+    if tag == HEX_TAG:
+        length, = struct.unpack_from(">H", data, offset)
+        offset += 2
+        return data[offset:offset + length].encode("hex"), offset + length
+    raise ValueError("Unknown wire value tag: {}".format(tag))
+
+
+def pack_transaction(transaction):
+    return "".join(_pack_value(transaction[field]) for field in TRANSACTION_FIELDS)
+
+
+def unpack_transaction(data, offset=0):
+    transaction = {}
+    for field in TRANSACTION_FIELDS:
+        transaction[field], offset = _unpack_value(data, offset)
+    return transaction, offset
+
+
+def pack_header(block):
+    """
+    :param block: block dict
+    :type block: dict(index, previous_hash, current_hash, timestamp, nonce, (transactions))
+    """
+    return struct.pack(">QQ", block["index"], block["nonce"]) + \
+        _pack_value(block["previous_hash"]) + \
+        _pack_value(block["current_hash"]) + \
+        _pack_value(block["timestamp"])
+
+
+def unpack_header(data, offset=0):
+    index, nonce = struct.unpack_from(">QQ", data, offset)
+    header = {
+        "index": index,
+        "nonce": nonce
+    }
+    offset += 16
+    header["previous_hash"], offset = _unpack_value(data, offset)
+    header["current_hash"], offset = _unpack_value(data, offset)
+    header["timestamp"], offset = _unpack_value(data, offset)
+    return header, offset
+
+
+def pack_block(block):
+    return pack_header(block) + \
+        struct.pack(">I", len(block["transactions"])) + \
+        "".join(pack_transaction(transaction) for transaction in block["transactions"])
+
+
+def unpack_block(data, offset=0):
+    block, offset = unpack_header(data, offset)
+    count, = struct.unpack_from(">I", data, offset)
+    offset += 4
+    block["transactions"] = []
+    for i in range(count):
+        transaction, offset = unpack_transaction(data, offset)
+        block["transactions"].append(transaction)
+    return block, offset
+
+
+BINARY_CODECS = {
+    BLOCK: (pack_block, unpack_block),
+    HEADERS: (pack_header, unpack_header),
+    BLOCKS: (pack_block, unpack_block),
+    TRANSACTIONS: (pack_transaction, unpack_transaction)
+}
+
+
+def encode_binary(kind, obj):
+    """
+    Binary frame: version, kind, then a single record (BLOCK) or a count prefixed list of records.  HEADERS frames
+    carry the index of the block the headers follow before the list.
+
+    :param kind: BLOCK, BLOCKS, HEADERS or TRANSACTIONS
+    :type kind: int
+    :param obj: block dict, dict(index, headers) for HEADERS, or list of block / transaction dicts
+    :type obj: dict or list
+
+    :return: encoded frame
+    :rtype: str
+    """
+    pack = BINARY_CODECS[kind][0]
+    frame = struct.pack(">BB", WIRE_VERSION, kind)
+    if kind == BLOCK:
+        return frame + pack(obj)
+    if kind == HEADERS:
+        frame += struct.pack(">Q", obj["index"])
+        obj = obj["headers"]
+    return frame + struct.pack(">I", len(obj)) + "".join(pack(record) for record in obj)
+
+
+def decode_binary(data):
+    version, kind = struct.unpack_from(">BB", data, 0)
+    if version != WIRE_VERSION:
+        raise ValueError("Unsupported wire version: {}".format(version))
+    unpack = BINARY_CODECS[kind][1]
+    if kind == BLOCK:
+        return unpack(data, 2)[0]
+    offset = 2
+    if kind == HEADERS:
+        index, = struct.unpack_from(">Q", data, offset)
+        offset += 8
+    count, = struct.unpack_from(">I", data, offset)
+    offset += 4
+    records = []
+    for i in range(count):
+        record, offset = unpack(data, offset)
+        records.append(record)
+    if kind == HEADERS:
+        return {"index": index, "headers": records}
+    return records
+
+
+def get_content_type(headers):
+    content_type = headers.get("Content-Type") or ""
+    return content_type.split(";")[0].strip()
+
+
+def accepts_wire_json(request):
+    """
+    Content negotiation.  Peers that do not ask for the versioned format are served the legacy format.
+
+    :param request: twisted web request
+    :type request: twisted.web.server.Request
+    """
+    return WIRE_JSON_CONTENT_TYPE in (request.getHeader("Accept") or "")
+
+
+def accepts_wire_binary(request):
+    return WIRE_BINARY_CONTENT_TYPE in (request.getHeader("Accept") or "")
+
+
+def negotiate_content_type(request):
+    """
+    :return: the wire content type the peer asked for, or None for the legacy format
+    :rtype: str
+    """
+    if accepts_wire_binary(request):
+        return WIRE_BINARY_CONTENT_TYPE
+    if accepts_wire_json(request):
+        return WIRE_JSON_CONTENT_TYPE
+    return None
+
+
+def encode_negotiated(content_type, kind, obj):
+    """
+    Encodes a response in the negotiated format.  Documents the binary codec cannot represent, such as a
+    transaction with a boolean amount in a peer's block, fall back to the versioned JSON format.
+
+    :param content_type: negotiated content type, None for the legacy format
+    :type content_type: str
+    :param kind: binary frame kind
+    :type kind: int
+    :param obj: block dict, dict(index, headers) or list of block / transaction dicts
+    :type obj: dict or list
+
+    :return: content type the document was encoded in, None for the legacy format, and the encoded document
+    :rtype: tuple(str, str)
+    """
+    if content_type == WIRE_BINARY_CONTENT_TYPE:
+        try:
+            return content_type, encode_binary(kind, obj)
+        except (ValueError, KeyError, TypeError, struct.error):
+            content_type = WIRE_JSON_CONTENT_TYPE
+    if content_type == WIRE_JSON_CONTENT_TYPE:
+        return content_type, encode(obj)
+    return None, json.dumps(obj)
+
+
+def render(request, content_type, kind, obj):
+    """
+    Renders a response in the negotiated format, or in versioned JSON if the binary codec cannot represent it
+
+    :param content_type: negotiated content type, None for the legacy format
+    :type content_type: str
+    :param kind: binary frame kind
+    :type kind: int
+    :param obj: block dict, dict(index, headers) or list of block / transaction dicts
+    :type obj: dict or list
+    """
+    content_type, body = encode_negotiated(content_type, kind, obj)
+    if content_type is not None:
+        request.setHeader("Content-Type", content_type)
+    return body
+
+
+def decode_request(request):
+    return decode(request.content.read())
+
+
+def decode_response(response):
+    """
+    Decodes a peer response in the binary, versioned JSON or legacy format
+
+    :param response: peer response
+    :type response: requests.Response
+    """
+    content_type = get_content_type(response.headers)
+    if content_type == WIRE_BINARY_CONTENT_TYPE:
+        return decode_binary(response.content)
+    if content_type == WIRE_JSON_CONTENT_TYPE:
+        return decode(response.content)
+    body = response.json()
+    # legacy peers send some documents as a JSON string inside JSON
+    if isinstance(body, basestring):
+        body = json.loads(body)
+    return body